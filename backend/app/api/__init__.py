@@ -1 +1,2 @@
 from .routes import router
+from .debug import debug_router
@@ -0,0 +1,147 @@
+"""
+Debug Routes
+On-demand CPU profiling and allocation tracking of this process. Disabled
+(404) unless DEBUG_TOKEN is set; every call must send it as X-Debug-Token.
+"""
+import asyncio
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from ..diagnostics import (
+    GROUP_BY, PROFILE_INTERVAL_MS, PROFILE_MAX_S, Profile, ProfilerBusyError, UnknownSnapshotError,
+    allocation_tracker, cpu_profiler
+)
+from ..state import worker_id
+from .responses import dumps
+
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Hide the debug routes entirely when disabled; 403 on a wrong token"""
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, DEBUG_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+debug_router = APIRouter(prefix="/api/debug", tags=["debug"], dependencies=[Depends(require_debug_token)])
+
+PROFILE_FORMAT = Query("speedscope", pattern="^(speedscope|collapsed)$")
+
+
+def _profile_file(profile: Profile, format: str) -> Response:
+    """Profile as a downloadable speedscope JSON or collapsed-stack text file"""
+    name = f"profile-{worker_id().replace(':', '-')}-{int(profile.started_at)}"
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile.collapsed(), headers={"Content-Disposition": f'attachment; filename="{name}.txt"'}
+        )
+    return Response(
+        dumps(profile.speedscope()), media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'}
+    )
+
+
+@debug_router.get("/profile")
+async def profile_for(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_S),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000),
+    format: str = PROFILE_FORMAT
+):
+    """Sample this process for `seconds` and return the profile file"""
+    try:
+        cpu_profiler.start(seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await asyncio.sleep(seconds)
+    profile = await asyncio.to_thread(cpu_profiler.stop)
+    return _profile_file(profile, format)
+
+
+@debug_router.post("/profile/start", status_code=202)
+async def start_profile(
+    seconds: float = Query(60, gt=0, le=PROFILE_MAX_S),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000)
+):
+    """Start sampling in the background (stops by itself after `seconds`)"""
+    try:
+        cpu_profiler.start(seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Profiler started", "worker": worker_id(), "seconds": min(seconds, PROFILE_MAX_S)}
+
+
+@debug_router.post("/profile/stop")
+async def stop_profile(format: str = PROFILE_FORMAT):
+    """Stop the running profile (if any) and return the last profile file"""
+    profile = await asyncio.to_thread(cpu_profiler.stop)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded")
+    return _profile_file(profile, format)
+
+
+@debug_router.get("/profile/status")
+async def profile_status():
+    """Whether a profile is running, and the size of the current / last one"""
+    return {
+        "running": cpu_profiler.running,
+        "worker": worker_id(),
+        "profile": cpu_profiler.profile.describe() if cpu_profiler.profile else None
+    }
+
+
+@debug_router.post("/tracemalloc/start")
+async def start_tracemalloc(frames: int = Query(1, ge=1, le=50)):
+    """Start tracing allocations (slows allocation-heavy code while on)"""
+    allocation_tracker.start(frames)
+    return allocation_tracker.status()
+
+
+@debug_router.post("/tracemalloc/stop")
+async def stop_tracemalloc():
+    """Stop tracing and drop the snapshots"""
+    allocation_tracker.stop()
+    return allocation_tracker.status()
+
+
+@debug_router.get("/tracemalloc")
+async def tracemalloc_status():
+    """Traced memory, peak and the snapshot ids available for diffs"""
+    return {**allocation_tracker.status(), "worker": worker_id()}
+
+
+@debug_router.post("/tracemalloc/snapshots")
+def take_tracemalloc_snapshot():
+    """Take a snapshot now (runs in the threadpool; large heaps take a while)"""
+    try:
+        return allocation_tracker.snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@debug_router.get("/tracemalloc/diff")
+def diff_tracemalloc_snapshots(
+    base: str,
+    target: str,
+    group_by: str = Query("lineno", pattern=f"^({'|'.join(GROUP_BY)})$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """Top allocators by growth between two snapshots"""
+    try:
+        return allocation_tracker.diff(base, target, group_by, limit)
+    except UnknownSnapshotError as e:
+        raise HTTPException(status_code=404, detail=f"Snapshot {e.args[0]} not found")
+
+
+@debug_router.get("/tracemalloc/workflows")
+async def workflow_allocations(
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("net_traced_bytes", pattern="^(net_traced_bytes|net_blocks|peak_growth_bytes|duration_ms)$")
+):
+    """Allocations of the workflow runs recorded while tracing was on, largest first"""
+    return allocation_tracker.workflows(limit, sort)
@@ -0,0 +1,74 @@
+"""
+HTTP Conditional Responses
+ETag / If-None-Match handling so unchanged polls are answered with 304
+"""
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from ..workflow.artifacts import SummaryArtifact
+
+
+# Content-addressed URLs never change, so clients may cache them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag from the response bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against If-None-Match (RFC 9110 section 13.1.2)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_json(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    cache_control: str = "no-cache",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Send JSON bytes, or 304 Not Modified if the client already has them
+    `no-cache` lets browsers keep the body but revalidate on every poll
+    """
+    etag = etag or compute_etag(body)
+    response_headers = {"ETag": etag, "Cache-Control": cache_control, **(headers or {})}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=response_headers)
+
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
+
+def artifact_response(request: Request, artifact: SummaryArtifact, cache_control: str = "no-cache") -> Response:
+    """Serve a pre-rendered artifact in the best encoding the client accepts"""
+    body, encoding = artifact.variant(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": artifact.etag(encoding),
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding"
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,43 @@
+"""
+Fast JSON Responses
+orjson-based default response class for every API route
+"""
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    """Fallback for types orjson does not serialize natively"""
+    if isinstance(value, BaseModel):
+        # by_alias keeps AgeingBuckets keys as "0_30", "31_60", ...
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes (datetimes and enums are handled natively by orjson)"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson
+    Routes may also return it directly with pydantic models inside the
+    content to skip FastAPI's jsonable_encoder pass entirely
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
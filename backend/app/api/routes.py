@@ -1,21 +1,43 @@
 """
 API Routes for Credit Workflow System
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import Dict, Any, List
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+from sse_starlette.sse import EventSourceResponse
+import asyncio
+import json
+import os
+import shutil
+import uuid
 from ..models.schemas import (
     CreditRequest, CustomerSnapshot, ApproverDecision,
-    WorkflowEvent, WorkflowSummary, RequestType, Requestor
+    WorkflowEvent, WorkflowSummary, RequestType, Requestor, WhatIfRequest, BulkApprovalRequest
 )
-from ..workflow.agent import workflow_agent
+from ..workflow.runner import (
+    WORKFLOW_EXECUTOR, active_workflows, workflow_lease, mark_running, resume_decided_workflows, run_workflow,
+    submit_workflow
+)
+from ..workflow.approvals import NotAwaitingApproval, approval_inbox
+from ..workflow.scheduler import QueueFullError, workflow_scheduler
+from ..workflow.artifacts import summary_artifacts
+from ..workflow.analysis_stream import read_stream
 from ..tools.credit_tools import credit_tools
+from ..tools.snapshot_history import snapshot_history
+from ..jobs import DuplicateJobError, get_job_queue
+from ..llm import llm_guard, llm_usage
+from ..policy import PolicyError, policy_engine
+from ..simulation import apply_overrides, load_store_history, run_simulation
+from ..bulk import IMPORT_DIR, export_audit, import_status, start_import
+from .responses import FastJSONResponse, dumps
+from .http_cache import IMMUTABLE_CACHE_CONTROL, artifact_response, conditional_json
 
 router = APIRouter(prefix="/api", tags=["credit-workflow"])
 
-
-# Store active workflows
-active_workflows: Dict[str, Any] = {}
+# Analysis SSE: store poll interval and how long to wait for the analysis to finish
+ANALYSIS_STREAM_POLL = float(os.getenv("ANALYSIS_STREAM_POLL_MS", "100")) / 1000
+ANALYSIS_STREAM_TIMEOUT = float(os.getenv("ANALYSIS_STREAM_TIMEOUT", "300"))
 
 
 @router.get("/")
@@ -45,6 +67,20 @@ async def get_credit_request(request_id: str):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.get("/customers")
+async def list_customers(
+    sort: str = Query("total_outstanding", pattern="^(total_outstanding|overdue_pct|headroom|ratio_90_plus_to_limit)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    risk_category: Optional[str] = None,
+    min_overdue_pct: Optional[float] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Customers with their derived credit metrics, filtered and sorted without recomputation"""
+    total, items = credit_tools.list_customers(sort, order == "desc", risk_category, min_overdue_pct, limit, offset)
+    return {"total": total, "items": items}
+
+
 @router.get("/customers/{customer_id}", response_model=CustomerSnapshot)
 async def get_customer_snapshot(customer_id: str):
     """Get customer financial snapshot"""
@@ -54,50 +90,128 @@ async def get_customer_snapshot(customer_id: str):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.get("/customers/{customer_id}/history")
+async def get_customer_history(customer_id: str, window_days: int = Query(90, ge=1, le=3650)):
+    """Snapshot history of a customer (oldest first) and its trend over `window_days`"""
+    points = snapshot_history.points(customer_id)
+    if not points and customer_id not in credit_tools.customers_db:
+        raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+    return {
+        "customer_id": customer_id,
+        "trend": snapshot_history.trend(customer_id, window_days),
+        "points": points
+    }
+
+
+@router.post("/imports/customer-snapshots", status_code=202)
+def import_customer_snapshots(file: UploadFile = File(...)):
+    """
+    Bulk import customer snapshots from an S/4HANA extract (CSV or Parquet)
+    The spooled upload is copied to IMPORT_DIR in the threadpool (never on the
+    event loop) and imported in the background; poll GET /api/imports/{import_id}
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in (".csv", ".parquet", ".pq"):
+        raise HTTPException(status_code=400, detail="Extract must be a .csv or .parquet file")
+
+    import_id = uuid.uuid4().hex[:12]
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    path = os.path.join(IMPORT_DIR, f"{import_id}{extension}")
+
+    with open(path, "wb") as target:
+        shutil.copyfileobj(file.file, target, 1 << 20)
+
+    start_import(path, import_id)
+    return {
+        "message": "Import started",
+        "import_id": import_id,
+        "monitor_url": f"/api/imports/{import_id}"
+    }
+
+
+@router.get("/imports/{import_id}")
+async def get_import_status(import_id: str):
+    """Progress or result of a bulk import (rows/s, imported, rejected)"""
+    status = import_status.get(import_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return status
+
+
+@router.get("/imports/{import_id}/errors")
+async def get_import_errors(import_id: str):
+    """Rejected rows of an import as NDJSON (row number, reason, raw data)"""
+    status = import_status.get(import_id)
+    if not status or not status.get("error_file") or not os.path.exists(status["error_file"]):
+        raise HTTPException(status_code=404, detail="No rejected rows for this import")
+    return FileResponse(status["error_file"], media_type="application/x-ndjson")
+
+
+@router.get("/audit/export")
+def export_audit_records(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    customer_id: Optional[str] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|parquet)$")
+):
+    """
+    Stream requests, AI recommendations, approver decisions, SAP updates and
+    events for a date range (and optionally one customer) as NDJSON or Parquet
+    """
+    try:
+        chunks = export_audit(format, since, until, customer_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"audit-{datetime.now():%Y%m%d-%H%M%S}.{format}"
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/vnd.apache.parquet"
+    return StreamingResponse(
+        chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.post("/workflow/start/{request_id}")
-async def start_workflow(request_id: str, background_tasks: BackgroundTasks):
+async def start_workflow(request_id: str):
     """
     Start credit workflow for a request
-    Workflow runs in background and can be monitored via events endpoint
+    The run is queued by priority and can be monitored via the events endpoint;
+    returns 429 with Retry-After when the scheduler queue is full
     """
     try:
         # Validate request exists
         credit_tools.get_credit_request(request_id)
 
-        # Check if already running
-        if request_id in active_workflows and active_workflows[request_id]["status"] == "running":
+        # A run that is queued, running or parked for approval is not restarted
+        status = (active_workflows.get(request_id) or {}).get("status")
+        if status in ("queued", "running", "awaiting_approval"):
+            raise HTTPException(status_code=400, detail=f"Workflow already {status.replace('_', ' ')} for this request")
+
+        # Take ownership; fails while any run (any worker) holds a live lease
+        lease = workflow_lease(request_id)
+        if not lease.acquire():
             raise HTTPException(status_code=400, detail="Workflow already running for this request")
 
-        # Mark as running
-        active_workflows[request_id] = {
-            "status": "running",
-            "started_at": datetime.now().isoformat()
-        }
-
-        # Run workflow in background (in production, use Celery or similar)
-        # For demo, run synchronously but return immediately with status
-        def run_workflow():
-            try:
-                result = workflow_agent.execute_workflow(request_id)
-                active_workflows[request_id] = {
-                    "status": "completed",
-                    "started_at": active_workflows[request_id]["started_at"],
-                    "completed_at": datetime.now().isoformat(),
-                    "result": result.model_dump()
-                }
-            except Exception as e:
-                active_workflows[request_id] = {
-                    "status": "failed",
-                    "started_at": active_workflows[request_id]["started_at"],
-                    "error": str(e)
-                }
-
-        background_tasks.add_task(run_workflow)
+        try:
+            priority = submit_workflow(request_id, lease)
+        except QueueFullError as e:
+            lease.release()
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except DuplicateJobError:
+            lease.release()
+            raise HTTPException(status_code=400, detail="Workflow already queued for this request")
+        except Exception:
+            lease.release()
+            raise
 
         return {
-            "message": "Workflow started",
+            "message": "Workflow queued",
             "request_id": request_id,
-            "status": "running",
+            "status": "queued",
+            "priority": priority,
             "monitor_url": f"/api/workflow/status/{request_id}"
         }
 
@@ -105,22 +219,201 @@ async def start_workflow(request_id: str, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.get("/scheduler/metrics")
+async def get_scheduler_metrics():
+    """Scheduler queue depth, per-class concurrency and wait times"""
+    return workflow_scheduler.metrics()
+
+
+@router.get("/llm/usage")
+async def get_llm_usage():
+    """LLM token usage and latency per prompt and request type (this process)"""
+    return llm_usage.snapshot()
+
+
+@router.get("/llm/guard")
+async def get_llm_guard():
+    """LLM deadline / hedging / circuit breaker state and call latency percentiles"""
+    return llm_guard.metrics()
+
+
+@router.get("/policy")
+async def get_policy():
+    """Active credit policy version (and the last reload error, if any)"""
+    return {**policy_engine.current().describe(), "last_error": policy_engine.last_error}
+
+
+@router.post("/policy/reload")
+async def reload_policy():
+    """Recompile the policy file now instead of waiting for the change check"""
+    try:
+        policy = policy_engine.reload()
+    except PolicyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return policy.describe()
+
+
+@router.post("/simulation/whatif")
+def simulate_policy(body: WhatIfRequest):
+    """
+    Replay stored request history under a candidate policy and report which
+    recommendations would flip (runs in the threadpool; CPU work in a process pool)
+    """
+    try:
+        candidate = apply_overrides(body.policy or policy_engine.current().document, body.overrides)
+        return run_simulation(candidate, load_store_history(body.since, body.until))
+    except PolicyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _job_queue():
+    """The durable queue; 404 unless WORKFLOW_EXECUTOR=queue, so its file is never created otherwise"""
+    if WORKFLOW_EXECUTOR != "queue":
+        raise HTTPException(status_code=404, detail="Job queue disabled (WORKFLOW_EXECUTOR is not 'queue')")
+    return get_job_queue()
+
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    """Durable job queue counts (pending, running, dead letters)"""
+    return _job_queue().stats()
+
+
+@router.get("/jobs/dead-letters")
+async def list_dead_letters(limit: int = Query(100, ge=1, le=1000)):
+    """Jobs that exhausted their retries, most recent first"""
+    return _job_queue().dead_letters(limit)
+
+
+@router.post("/jobs/dead-letters/{job_id}/requeue")
+async def requeue_dead_letter(job_id: str):
+    """Give a dead-lettered job a fresh set of attempts"""
+    try:
+        requeued = _job_queue().requeue_dead_letter(job_id)
+    except DuplicateJobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not requeued:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"message": "Job requeued", "job_id": job_id}
+
+
 @router.get("/workflow/status/{request_id}")
-async def get_workflow_status(request_id: str):
-    """Get current workflow status"""
-    if request_id not in active_workflows:
+async def get_workflow_status(request_id: str, request: Request):
+    """Get current workflow status (304 if unchanged since the client's ETag)"""
+    # The status record is stored as JSON already; pass it through untouched
+    raw = active_workflows.get_raw(request_id)
+    if raw is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    return active_workflows[request_id]
+    return conditional_json(request, raw.encode("utf-8"))
+
+
+@router.get("/workflow/state/{request_id}")
+async def get_workflow_state(request_id: str):
+    """Get the last checkpointed graph state (current step and step outputs)"""
+    from ..workflow.agent import get_workflow_agent
 
+    state = get_workflow_agent().get_workflow_state(request_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="No checkpoint found for this request")
+    return state
 
-@router.get("/workflow/events/{request_id}", response_model=List[WorkflowEvent])
-async def get_workflow_events(request_id: str):
-    """Get all workflow events for a request (for timeline UI)"""
-    events = credit_tools.get_workflow_events(request_id)
-    if not events:
+
+@router.get(
+    "/workflow/events/{request_id}",
+    response_class=Response,
+    responses={
+        200: {
+            "model": List[WorkflowEvent],
+            "description": "Events newer than `since`, in `seq` order (stored JSON, not re-validated)",
+            "headers": {
+                "X-Last-Seq": {"description": "Cursor to pass as `since` on the next poll", "schema": {"type": "integer"}},
+                "ETag": {"description": "Validator for If-None-Match", "schema": {"type": "string"}},
+            },
+        },
+        304: {"description": "No new events since the client's ETag"},
+        404: {"description": "No events found for this request"},
+    },
+)
+async def get_workflow_events(
+    request_id: str,
+    request: Request,
+    since: int = Query(0, ge=0, description="Only return events with seq greater than this cursor")
+):
+    """
+    Get workflow events for a request (for timeline UI)
+    Poll with ?since=<last seq> to receive only new events; X-Last-Seq
+    carries the cursor for the next poll
+    """
+    # Events are stored pre-serialized; send them as-is instead of re-validating
+    result = credit_tools.get_workflow_events_json(request_id, since=since)
+    if result is None:
         raise HTTPException(status_code=404, detail="No events found for this request")
-    return events
+
+    body, etag, last_seq = result
+    return conditional_json(request, body, etag=etag, headers={"X-Last-Seq": str(last_seq)})
+
+
+@router.get("/workflow/{request_id}/view")
+async def get_workflow_view(
+    request_id: str,
+    request: Request,
+    since: int = Query(0, ge=0, description="Event cursor (last seq) of the client's previous view")
+):
+    """
+    Everything the workflow page needs in one response: status (with the
+    summary once completed), events newer than `since` and, on the first
+    poll (since=0), the credit request and customer snapshot.
+    `cursor` is the `since` of the next poll; unchanged views answer 304
+    """
+    status = active_workflows.get_raw(request_id)
+    credit_request = credit_tools.requests_db.get_raw(request_id)
+    if status is None and credit_request is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    # Stored JSON is spliced in as-is; only the snapshot is re-rendered (ageing aliases)
+    events = credit_tools.get_workflow_events_json(request_id, since=since)
+    events_body, cursor = (events[0], events[2]) if events else (b"[]", since)
+    parts = [
+        b'{"request_id":', dumps(request_id),
+        b',"cursor":', str(cursor).encode(),
+        b',"status":', status.encode("utf-8") if status else b"null",
+        b',"events":', events_body
+    ]
+    if since == 0 and credit_request is not None:
+        try:
+            customer = dumps(credit_tools.get_customer_snapshot(json.loads(credit_request)["customer_id"]))
+        except ValueError:
+            customer = b"null"
+        parts += [b',"request":', credit_request.encode("utf-8"), b',"customer":', customer]
+
+    return conditional_json(request, b"".join(parts) + b"}")
+
+
+@router.get("/workflow/analysis/{request_id}/stream")
+async def stream_analysis(request_id: str, request: Request):
+    """
+    Server-sent events of the AI analysis as it is generated:
+    start, recommendation / rationale deltas, then done (final recommendation) or error.
+    Reconnects resume after the Last-Event-ID ("<generation>:<seq>"); after a
+    re-run of the analysis they restart at its "start" event
+    """
+    cursor = request.headers.get("last-event-id", "")
+
+    async def events():
+        nonlocal cursor
+        deadline = asyncio.get_running_loop().time() + ANALYSIS_STREAM_TIMEOUT
+        while asyncio.get_running_loop().time() < deadline:
+            for event_id, item in read_stream(request_id, cursor):
+                cursor = event_id
+                yield {"event": item["type"], "id": event_id, "data": json.dumps(item)}
+                if item["type"] in ("done", "error"):
+                    return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(ANALYSIS_STREAM_POLL)
+
+    return EventSourceResponse(events())
 
 
 @router.post("/workflow/approve/{request_id}")
@@ -133,31 +426,88 @@ async def submit_approval(request_id: str, decision: ApproverDecision):
         # Validate request exists
         credit_tools.get_credit_request(request_id)
 
-        # Store decision
-        credit_tools.set_approver_decision(request_id, decision)
+        # Store decision; a run parked in the approval inbox is resumed
+        resumed = None
+        if request_id in approval_inbox:
+            try:
+                approval_inbox.decide({request_id: decision})
+            except NotAwaitingApproval:
+                # Another decision claimed the entry first
+                raise HTTPException(status_code=409, detail="Decision already recorded for this request")
+            resumed = resume_decided_workflows([request_id])[request_id]
+        else:
+            credit_tools.set_approver_decision(request_id, decision)
 
         return {
             "message": "Approval decision recorded",
             "request_id": request_id,
-            "decision": decision.decision.value
+            "decision": decision.decision.value,
+            "resumed": resumed
         }
 
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.get("/approvals/inbox")
+async def get_approval_inbox(
+    sort: str = Query("age", pattern="^(confidence|exposure|age)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Requests waiting for a decision (APPROVAL_MODE=inbox), sorted by confidence, exposure or age"""
+    total, items = approval_inbox.list(sort, order == "desc", limit, offset)
+    return {"total": total, "items": items}
+
+
+@router.post("/approvals/bulk")
+def submit_bulk_approvals(body: BulkApprovalRequest):
+    """
+    Record many decisions at once, all or none (409 lists requests that are
+    not awaiting approval), then resume their workflows together
+    """
+    decisions = {
+        item.request_id: ApproverDecision(**item.model_dump(exclude={"request_id"})) for item in body.decisions
+    }
+    if len(decisions) != len(body.decisions):
+        raise HTTPException(status_code=400, detail="Duplicate request_id in decisions")
+
+    try:
+        decided = approval_inbox.decide(decisions)
+    except NotAwaitingApproval as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "request_ids": e.request_ids})
+
+    return {"decided": len(decided), "resumed": resume_decided_workflows(decided)}
+
+
 @router.get("/workflow/summary/{request_id}", response_model=WorkflowSummary)
-async def get_workflow_summary(request_id: str):
+async def get_workflow_summary(request_id: str, request: Request):
     """Get complete workflow summary (for demo presentation)"""
-    if request_id not in active_workflows:
-        raise HTTPException(status_code=404, detail="Workflow not found")
+    # Completed workflows have a pre-rendered artifact: serve its bytes directly
+    artifact = summary_artifacts.get_for_request(request_id)
+    if artifact is not None:
+        return artifact_response(request, artifact)
 
-    workflow_data = active_workflows[request_id]
+    workflow_data = active_workflows.get(request_id)
+    if workflow_data is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
 
     if workflow_data["status"] != "completed":
         raise HTTPException(status_code=400, detail=f"Workflow not completed yet. Status: {workflow_data['status']}")
 
-    return WorkflowSummary(**workflow_data["result"])
+    summary = WorkflowSummary(**workflow_data["result"])
+    return conditional_json(request, dumps(summary))
+
+
+@router.get("/workflow/summary/{request_id}/{digest}", response_model=WorkflowSummary)
+async def get_workflow_summary_artifact(request_id: str, digest: str, request: Request):
+    """Content-addressed summary artifact (immutable, cacheable for a year)"""
+    artifact = summary_artifacts.get(request_id, digest)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Summary artifact not found")
+
+    return artifact_response(request, artifact, cache_control=IMMUTABLE_CACHE_CONTROL)
 
 
 @router.post("/demo/quick-run/{scenario}")
@@ -212,25 +562,22 @@ async def demo_quick_run(scenario: str):
     credit_tools.set_approver_decision(request.request_id, auto_decision)
 
     # Run workflow synchronously for demo
-    try:
-        result = workflow_agent.execute_workflow(request.request_id)
-
-        active_workflows[request.request_id] = {
-            "status": "completed",
-            "started_at": datetime.now().isoformat(),
-            "completed_at": datetime.now().isoformat(),
-            "result": result.model_dump()
-        }
-
-        return {
-            "message": "Demo workflow completed",
-            "request_id": request.request_id,
-            "scenario": scenario,
-            "summary": result.model_dump()
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Workflow failed: {str(e)}")
+    lease = workflow_lease(request.request_id)
+    if not lease.acquire():
+        raise HTTPException(status_code=409, detail="Workflow already running for this request")
+    mark_running(request.request_id, lease)
+    result = run_workflow(request.request_id, lease)
+
+    if result is None:
+        error = active_workflows.get(request.request_id, {}).get("error")
+        raise HTTPException(status_code=500, detail=f"Workflow failed: {error}")
+
+    return FastJSONResponse({
+        "message": "Demo workflow completed",
+        "request_id": request.request_id,
+        "scenario": scenario,
+        "summary": result
+    })
 
 
 @router.get("/demo/customers")
@@ -0,0 +1,19 @@
+# CLI modules (python -m app.bulk.<module>): load them on first access, so
+# running one does not import it a second time as part of the package
+_EXPORTS = {
+    "IMPORT_DIR": "snapshot_import",
+    "import_snapshots": "snapshot_import",
+    "import_status": "snapshot_import",
+    "start_import": "snapshot_import",
+    "AUDIT_FORMATS": "audit_export",
+    "AuditRecord": "audit_export",
+    "export_audit": "audit_export",
+    "iter_audit_records": "audit_export",
+}
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        from importlib import import_module
+        return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
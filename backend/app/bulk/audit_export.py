@@ -0,0 +1,251 @@
+"""
+Audit Export
+Streams every credit decision in a date range (request, AI recommendation,
+approver decision, SAP update and workflow events) as NDJSON or Parquet,
+one request at a time, so memory stays flat however many rows are exported.
+
+CLI (from backend/):
+    python -m app.bulk.audit_export --since 2024-04-01 --until 2024-06-30T23:59:59 -o q2.ndjson
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+if __name__ == "__main__":
+    # Run as a CLI: load backend/.env before the state store below is created
+    load_dotenv()
+
+from ..state import MemoryStateStore, state_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: NDJSON only
+    pa = pq = None
+
+
+AUDIT_FORMATS = ("ndjson", "parquet")
+
+# Bytes per streamed chunk (NDJSON) and records per row group (Parquet)
+CHUNK_BYTES = int(os.getenv("AUDIT_EXPORT_CHUNK_BYTES", str(256 * 1024)))
+ROW_GROUP_SIZE = int(os.getenv("AUDIT_EXPORT_ROW_GROUP", "10000"))
+
+
+class AuditRecord(NamedTuple):
+    record_type: str  # request | ai_recommendation | approver_decision | sap_update | event
+    request_id: str
+    customer_id: str
+    request_created_at: str
+    seq: Optional[int]  # event sequence number (events only)
+    data: str  # the record's stored JSON, exported verbatim
+
+
+# --- Records ---
+
+def _requests(customer_id: Optional[str]) -> Iterator[str]:
+    """Raw request records, through the customer index when filtering by customer"""
+    if customer_id:
+        for request_id in state_store.read_list("customer_requests", customer_id):
+            raw = state_store.get("requests", request_id)
+            if raw is not None:
+                yield raw
+    else:
+        for _, raw in state_store.scan("requests"):
+            yield raw
+
+
+def _in_range(created_at: str, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    if since is None and until is None:
+        return True
+    created = datetime.fromisoformat(created_at)
+    return not ((since and created < since) or (until and created > until))
+
+
+def iter_audit_records(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    customer_id: Optional[str] = None
+) -> Iterator[AuditRecord]:
+    """
+    Audit records grouped by request (store order, not time order)
+    Recommendation, decision and SAP result come from the workflow's last
+    checkpoint; requests that never ran only export the request and events.
+    """
+    for raw in _requests(customer_id):
+        request = json.loads(raw)
+        if not _in_range(request["created_at"], since, until):
+            continue
+
+        request_id = request["request_id"]
+        context = (request_id, request["customer_id"], request["created_at"])
+        yield AuditRecord("request", *context, None, raw)
+
+        checkpoint = state_store.get("checkpoints", request_id)
+        state = json.loads(checkpoint)["state"] if checkpoint is not None else {}
+        for record_type, key in (
+            ("ai_recommendation", "ai_recommendation"),
+            ("approver_decision", "approver_decision"),
+            ("sap_update", "sap_result"),
+        ):
+            if state.get(key):
+                yield AuditRecord(record_type, *context, None, json.dumps(state[key], separators=(",", ":")))
+
+        # A decision submitted while the workflow waits is not checkpointed yet
+        if not state.get("approver_decision"):
+            decision = state_store.get("approvals", request_id)
+            if decision is not None:
+                yield AuditRecord("approver_decision", *context, None, decision)
+
+        for seq, event in enumerate(state_store.read_list("events", request_id), start=1):
+            yield AuditRecord("event", *context, seq, event)
+
+
+# --- Writers (yield bytes chunks, for StreamingResponse or a file) ---
+
+def _ndjson_line(record: AuditRecord) -> str:
+    head = json.dumps({
+        "record_type": record.record_type,
+        "request_id": record.request_id,
+        "customer_id": record.customer_id,
+        "request_created_at": record.request_created_at,
+        "seq": record.seq
+    }, separators=(",", ":"))
+    # Splice the stored JSON in as "data" instead of decoding and re-encoding it
+    return f'{head[:-1]},"data":{record.data}}}\n'
+
+
+def export_ndjson(records: Iterator[AuditRecord]) -> Iterator[bytes]:
+    buffer: List[str] = []
+    size = 0
+    for record in records:
+        line = _ndjson_line(record)
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only stream whose bytes are handed out as they are produced"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position  # Parquet footer offsets need the absolute position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("record_type", pa.string()),
+        ("request_id", pa.string()),
+        ("customer_id", pa.string()),
+        ("request_created_at", pa.string()),
+        ("seq", pa.int64()),
+        ("data", pa.string()),
+    ])
+
+
+def export_parquet(records: Iterator[AuditRecord]) -> Iterator[bytes]:
+    """One row group per ROW_GROUP_SIZE records; `data` holds the record JSON"""
+    if pq is None:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+
+    def flush(rows: List[AuditRecord]) -> bytes:
+        columns = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        return sink.drain()
+
+    rows: List[AuditRecord] = []
+    for record in records:
+        rows.append(record)
+        if len(rows) >= ROW_GROUP_SIZE:
+            yield flush(rows)
+            rows = []
+    if rows:
+        yield flush(rows)
+
+    writer.close()
+    yield sink.drain()
+
+
+def export_audit(
+    fmt: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    customer_id: Optional[str] = None
+) -> Iterator[bytes]:
+    """Export stream in `fmt`; raises ValueError up front for an unavailable format"""
+    if fmt not in AUDIT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and pq is None:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    records = iter_audit_records(since, until, customer_id)
+    return export_parquet(records) if fmt == "parquet" else export_ndjson(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export credit decisions and workflow events for audit")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO date/time (inclusive)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO date/time (inclusive)")
+    parser.add_argument("--customer", help="Only this customer_id")
+    parser.add_argument("--format", choices=AUDIT_FORMATS, default="ndjson")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout, NDJSON only)")
+    args = parser.parse_args()
+
+    if args.output is None and args.format == "parquet":
+        parser.error("--output is required for Parquet")
+    if isinstance(state_store, MemoryStateStore):
+        print(
+            "WARNING: STATE_BACKEND is memory: exporting this process's demo data, not the API's records. "
+            "Set STATE_BACKEND in backend/.env or the environment",
+            file=sys.stderr
+        )
+
+    chunks = export_audit(args.format, args.since, args.until, args.customer)
+    if args.output is None:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        return
+
+    written = 0
+    with open(args.output, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    print(f"AUDIT EXPORT: wrote {written:,} bytes to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Customer Snapshot Bulk Import
+Streams an S/4HANA customer extract (CSV or Parquet) into the customer
+store in validated batches, one transaction per batch, in bounded memory.
+Rejected rows go to an NDJSON error file with the reason.
+
+CLI (from backend/):
+    python -m app.bulk.snapshot_import extract.csv --errors rejected.ndjson
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+if __name__ == "__main__":
+    # Run as a CLI: load backend/.env before the state store below is created
+    load_dotenv()
+
+from ..models.schemas import CustomerSnapshot
+from ..state import MemoryStateStore, state_store
+from ..tools.credit_tools import credit_tools
+from ..tools.snapshot_history import snapshot_history
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional: CSV only
+    pq = None
+
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+IMPORT_DIR = os.getenv("IMPORT_DIR", "data/imports")
+
+# Progress / result records of API-started imports
+import_status = state_store.namespace("imports")
+
+# Extract columns (CSV header / Parquet field names)
+AGEING_COLUMNS = {
+    "ageing_0_30": "0_30",
+    "ageing_31_60": "31_60",
+    "ageing_61_90": "61_90",
+    "ageing_90_plus": "90_plus",
+}
+REQUIRED_COLUMNS = (
+    "customer_id", "name", "segment", "current_limit", "credit_block",
+    "utilisation_pct", "dso", "risk_category", *AGEING_COLUMNS
+)
+
+# SAP flags are "X" / blank
+_TRUE_FLAGS = {"x", "true", "1", "yes", "y"}
+_FALSE_FLAGS = {"", "false", "0", "no", "n"}
+
+
+class ImportReport:
+    """Running counters of one import (also the progress record)"""
+
+    def __init__(self, import_id: str, source: str, error_path: str):
+        self.import_id = import_id
+        self.source = source
+        self.error_path = error_path
+        self.rows_read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat()
+
+    @property
+    def rows_per_s(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return round(self.rows_read / elapsed, 1) if elapsed > 0 else 0.0
+
+    def as_dict(self, status: str) -> Dict[str, Any]:
+        return {
+            "import_id": self.import_id,
+            "status": status,
+            "source": self.source,
+            "rows_read": self.rows_read,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "rows_per_s": self.rows_per_s,
+            "elapsed_s": round(time.perf_counter() - self.started, 2),
+            "started_at": self.started_at,
+            "error_file": self.error_path if self.rejected else None
+        }
+
+
+# --- Readers (yield raw rows one at a time) ---
+
+def _read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = set(REQUIRED_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Extract is missing columns: {', '.join(sorted(missing))}")
+        yield from reader
+
+
+def _read_parquet(path: str) -> Iterator[Dict[str, Any]]:
+    if pq is None:
+        raise ValueError("Parquet import requires pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    missing = set(REQUIRED_COLUMNS) - set(parquet.schema_arrow.names)
+    if missing:
+        raise ValueError(f"Extract is missing columns: {', '.join(sorted(missing))}")
+    # Row groups are decoded one record batch at a time
+    for batch in parquet.iter_batches(batch_size=BATCH_SIZE):
+        yield from batch.to_pylist()
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Raw extract rows, streamed (format by file extension)"""
+    if path.lower().endswith((".parquet", ".pq")):
+        return _read_parquet(path)
+    return _read_csv(path)
+
+
+# --- Validation ---
+
+def _text(value: Any) -> Any:
+    return value.strip() if isinstance(value, str) else value
+
+
+def _flag(value: Any) -> Any:
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_FLAGS:
+            return True
+        if text in _FALSE_FLAGS:
+            return False
+    return value
+
+
+def to_snapshot(row: Dict[str, Any]) -> CustomerSnapshot:
+    """Extract row -> CustomerSnapshot (raises ValidationError)"""
+    data = {
+        "customer_id": _text(row.get("customer_id")),
+        "name": row.get("name"),
+        "segment": row.get("segment"),
+        "current_limit": row.get("current_limit"),
+        "currency": row.get("currency") or "INR",
+        "credit_block": _flag(row.get("credit_block")),
+        "utilisation_pct": row.get("utilisation_pct"),
+        "dso": row.get("dso"),
+        "risk_category": _text(row.get("risk_category")),
+        "ageing": {alias: row.get(column) for column, alias in AGEING_COLUMNS.items()}
+    }
+    return CustomerSnapshot.model_validate(data)
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    batch = []
+    # Row numbers count data rows from 1 (CSV line = row + 1)
+    for number, row in enumerate(rows, start=1):
+        batch.append((number, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+        )
+    return str(error)
+
+
+# --- Import ---
+
+def import_snapshots(
+    path: str,
+    error_path: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    import_id: Optional[str] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Stream `path` into the customer store; returns the final report
+    Memory is bounded by one batch, whatever the file size. A row whose
+    customer appears again later in the file is superseded (last row wins).
+    """
+    import_id = import_id or uuid.uuid4().hex[:12]
+    error_path = error_path or os.path.join(IMPORT_DIR, f"{import_id}.errors.ndjson")
+    os.makedirs(os.path.dirname(os.path.abspath(error_path)), exist_ok=True)
+
+    report = ImportReport(import_id, path, error_path)
+    customers = credit_tools.customers_db
+
+    with open(error_path, "w", encoding="utf-8") as errors:
+        for batch in _batches(read_rows(path), batch_size):
+            valid: Dict[str, CustomerSnapshot] = {}
+            for number, row in batch:
+                try:
+                    snapshot = to_snapshot(row)
+                    valid[snapshot.customer_id] = snapshot
+                except (ValidationError, ValueError, TypeError) as e:
+                    report.rejected += 1
+                    errors.write(json.dumps({"row": number, "error": _error_message(e), "data": row}, default=str))
+                    errors.write("\n")
+
+            # One transaction per batch (and one for the batch's history points)
+            if valid:
+                customers.put_many(valid)
+                snapshot_history.record_many(valid.values())
+
+            report.rows_read += len(batch)
+            report.imported += len(valid)
+            report.batches += 1
+            if on_progress:
+                on_progress(report.as_dict("running"))
+
+    if not report.rejected:
+        os.remove(error_path)
+
+    return report.as_dict("completed")
+
+
+def start_import(path: str, import_id: str) -> threading.Thread:
+    """Run an import in the background, recording progress in `import_status`"""
+    import_status[import_id] = {"import_id": import_id, "status": "queued", "source": os.path.basename(path)}
+
+    def run():
+        def progress(status: Dict[str, Any]):
+            import_status[import_id] = status
+
+        try:
+            import_status[import_id] = import_snapshots(path, import_id=import_id, on_progress=progress)
+        except Exception as e:
+            import_status[import_id] = {**(import_status.get(import_id) or {}), "status": "failed", "error": str(e)}
+        finally:
+            # The uploaded extract is no longer needed
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=run, name=f"import-{import_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import customer snapshots from an S/4HANA extract")
+    parser.add_argument("path", help="CSV or Parquet extract")
+    parser.add_argument("--errors", help="NDJSON file for rejected rows (default: IMPORT_DIR/<id>.errors.ndjson)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if isinstance(state_store, MemoryStateStore):
+        parser.error(
+            "STATE_BACKEND is memory: the import would be lost when this process exits. "
+            "Set STATE_BACKEND (sqlite:///... or redis://...) in backend/.env or the environment"
+        )
+
+    def progress(status: Dict[str, Any]):
+        print(
+            f"IMPORT {status['import_id']}: {status['rows_read']:,} rows "
+            f"({status['imported']:,} imported, {status['rejected']:,} rejected) at {status['rows_per_s']:,.0f} rows/s"
+        )
+
+    report = import_snapshots(args.path, args.errors, args.batch_size, on_progress=progress)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+from .profiler import PROFILE_MAX_S, PROFILE_INTERVAL_MS, Profile, ProfilerBusyError, SamplingProfiler, cpu_profiler
+from .allocations import GROUP_BY, AllocationTracker, UnknownSnapshotError, allocation_tracker
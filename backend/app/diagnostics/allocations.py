@@ -0,0 +1,159 @@
+"""
+Allocation Tracking
+tracemalloc on demand: named snapshots, a top-allocators diff between two
+of them, and per-workflow allocation counts while tracing is on.
+"""
+import itertools
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List
+
+# Snapshots kept for diffs (oldest dropped) and workflow runs kept for the report
+MAX_SNAPSHOTS = 8
+MAX_WORKFLOW_RECORDS = 500
+GROUP_BY = ("lineno", "filename", "traceback")
+
+
+class UnknownSnapshotError(KeyError):
+    """No snapshot with this id (never taken, dropped, or tracing restarted)"""
+
+
+class AllocationTracker:
+    """tracemalloc control, snapshot diffs and per-workflow allocation records"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._workflows: Deque[Dict[str, Any]] = deque(maxlen=MAX_WORKFLOW_RECORDS)
+        self._in_flight = 0
+        self._runs_started = 0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        """Start tracing (deeper tracebacks cost more memory and time per allocation)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        """Stop tracing and drop the snapshots (they pin the traced memory records)"""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        with self._lock:
+            snapshots = list(self._snapshots)
+        return {
+            "tracing": self.tracing,
+            "traceback_frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "traced_bytes": current,
+            "peak_traced_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if self.tracing else 0,
+            "snapshots": snapshots
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Take a snapshot now (tracing must be on); returns its id and size"""
+        if not self.tracing:
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        # The tracker's own frames would only add noise to diffs
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ))
+        snapshot_id = f"s{next(self._ids)}"
+        with self._lock:
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return {
+            "snapshot_id": snapshot_id,
+            "taken_at": time.time(),
+            "traced_bytes": sum(trace.size for trace in snapshot.traces)
+        }
+
+    def _get(self, snapshot_id: str) -> tracemalloc.Snapshot:
+        with self._lock:
+            snapshot = self._snapshots.get(snapshot_id)
+        if snapshot is None:
+            raise UnknownSnapshotError(snapshot_id)
+        return snapshot
+
+    def diff(self, base: str, target: str, group_by: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+        """Top allocators by growth from snapshot `base` to `target`"""
+        stats = self._get(target).compare_to(self._get(base), group_by)
+        return {
+            "base": base,
+            "target": target,
+            "group_by": group_by,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "count_diff": sum(stat.count_diff for stat in stats),
+            "top": [
+                {
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size_bytes": stat.size,
+                    "count": stat.count
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    @contextmanager
+    def track_workflow(self, request_id: str) -> Iterator[None]:
+        """
+        Record allocations around one workflow run while tracing is on
+        Counters are process-wide: `overlapped` marks runs that shared the
+        process with another workflow, whose figures include both
+        """
+        if not self.tracing:
+            yield
+            return
+
+        with self._lock:
+            self._in_flight += 1
+            self._runs_started += 1
+            run = self._runs_started
+            overlapped = self._in_flight > 1
+            if not overlapped:
+                tracemalloc.reset_peak()
+        started = time.perf_counter()
+        blocks_before = sys.getallocatedblocks()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            traced_after, peak = tracemalloc.get_traced_memory() if self.tracing else (traced_before, 0)
+            record = {
+                "request_id": request_id,
+                "finished_at": time.time(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "net_blocks": sys.getallocatedblocks() - blocks_before,
+                "net_traced_bytes": traced_after - traced_before,
+                "peak_growth_bytes": peak - traced_before
+            }
+            with self._lock:
+                self._in_flight -= 1
+                record["overlapped"] = overlapped or self._in_flight > 0 or self._runs_started != run
+                self._workflows.append(record)
+
+    def workflows(self, limit: int = 50, sort: str = "net_traced_bytes") -> List[Dict[str, Any]]:
+        """Recorded workflow runs, largest first"""
+        with self._lock:
+            records = list(self._workflows)
+        records.sort(key=lambda record: record[sort], reverse=True)
+        return records[:limit]
+
+
+# Singleton instance
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,137 @@
+"""
+Sampling CPU Profiler
+Samples the Python stacks of every thread at a fixed interval for a bounded
+time, in-process (no restart, no native tooling). Results export as collapsed
+stacks (flamegraph.pl / speedscope) or a speedscope JSON file.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_MAX_S = float(os.getenv("PROFILE_MAX_S", "120"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+
+# One frame: (function, file, first line of the function)
+Frame = Tuple[str, str, int]
+
+
+class ProfilerBusyError(RuntimeError):
+    """A profile is already being recorded"""
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class Profile:
+    """Aggregated samples: (thread name, root-to-leaf stack) -> sample count"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+
+    def collapsed(self) -> str:
+        """One line per distinct stack: `thread;frame;...;frame count`"""
+        return "".join(
+            f"{';'.join([thread, *(_frame_label(frame) for frame in stack)])} {count}\n"
+            for (thread, stack), count in self.stacks.most_common()
+        )
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope file: one sampled profile per thread, weights in seconds"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread, stack), count in self.stacks.most_common():
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": round(self.duration, 3), "samples": [], "weights": []
+            })
+            profile["samples"].append([index[frame] for frame in stack])
+            profile["weights"].append(round(count * self.interval, 6))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"CreditWorkflowAgent {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}",
+            "exporter": "CreditWorkflowAgent sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values())
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "duration_s": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "distinct_stacks": len(self.stacks)
+        }
+
+
+class SamplingProfiler:
+    """Records one profile at a time on a background sampling thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.profile: Optional[Profile] = None  # running or last finished
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_ms: float = PROFILE_INTERVAL_MS) -> Profile:
+        """Sample for up to `seconds` (capped at PROFILE_MAX_S); raises ProfilerBusyError"""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusyError("A profile is already running")
+            self._stop = threading.Event()
+            self.profile = Profile(max(interval_ms, 1) / 1000)
+            self._thread = threading.Thread(
+                target=self._sample, args=(self.profile, min(seconds, PROFILE_MAX_S), self._stop),
+                name="cpu-profiler", daemon=True
+            )
+            self._thread.start()
+            return self.profile
+
+    def stop(self) -> Optional[Profile]:
+        """End the running profile early (no-op when finished); returns the last profile"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.profile
+
+    def _sample(self, profile: Profile, seconds: float, stop: threading.Event):
+        me = threading.get_ident()
+        started = time.monotonic()
+        deadline = started + seconds
+        while time.monotonic() < deadline and not stop.wait(profile.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                profile.stacks[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+            profile.samples += 1
+            profile.duration = time.monotonic() - started
+        print(f"PROFILER: {profile.samples} samples in {profile.duration:.1f}s")
+
+
+# Singleton instance
+cpu_profiler = SamplingProfiler()
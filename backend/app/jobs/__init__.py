@@ -0,0 +1,2 @@
+from .job_queue import Job, JobQueue, DuplicateJobError, get_job_queue
+from .sharding import JOB_SHARDING, CustomerShard, HashRing
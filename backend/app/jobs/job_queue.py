@@ -0,0 +1,347 @@
+"""
+Durable Job Queue
+Embedded SQLite job queue shared by the API and the worker pool on one
+node, so workflows survive restarts without running a separate broker.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    dedupe_key TEXT,
+    shard_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    leased_by TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, available_at);
+CREATE INDEX IF NOT EXISTS jobs_shard ON jobs (shard_key, status);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('pending', 'running');
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT,
+    shard_key TEXT,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+# Scheduler priority classes mapped to queue ordering
+PRIORITY_VALUES = {"high": 2, "normal": 1, "low": 0}
+
+# A worker that has not heartbeated for this long leaves the shard ring
+SHARD_MEMBER_TTL = float(os.getenv("SHARD_MEMBER_TTL", "15"))
+
+
+class DuplicateJobError(Exception):
+    """Raised when a job with the same dedupe key is already pending or running"""
+
+
+@dataclass
+class Job:
+    """A claimed job; `attempt` is 1 on first delivery"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    attempt: int
+    max_attempts: int
+    worker: str
+
+
+class JobQueue:
+    """
+    At-least-once job queue on a SQLite file
+    A claimed job is invisible to other workers until its visibility timeout
+    expires; workers extend it while they run, so only crashed workers'
+    jobs are redelivered.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        busy_timeout_ms: int = 5000
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout or float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.backoff_base = backoff_base or float(os.getenv("JOB_BACKOFF_BASE", "5"))
+        self.backoff_max = backoff_max or float(os.getenv("JOB_BACKOFF_MAX", "300"))
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Producer side ---
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: str = "normal",
+        dedupe_key: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None,
+        shard_key: Optional[str] = None
+    ) -> str:
+        """
+        Add a job; raises DuplicateJobError if `dedupe_key` is already queued or running
+        Jobs with the same `shard_key` (customer) run one at a time, oldest first
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, priority, dedupe_key, shard_key, status, max_attempts, "
+                    "available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?, ?)",
+                    (
+                        job_id, kind, json.dumps(payload), PRIORITY_VALUES.get(priority, 1), dedupe_key,
+                        shard_key, max_attempts or self.max_attempts, now + delay, now, now
+                    )
+                )
+        except sqlite3.IntegrityError:
+            raise DuplicateJobError(f"Job already queued: {dedupe_key}")
+        return job_id
+
+    def pending_count(self) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    # --- Consumer side ---
+
+    def claim(self, worker: str, owns: Optional[Callable[[str], bool]] = None) -> Optional[Job]:
+        """
+        Take the next ready job (highest priority, oldest first), including
+        running jobs whose worker let the visibility timeout lapse
+        A sharded job is skipped while an older job of its shard is pending or
+        another is running, and, with `owns`, unless owns(shard_key) is true.
+        """
+        now = time.time()
+        self._conn().create_function("owns_shard", 1, (lambda key: bool(owns(key))) if owns else (lambda key: True))
+        with self._write() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT id, kind, payload, attempts, max_attempts FROM jobs "
+                    "WHERE ((status = 'pending' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_expires_at <= ?)) "
+                    "AND (shard_key IS NULL OR (owns_shard(shard_key) AND NOT EXISTS ("
+                    "SELECT 1 FROM jobs other WHERE other.shard_key = jobs.shard_key AND other.id != jobs.id "
+                    "AND ((other.status = 'running' AND other.lease_expires_at > ?) "
+                    "OR (other.status = 'pending' AND other.created_at < jobs.created_at))))) "
+                    "ORDER BY priority DESC, available_at LIMIT 1",
+                    (now, now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job_id, kind, payload, attempts, max_attempts = row
+                if attempts < max_attempts:
+                    break
+
+                # Its worker died during the final attempt
+                self._dead_letter(conn, job_id, "Visibility timeout expired on final attempt", now)
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, leased_by = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (worker, now + self.visibility_timeout, now, job_id)
+            )
+
+        return Job(job_id, kind, json.loads(payload), attempts + 1, max_attempts, worker)
+
+    def extend(self, job: Job) -> bool:
+        """Push back the visibility timeout; False if the job was taken over"""
+        now = time.time()
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND leased_by = ?",
+                (now + self.visibility_timeout, now, job.id, job.worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job: Job):
+        """Acknowledge a finished job (removes it from the queue)"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ? AND leased_by = ?", (job.id, job.worker))
+
+    def fail(self, job: Job, error: str) -> bool:
+        """
+        Record a failed attempt: reschedule with exponential backoff and
+        jitter, or move the job to the dead-letter table after max_attempts
+        Returns True if the job will be retried
+        """
+        now = time.time()
+        with self._write() as conn:
+            if job.attempt < job.max_attempts:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempt - 1))
+                delay *= random.uniform(0.8, 1.2)
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', available_at = ?, leased_by = NULL, "
+                    "lease_expires_at = NULL, last_error = ?, updated_at = ? WHERE id = ? AND leased_by = ?",
+                    (now + delay, error, now, job.id, job.worker)
+                )
+                return True
+
+            self._dead_letter(conn, job.id, error, now)
+            return False
+
+    def _dead_letter(self, conn: sqlite3.Connection, job_id: str, error: str, now: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO dead_letters (id, kind, payload, dedupe_key, shard_key, attempts, last_error, "
+            "created_at, failed_at) SELECT id, kind, payload, dedupe_key, shard_key, attempts, ?, created_at, ? "
+            "FROM jobs WHERE id = ?",
+            (error, now, job_id)
+        )
+        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def release(self, job: Job):
+        """Hand an unstarted job back without counting the attempt (shutdown)"""
+        now = time.time()
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = attempts - 1, leased_by = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND leased_by = ?",
+                (now, job.id, job.worker)
+            )
+
+    # --- Worker membership (customer sharding) ---
+
+    def heartbeat_worker(self, worker: str):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (worker, time.time())
+            )
+
+    def live_workers(self, ttl: float) -> List[str]:
+        """Workers that heartbeated within `ttl` seconds (stale rows are pruned)"""
+        cutoff = time.time() - ttl
+        with self._write() as conn:
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (cutoff - ttl,))
+            rows = conn.execute("SELECT id FROM workers WHERE heartbeat_at >= ? ORDER BY id", (cutoff,)).fetchall()
+        return [row[0] for row in rows]
+
+    def remove_worker(self, worker: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker,))
+
+    # --- Inspection ---
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, kind, payload, shard_key, attempts, last_error, created_at, failed_at "
+            "FROM dead_letters ORDER BY failed_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {
+                "id": row[0], "kind": row[1], "payload": json.loads(row[2]), "shard_key": row[3],
+                "attempts": row[4], "last_error": row[5], "created_at": row[6], "failed_at": row[7]
+            }
+            for row in rows
+        ]
+
+    def requeue_dead_letter(self, job_id: str) -> bool:
+        """Move a dead-lettered job back to the queue with fresh attempts"""
+        now = time.time()
+        try:
+            with self._write() as conn:
+                row = conn.execute(
+                    "SELECT kind, payload, dedupe_key, shard_key, created_at FROM dead_letters WHERE id = ?", (job_id,)
+                ).fetchone()
+                if row is None:
+                    return False
+                # Keeps its shard key: still one job at a time per customer
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, priority, dedupe_key, shard_key, status, max_attempts, "
+                    "available_at, created_at, updated_at) VALUES (?, ?, ?, 1, ?, ?, 'pending', ?, ?, ?, ?)",
+                    (job_id, row[0], row[1], row[2], row[3], self.max_attempts, now, row[4], now)
+                )
+                conn.execute("DELETE FROM dead_letters WHERE id = ?", (job_id,))
+                return True
+        except sqlite3.IntegrityError:
+            raise DuplicateJobError(f"Job already queued: {row[2]}")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute(
+            "SELECT MIN(available_at) FROM jobs WHERE status = 'pending' AND available_at <= ?", (time.time(),)
+        ).fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "dead_letters": conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0],
+            "workers": conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?", (time.time() - SHARD_MEMBER_TTL,)
+            ).fetchone()[0],
+            "oldest_ready_age_s": round(time.time() - oldest, 1) if oldest else 0.0
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Queue at JOB_QUEUE_PATH (created on first use, one per process)"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(os.getenv("JOB_QUEUE_PATH", "data/jobs.db"))
+    return _job_queue
@@ -0,0 +1,98 @@
+"""
+Customer Sharding
+Consistent-hash ring mapping customer ids onto the live job workers, so each
+customer's workflows run on one worker process, in order, while different
+customers run in parallel. A worker joining or leaving moves ~1/N customers.
+"""
+import bisect
+import hashlib
+import os
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .job_queue import SHARD_MEMBER_TTL, JobQueue
+
+# customer: route jobs by consistent hash of customer_id | off: any worker takes any job
+JOB_SHARDING = os.getenv("JOB_SHARDING", "customer")
+
+# Ring points per worker (more = more even split)
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring over worker ids"""
+
+    def __init__(self, members: Iterable[str], vnodes: int = SHARD_VNODES):
+        self.members = tuple(sorted(set(members)))
+        points: List[Tuple[int, str]] = sorted(
+            (_point(f"{member}#{index}"), member) for member in self.members for index in range(vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Worker owning `key` (None on an empty ring)"""
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, _point(key)) % len(self._points)]
+
+
+class CustomerShard:
+    """
+    This worker's slice of the customers
+    A background thread heartbeats the worker's membership and rebuilds the
+    ring when the set of live workers changes; on_rebalance(owns) is then
+    called so local caches can drop customers that moved to another worker.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        worker: str,
+        member_ttl: float = SHARD_MEMBER_TTL,
+        on_rebalance: Optional[Callable[[Callable[[str], bool]], None]] = None
+    ):
+        self.queue = queue
+        self.worker = worker
+        self.member_ttl = member_ttl
+        self.on_rebalance = on_rebalance
+        self.ring = HashRing([worker])
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Join the ring now and keep heartbeating (also while a long job runs)"""
+        self.refresh()
+        self._thread = threading.Thread(target=self._heartbeat, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.member_ttl / 3):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"SHARDING: heartbeat failed: {e}")
+
+    def refresh(self):
+        self.queue.heartbeat_worker(self.worker)
+        members = set(self.queue.live_workers(self.member_ttl)) | {self.worker}
+        if set(self.ring.members) == members:
+            return
+
+        previous = len(self.ring.members)
+        self.ring = HashRing(members)
+        print(f"SHARDING: {self.worker} rebalanced, {previous} -> {len(members)} workers")
+        if self.on_rebalance:
+            self.on_rebalance(self.owns)
+
+    def owns(self, customer_id: str) -> bool:
+        return self.ring.owner(customer_id) == self.worker
+
+    def leave(self):
+        """Drop out of the ring at once (clean shutdown), instead of after the TTL"""
+        self._stop.set()
+        self.queue.remove_worker(self.worker)
@@ -0,0 +1,161 @@
+"""
+Job Worker Pool
+Separate processes that claim jobs from the durable queue and run them,
+so workflow CPU and LLM waits stay off the API processes.
+
+Usage: python -m app.jobs.worker --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Callable, Dict, List
+
+from dotenv import load_dotenv
+
+from .job_queue import Job, JobQueue, get_job_queue
+from .sharding import JOB_SHARDING, CustomerShard
+
+# Seconds a sharded worker keeps its customers' snapshots warm
+SHARD_SNAPSHOT_TTL = float(os.getenv("SHARD_SNAPSHOT_TTL", "30"))
+
+
+def _handlers() -> Dict[str, Callable[[Job], None]]:
+    """Job kind -> handler (imported in the child, after the environment is loaded)"""
+    from ..workflow.runner import WORKFLOW_JOB, run_workflow_job
+    return {WORKFLOW_JOB: run_workflow_job}
+
+
+def _run_job(queue: JobQueue, job: Job, handler: Callable[[Job], None]):
+    """Run one job, extending its visibility timeout until it finishes"""
+    done = threading.Event()
+
+    def heartbeat():
+        while not done.wait(queue.visibility_timeout / 3):
+            if not queue.extend(job):
+                print(f"JOB {job.id}: visibility lost, another worker may take over")
+                return
+
+    thread = threading.Thread(target=heartbeat, name=f"job-heartbeat-{job.id}", daemon=True)
+    thread.start()
+    try:
+        handler(job)
+        queue.complete(job)
+        print(f"JOB {job.id} ({job.kind}) completed on attempt {job.attempt}")
+    except Exception as e:
+        retried = queue.fail(job, str(e))
+        outcome = "will retry" if retried else "moved to dead letters"
+        print(f"JOB {job.id} ({job.kind}) failed on attempt {job.attempt}: {e} ({outcome})")
+    finally:
+        done.set()
+
+
+def worker_loop(stop: "multiprocessing.synchronize.Event", poll_interval: float = 1.0):
+    """Claim and run jobs until `stop` is set; the current job always finishes first"""
+    from ..state import worker_id
+
+    load_dotenv()
+    # The pool parent handles Ctrl-C. A direct SIGTERM only raises a local flag:
+    # touching the shared event inside a signal handler can deadlock on its lock
+    terminated = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: terminated.set())
+
+    queue = get_job_queue()
+    handlers = _handlers()
+    worker = worker_id()
+
+    shard = None
+    if JOB_SHARDING == "customer":
+        from ..tools.credit_tools import credit_tools
+        credit_tools.enable_snapshot_cache(SHARD_SNAPSHOT_TTL)
+        shard = CustomerShard(queue, worker, on_rebalance=credit_tools.evict_snapshots)
+        shard.start()
+
+    # Load the agent before claiming, so the first job does not pay for it
+    from ..startup import readiness
+    readiness.warm_up()
+    print(f"JOB WORKER {worker} started")
+
+    while not (stop.is_set() or terminated.is_set()):
+        job = queue.claim(worker, owns=shard.owns if shard else None)
+        if job is None:
+            terminated.wait(poll_interval)
+            continue
+
+        handler = handlers.get(job.kind)
+        if handler is None:
+            queue.fail(job, f"No handler for job kind: {job.kind}")
+            continue
+
+        _run_job(queue, job, handler)
+
+    if shard:
+        shard.leave()
+    print(f"JOB WORKER {worker} stopped")
+
+
+class WorkerPool:
+    """Supervises worker processes: restarts crashed ones, drains on shutdown"""
+
+    def __init__(self, processes: int, poll_interval: float = 1.0, shutdown_timeout: float = 120):
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.shutdown_timeout = shutdown_timeout
+        # spawn: children must not inherit the parent's threads or SQLite connections
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._signalled = threading.Event()
+        self._children: List[multiprocessing.Process] = []
+
+    def _spawn(self) -> multiprocessing.Process:
+        child = self._ctx.Process(target=worker_loop, args=(self._stop, self.poll_interval), daemon=False)
+        child.start()
+        return child
+
+    def run(self):
+        signal.signal(signal.SIGINT, lambda *_: self._signalled.set())
+        signal.signal(signal.SIGTERM, lambda *_: self._signalled.set())
+
+        self._children = [self._spawn() for _ in range(self.processes)]
+        print(f"JOB POOL: {self.processes} workers on {get_job_queue().path}")
+
+        while not self._signalled.wait(1.0):
+            for index, child in enumerate(self._children):
+                if not child.is_alive():
+                    print(f"JOB POOL: worker pid {child.pid} exited ({child.exitcode}), restarting")
+                    self._children[index] = self._spawn()
+
+        self.shutdown()
+
+    def shutdown(self):
+        """Let running jobs finish; stragglers are killed and redelivered after their visibility timeout"""
+        self._stop.set()
+        print(f"JOB POOL: draining (up to {self.shutdown_timeout:.0f}s)")
+        deadline = time.monotonic() + self.shutdown_timeout
+        for child in self._children:
+            child.join(max(0.0, deadline - time.monotonic()))
+        for child in self._children:
+            if child.is_alive():
+                print(f"JOB POOL: terminating worker pid {child.pid}")
+                child.terminate()
+                child.join(5)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run the workflow job worker pool")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKER_PROCESSES", "2")))
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--shutdown-timeout", type=float, default=float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "120"))
+    )
+    args = parser.parse_args()
+
+    WorkerPool(args.processes, args.poll_interval, args.shutdown_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
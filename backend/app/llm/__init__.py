@@ -0,0 +1,4 @@
+from .prompts import CompiledPrompt, PromptBudgetError, RenderedPrompt, compact, compile_prompt, count_tokens
+from .usage import LLMUsageMetrics, llm_usage
+from .structured import StreamingJSONFields, StructuredResult, function_tool, stream_structured
+from .guard import AttemptCancelled, CircuitBreaker, GuardedResult, LLMGuard, LLMUnavailableError, llm_guard
@@ -0,0 +1,207 @@
+"""
+LLM Call Guard
+Bounds the latency of an LLM call: a hard deadline, a hedged duplicate
+request once the call is slower than the recent latency percentile, and a
+circuit breaker that short-circuits calls after repeated failures. Callers
+fall back to deterministic logic on LLMUnavailableError.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "8"))
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "4"))  # until enough latency samples exist
+HEDGE_MIN_SAMPLES = 20
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+
+
+class LLMUnavailableError(RuntimeError):
+    """The guarded call produced no result (deadline, errors or open circuit)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AttemptCancelled(Exception):
+    """Raised inside an attempt that lost the race or missed the deadline"""
+
+
+class GuardedResult(NamedTuple):
+    value: Any
+    latency_ms: float
+    attempts: int  # 1, or 2 when a hedge was sent
+    winner: int  # index of the attempt whose result was used
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open (one trial) after `reset_s`"""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_s: float = BREAKER_RESET_S):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_s:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._trial_running = False
+            if self.state != "closed":
+                print("LLM GUARD: circuit closed")
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self._consecutive >= self.failures):
+                print(f"LLM GUARD: circuit open for {self.reset_s:.0f}s after {self._consecutive} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LLMGuard:
+    """Runs LLM attempts on a dedicated pool under a deadline, hedging slow calls"""
+
+    def __init__(
+        self,
+        deadline_s: float = DEADLINE_S,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        hedge_after_s: float = HEDGE_AFTER_S,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32
+    ):
+        self.deadline_s = deadline_s
+        self.hedge_percentile = hedge_percentile
+        self.hedge_after_s = hedge_after_s
+        self.breaker = breaker or CircuitBreaker()
+        # Abandoned attempts keep their thread until the HTTP client times out
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self._counters = {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_misses": 0,
+            "failures": 0, "short_circuited": 0
+        }
+
+    def hedge_delay(self) -> float:
+        """Seconds before a duplicate request is sent (recent latency percentile)"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return self.hedge_after_s
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))]
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def call(self, attempt: Callable[[threading.Event, int], Any]) -> GuardedResult:
+        """
+        Run attempt(cancelled, index) and return the first successful result
+        A second attempt starts after hedge_delay() (or at once if the first
+        fails). Raises LLMUnavailableError on deadline, double failure or open circuit.
+        """
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise LLMUnavailableError("circuit open")
+
+        cancelled = threading.Event()
+        started = time.monotonic()
+        deadline = started + self.deadline_s
+        hedge_at = started + self.hedge_delay()
+
+        futures: Dict[Future, int] = {self._executor.submit(attempt, cancelled, 0): 0}
+        errors: List[str] = []
+
+        try:
+            while True:
+                now = time.monotonic()
+                hedged = len(futures) > 1 or bool(errors)
+                if now >= deadline:
+                    self._count("deadline_misses")
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"deadline of {self.deadline_s:.1f}s exceeded")
+                if not hedged and now >= hedge_at:
+                    self._hedge(futures, attempt, cancelled)
+                    continue
+
+                timeout = deadline - now if hedged else min(deadline, hedge_at) - now
+                done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    try:
+                        value = future.result()
+                    except AttemptCancelled:
+                        continue
+                    except Exception as e:
+                        errors.append(f"{type(e).__name__}: {e}")
+                        continue
+
+                    latency = time.monotonic() - started
+                    with self._lock:
+                        self._latencies.append(latency)
+                        if index > 0:
+                            self._counters["hedge_wins"] += 1
+                    self.breaker.record_success()
+                    return GuardedResult(value, latency * 1000, 1 + int(hedged or index > 0), index)
+
+                if not futures:
+                    if len(errors) == 1:
+                        # First attempt failed fast: the hedge doubles as the retry
+                        self._hedge(futures, attempt, cancelled)
+                        continue
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"LLM error: {errors[-1]}")
+        finally:
+            cancelled.set()  # stop the losing / abandoned attempts at their next token
+
+    def _hedge(self, futures: Dict[Future, int], attempt: Callable[[threading.Event, int], Any], cancelled: threading.Event):
+        self._count("hedged")
+        futures[self._executor.submit(attempt, cancelled, 1)] = 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self._counters)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000, 1)
+
+        return {
+            **counters,
+            "circuit": self.breaker.state,
+            "deadline_s": self.deadline_s,
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "latency_ms_p50": percentile(50),
+            "latency_ms_p95": percentile(95),
+            "latency_ms_p99": percentile(99)
+        }
+
+
+# Singleton instance
+llm_guard = LLMGuard()
@@ -0,0 +1,137 @@
+"""
+Compact Prompt Builder
+Prompt templates are compiled once (indentation and blank lines stripped,
+placeholders checked) and rendered against a per-call input token budget:
+trimmable fields are shortened, in order, until the prompt fits. A prompt
+that still does not fit raises PromptBudgetError and is never sent.
+"""
+import os
+import re
+import string
+import textwrap
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1000"))
+
+# Fallback when no tokenizer is available: ~4 characters per token for English
+_CHARS_PER_TOKEN = 4
+
+_encoders: Dict[str, Any] = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: str):
+    """tiktoken encoding for `model`, or None (not installed / not downloadable)"""
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except Exception:
+                # Missing package, unknown model or offline: estimate, and do not retry
+                _encoders[model] = None
+        return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    encoder = _encoder(model)
+    if encoder is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoder.encode(text))
+
+
+def compact(template: str) -> str:
+    """Dedent, strip every line and collapse runs of blank lines"""
+    lines = [line.strip() for line in textwrap.dedent(template).strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+class RenderedPrompt(NamedTuple):
+    messages: List[Tuple[str, str]]  # (role, content), accepted by chat models as-is
+    input_tokens: int
+    trimmed: List[str]  # fields shortened to fit the budget
+
+
+class PromptBudgetError(ValueError):
+    """The prompt exceeds its token budget even with every trimmable field shortened"""
+
+    def __init__(self, name: str, prompt: RenderedPrompt, budget: int):
+        super().__init__(f"prompt {name} is {prompt.input_tokens} tokens after trimming (budget {budget})")
+        self.prompt = prompt
+        self.budget = budget
+
+
+class CompiledPrompt:
+    """A chat prompt (system + human template) ready to render within a token budget"""
+
+    def __init__(
+        self,
+        name: str,
+        system: str,
+        human: str,
+        budget: int = DEFAULT_TOKEN_BUDGET,
+        trimmable: Sequence[str] = (),
+        model: str = "gpt-4"
+    ):
+        self.name = name
+        self.system = compact(system)
+        self.human = compact(human)
+        self.budget = budget
+        self.trimmable = tuple(trimmable)
+        self.model = model
+
+        self.fields = {
+            field.split(".")[0].split("[")[0]
+            for _, field, _, _ in string.Formatter().parse(self.human) if field
+        }
+        unknown = set(self.trimmable) - self.fields
+        if unknown:
+            raise ValueError(f"Prompt {name}: trimmable fields not in template: {sorted(unknown)}")
+        # The system message is constant, so it is counted once
+        self.system_tokens = count_tokens(self.system, model)
+
+    def render(self, **values: Any) -> RenderedPrompt:
+        missing = self.fields - set(values)
+        if missing:
+            raise ValueError(f"Prompt {self.name}: missing values {sorted(missing)}")
+
+        values = {key: values[key] for key in self.fields}
+        human = self.human.format(**values)
+        tokens = self.system_tokens + count_tokens(human, self.model)
+
+        trimmed = []
+        for field in self.trimmable:
+            over = tokens - self.budget
+            if over <= 0:
+                break
+            text = str(values[field])
+            text_tokens = count_tokens(text, self.model)
+            if text_tokens <= 1:
+                continue
+            values[field] = self._truncate(text, max(0, text_tokens - over - 1))
+            trimmed.append(field)
+            human = self.human.format(**values)
+            tokens = self.system_tokens + count_tokens(human, self.model)
+
+        rendered = RenderedPrompt([("system", self.system), ("human", human)], tokens, trimmed)
+        if tokens > self.budget:
+            raise PromptBudgetError(self.name, rendered, self.budget)
+        return rendered
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        encoder = _encoder(self.model)
+        if encoder is None:
+            return text[:tokens * _CHARS_PER_TOKEN] + "…"
+        return encoder.decode(encoder.encode(text)[:tokens]) + "…"
+
+
+def compile_prompt(
+    name: str,
+    system: str,
+    human: str,
+    budget: Optional[int] = None,
+    trimmable: Sequence[str] = (),
+    model: str = "gpt-4"
+) -> CompiledPrompt:
+    return CompiledPrompt(name, system, human, budget or DEFAULT_TOKEN_BUDGET, trimmable, model)
@@ -0,0 +1,159 @@
+"""
+Structured LLM Output
+Forces a function call whose arguments are validated into a pydantic model,
+and surfaces selected string fields (e.g. the rationale) while the
+arguments are still streaming in.
+"""
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _FieldState:
+    def __init__(self, name: str):
+        self.pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+        self.position: Optional[int] = None  # next undecoded character of the value
+        self.complete = False
+
+
+class StreamingJSONFields:
+    """
+    Decodes top-level string fields of a JSON object that arrives in pieces
+    feed() returns (field, decoded text since last feed, value complete).
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.buffer = ""
+        self._fields = {name: _FieldState(name) for name in fields}
+
+    def feed(self, piece: str) -> List[Tuple[str, str, bool]]:
+        self.buffer += piece
+        updates = []
+        for name, state in self._fields.items():
+            if state.complete:
+                continue
+            if state.position is None:
+                match = state.pattern.search(self.buffer)
+                if not match:
+                    continue
+                state.position = match.end()
+            delta = self._decode(state)
+            if delta or state.complete:
+                updates.append((name, delta, state.complete))
+        return updates
+
+    def _decode(self, state: _FieldState) -> str:
+        out = []
+        buffer, i = self.buffer, state.position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                state.complete = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if it is split across pieces
+            if i + 1 >= len(buffer):
+                break
+            code = buffer[i + 1]
+            if code == "u":
+                if i + 6 > len(buffer):
+                    break
+                out.append(chr(int(buffer[i + 2:i + 6], 16)))
+                i += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                i += 2
+        state.position = i
+        return "".join(out)
+
+
+class StructuredResult(NamedTuple):
+    value: Optional[BaseModel]  # None if the output did not validate
+    raw: str  # function-call arguments (or content) as received
+    error: Optional[str]
+
+
+def function_tool(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    OpenAI tool definition of a pydantic v2 model ($refs inlined)
+    Built here because langchain-core 0.1's converter expects pydantic v1 models.
+    """
+    json_schema = schema.model_json_schema()
+    definitions = json_schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        return node
+
+    return {
+        "type": "function",
+        "function": {
+            "name": schema.__name__,
+            "description": (schema.__doc__ or "").strip(),
+            "parameters": inline(json_schema)
+        }
+    }
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Function-call argument text of a streamed message chunk (else its content)"""
+    pieces = [call.get("args") or "" for call in (getattr(chunk, "tool_call_chunks", None) or [])]
+    if not pieces:
+        for call in (getattr(chunk, "additional_kwargs", None) or {}).get("tool_calls") or []:
+            pieces.append((call.get("function") or {}).get("arguments") or "")
+    if pieces:
+        return "".join(pieces)
+    content = getattr(chunk, "content", "")
+    return content if isinstance(content, str) else ""
+
+
+def stream_structured(
+    llm: Any,
+    messages: List[Tuple[str, str]],
+    schema: Type[BaseModel],
+    stream_fields: Sequence[str] = (),
+    on_field: Optional[Callable[[str, str, bool], None]] = None
+) -> StructuredResult:
+    """
+    Call `llm` forced to answer with `schema`'s function, streaming; on_field
+    receives (field, delta, complete) for each of `stream_fields` as it decodes
+    """
+    bound = llm.bind_tools([function_tool(schema)], tool_choice=schema.__name__)
+    fields = StreamingJSONFields(stream_fields)
+    parts = []
+
+    for chunk in bound.stream(messages):
+        piece = _chunk_text(chunk)
+        if not piece:
+            continue
+        parts.append(piece)
+        for field, delta, complete in fields.feed(piece):
+            if on_field:
+                on_field(field, delta, complete)
+
+    raw = "".join(parts)
+    try:
+        return StructuredResult(schema.model_validate_json(raw), raw, None)
+    except (ValidationError, ValueError) as e:
+        return StructuredResult(None, raw, f"Invalid structured output: {_short_error(e)}")
+
+
+def _short_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc']) or 'output'}: {item['msg']}" for item in error.errors()[:3]
+        )
+    return str(error)[:200]
+
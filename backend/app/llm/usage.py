@@ -0,0 +1,77 @@
+"""
+LLM Usage Accounting
+Prompt/completion tokens and latency of every LLM call, per prompt and
+request type, so token spend can be watched and budgeted.
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+
+class LLMUsageMetrics:
+    """Running totals and a latency window per (prompt, request type)"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(
+        self,
+        prompt: str,
+        request_type: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        trimmed: bool = False,
+        calls: int = 1
+    ):
+        """One guarded call; `calls` requests were sent (2 when hedged) and tokens cover all of them"""
+        key = (prompt, request_type)
+        with self._lock:
+            totals = self._totals_for(key)
+            totals["calls"] += calls
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["trimmed_calls"] += int(trimmed) * calls
+            self._latencies[key].append(latency_ms)
+
+    def record_over_budget(self, prompt: str, request_type: str):
+        """A call not sent: its prompt was over the token budget even after trimming"""
+        with self._lock:
+            self._totals_for((prompt, request_type))["over_budget"] += 1
+
+    def _totals_for(self, key: Tuple[str, str]) -> Dict[str, int]:
+        if key not in self._totals:
+            self._totals[key] = {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "trimmed_calls": 0, "over_budget": 0
+            }
+            self._latencies[key] = deque(maxlen=self.window)
+        return self._totals[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            prompts: Dict[str, Dict[str, Any]] = {}
+            for (prompt, request_type), totals in self._totals.items():
+                latencies = sorted(self._latencies[(prompt, request_type)])
+                calls = totals["calls"]
+                # Only over-budget calls so far: nothing was sent
+                if not calls:
+                    prompts.setdefault(prompt, {})[request_type] = {
+                        **totals, "avg_prompt_tokens": None, "avg_completion_tokens": None,
+                        "latency_ms_p50": None, "latency_ms_p95": None
+                    }
+                    continue
+                prompts.setdefault(prompt, {})[request_type] = {
+                    **totals,
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / calls, 1),
+                    "avg_completion_tokens": round(totals["completion_tokens"] / calls, 1),
+                    "latency_ms_p50": round(latencies[len(latencies) // 2], 1),
+                    "latency_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+                }
+            return {"prompts": prompts}
+
+
+# Singleton instance
+llm_usage = LLMUsageMetrics()
@@ -2,6 +2,11 @@
 CreditWorkflowAgent - Main FastAPI Application
 Demo system for AI-powered credit workflow with human-in-the-loop
 """
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -13,6 +18,25 @@ load_dotenv()
 
 # Import routes
 from .api.routes import router
+from .api.debug import debug_router
+from .api.responses import FastJSONResponse
+from .startup import readiness
+from .state import worker_id
+from .workflow.runner import start_recovery_sweeper, stop_recovery_sweeper
+from .workflow.scheduler import workflow_scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start listening immediately; heavy components warm up in the background"""
+    readiness.start()
+    # Resume workflows left 'running' by a crashed or redeployed worker
+    start_recovery_sweeper()
+    yield
+    stop_recovery_sweeper()
+    # Let running workflows finish before the process exits
+    workflow_scheduler.shutdown()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -20,7 +44,9 @@ app = FastAPI(
     description="AI-powered credit controller with 5-step workflow and human-in-the-loop approval",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
@@ -35,10 +61,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Last-Seq"],
 )
 
 # Include API routes
 app.include_router(router)
+app.include_router(debug_router)
+
+readiness.record("import", time.perf_counter() - _import_started)
 
 
 @app.get("/")
@@ -59,10 +89,20 @@ async def health_check():
     return {
         "status": "healthy",
         "environment": os.getenv("ENVIRONMENT", "development"),
-        "sap_mode": os.getenv("SAP_MODE", "mock")
+        "sap_mode": os.getenv("SAP_MODE", "mock"),
+        "state_backend": os.getenv("STATE_BACKEND", "memory").split("://")[0],
+        "workflow_executor": os.getenv("WORKFLOW_EXECUTOR", "inline"),
+        "worker": worker_id()
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until start-up warm-up has finished"""
+    status = readiness.status()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 # Exception handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, Literal, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -63,6 +63,33 @@ class AgeingBuckets(BaseModel):
         populate_by_name = True
 
 
+class CreditMetrics(BaseModel):
+    total_outstanding: float
+    overdue: float  # 31+ days
+    overdue_pct: float  # of total outstanding
+    headroom: float  # current limit - total outstanding
+    ratio_90_plus_to_limit: float
+
+    @classmethod
+    def derive(cls, ageing: AgeingBuckets, current_limit: float) -> "CreditMetrics":
+        overdue = ageing.bucket_31_60 + ageing.bucket_61_90 + ageing.bucket_90_plus
+        total_outstanding = ageing.bucket_0_30 + overdue
+        return cls(
+            total_outstanding=total_outstanding,
+            overdue=overdue,
+            overdue_pct=overdue / total_outstanding * 100 if total_outstanding > 0 else 0.0,
+            headroom=current_limit - total_outstanding,
+            ratio_90_plus_to_limit=ageing.bucket_90_plus / current_limit if current_limit > 0 else 0.0
+        )
+
+    def with_limit(self, current_limit: float, ageing_90_plus: float) -> "CreditMetrics":
+        """Only the limit-dependent metrics change"""
+        return self.model_copy(update={
+            "headroom": current_limit - self.total_outstanding,
+            "ratio_90_plus_to_limit": ageing_90_plus / current_limit if current_limit > 0 else 0.0
+        })
+
+
 class CustomerSnapshot(BaseModel):
     customer_id: str
     name: str
@@ -74,6 +101,22 @@ class CustomerSnapshot(BaseModel):
     dso: float
     ageing: AgeingBuckets
     risk_category: RiskCategory
+    metrics: Optional[CreditMetrics] = None  # derived once, stored with the snapshot
+
+    @model_validator(mode="after")
+    def _derive_metrics(self) -> "CustomerSnapshot":
+        if self.metrics is None:
+            self.metrics = CreditMetrics.derive(self.ageing, self.current_limit)
+        return self
+
+    def with_changes(self, **changes: Any) -> "CustomerSnapshot":
+        """Copy with fields changed; the derived metrics are updated incrementally"""
+        updated = self.model_copy(update=changes)
+        if "ageing" in changes:
+            updated.metrics = CreditMetrics.derive(updated.ageing, updated.current_limit)
+        elif "current_limit" in changes:
+            updated.metrics = self.metrics.with_limit(updated.current_limit, updated.ageing.bucket_90_plus)
+        return updated
 
 
 class AIRecommendation(BaseModel):
@@ -83,6 +126,21 @@ class AIRecommendation(BaseModel):
     rationale: str
     key_metrics: Dict[str, Any]
     risk_signals: list[str]
+    policy_version: Optional[str] = None  # credit policy evaluated for the request
+    policy_check: Optional[Dict[str, Any]] = None  # credit policy outcome next to an LLM answer
+    llm_usage: Optional[Dict[str, Any]] = None  # tokens and latency of the analysis call
+    source: Optional[str] = None  # "llm" (structured output) or "rules" (credit policy)
+    fallback_reason: Optional[str] = None  # why the LLM answer was not used
+
+
+class LLMAnalysis(BaseModel):
+    """Credit recommendation for the request, based only on the data provided"""
+    # Field order is the generation order: recommendation and rationale stream first
+    recommendation: RecommendationType
+    rationale: str = Field(description="2-3 sentences citing the figures that drive the decision")
+    confidence: float = Field(ge=0, le=1)
+    recommended_limit: Optional[float] = Field(None, description="New credit limit in INR, or null")
+    risk_signals: list[str] = Field(default_factory=list, description="Short risk findings, e.g. 'High DSO: 72 days'")
 
 
 class ApproverDecision(BaseModel):
@@ -91,7 +149,16 @@ class ApproverDecision(BaseModel):
     comments: str
 
 
+class BulkDecision(ApproverDecision):
+    request_id: str
+
+
+class BulkApprovalRequest(BaseModel):
+    decisions: list[BulkDecision] = Field(min_length=1, max_length=1000)
+
+
 class WorkflowEvent(BaseModel):
+    seq: Optional[int] = None  # position in the request's event log (1-based)
     step: str
     status: WorkflowStatus
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -106,6 +173,23 @@ class SAPUpdateResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class SAPCreditStatus(BaseModel):
+    customer_id: str
+    credit_limit: Optional[float] = None
+    credit_block: Optional[bool] = None
+    as_of: datetime = Field(default_factory=datetime.now)
+
+
+class AnalysisContext(BaseModel):
+    request: CreditRequest
+    snapshot: CustomerSnapshot
+    prior_requests: list[CreditRequest] = []
+    sap_status: Optional[SAPCreditStatus] = None
+    source_latency_ms: Dict[str, float] = {}
+    source_errors: Dict[str, str] = {}
+    trend: Optional[Dict[str, float]] = None  # snapshot history over the last 90 days
+
+
 class NotificationRequest(BaseModel):
     email: str
     subject: str
@@ -120,3 +204,10 @@ class WorkflowSummary(BaseModel):
     final_block_status: bool
     demo_talk_track: list[str]
     events: list[WorkflowEvent]
+
+
+class WhatIfRequest(BaseModel):
+    policy: Optional[Dict[str, Any]] = None  # full candidate policy (default: the active one)
+    overrides: Dict[str, Any] = Field(default_factory=dict)  # e.g. {"signals.high_dso.when.value": 45}
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
@@ -0,0 +1 @@
+from .engine import CompiledPolicy, PolicyDecision, PolicyEngine, PolicyError, compile_policy, policy_engine, snapshot_metrics
@@ -0,0 +1,328 @@
+"""
+Credit Policy Engine
+Compiles the versioned decision-table policy (YAML/JSON) into predicate
+closures once per load, so evaluating a request is a few dict lookups and
+comparisons. The policy file is re-checked periodically and hot-reloaded.
+"""
+import hashlib
+import json
+import operator
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from ..models.schemas import CustomerSnapshot, RecommendationType, RequestType
+
+try:
+    import yaml
+except ImportError:  # optional: JSON policies only
+    yaml = None
+
+
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(__file__), "credit_policy.yaml")
+
+# Metrics a policy may reference (filled in by the agent before evaluation)
+POLICY_METRICS = (
+    "dso", "overdue_pct", "utilisation_pct", "ageing_0_30", "ageing_31_60",
+    "ageing_61_90", "ageing_90_plus", "total_outstanding", "current_limit",
+    "risk_category", "prior_requests", "signal_count", "headroom", "ratio_90_plus_to_limit"
+)
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda metric, values: metric in values,
+    "not_in": lambda metric, values: metric not in values,
+}
+
+# Used to validate templates at compile time
+_SAMPLE_METRICS = {name: 0.0 for name in POLICY_METRICS}
+_SAMPLE_METRICS.update(risk_category="A", prior_requests=0, signal_count=0, top_signals="")
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+def snapshot_metrics(snapshot: CustomerSnapshot, prior_requests: int = 0) -> Dict[str, Any]:
+    """Policy inputs of a customer snapshot (derived metrics are read as stored)"""
+    ageing = snapshot.ageing
+    derived = snapshot.metrics
+
+    return {
+        "dso": snapshot.dso,
+        "overdue_pct": derived.overdue_pct,
+        "utilisation_pct": snapshot.utilisation_pct,
+        "ageing_0_30": ageing.bucket_0_30,
+        "ageing_31_60": ageing.bucket_31_60,
+        "ageing_61_90": ageing.bucket_61_90,
+        "ageing_90_plus": ageing.bucket_90_plus,
+        "total_outstanding": derived.total_outstanding,
+        "current_limit": snapshot.current_limit,
+        "headroom": derived.headroom,
+        "ratio_90_plus_to_limit": derived.ratio_90_plus_to_limit,
+        "risk_category": snapshot.risk_category.value,
+        "prior_requests": prior_requests
+    }
+
+
+class PolicyError(ValueError):
+    """Raised when a policy file cannot be parsed or compiled"""
+
+
+class PolicyDecision(NamedTuple):
+    recommendation: RecommendationType
+    confidence: float
+    rationale: str
+    risk_signals: List[str]
+    recommended_limit: Optional[float]
+    policy_version: str
+
+
+class _Rule(NamedTuple):
+    predicate: Optional[Predicate]
+    recommendation: RecommendationType
+    confidence: float
+    rationale: str
+
+
+# --- Compilation ---
+
+# Keys a condition or rule may have: anything else is a typo the policy would silently ignore
+_LEAF_KEYS = frozenset({"metric", "op", "value"})
+_RULE_KEYS = frozenset({"when", "recommendation", "confidence", "rationale"})
+
+
+def _check_keys(spec: Dict[str, Any], allowed: frozenset, where: str):
+    unknown = set(spec) - allowed
+    if unknown:
+        raise PolicyError(f"{where}: unknown keys {sorted(unknown)}")
+
+
+def _compile_condition(spec: Any, where: str) -> Predicate:
+    """Condition spec -> closure over the metrics dict"""
+    if not isinstance(spec, dict):
+        raise PolicyError(f"{where}: condition must be a mapping")
+
+    if "all" in spec or "any" in spec:
+        combinator = "all" if "all" in spec else "any"
+        _check_keys(spec, frozenset({combinator}), where)
+        parts = spec[combinator]
+        if not isinstance(parts, list) or not parts:
+            raise PolicyError(f"{where}: '{combinator}' needs a non-empty list")
+        predicates = tuple(_compile_condition(part, f"{where}.{combinator}[{i}]") for i, part in enumerate(parts))
+
+        if len(predicates) == 1:
+            return predicates[0]
+        if combinator == "all":
+            return lambda metrics: all(predicate(metrics) for predicate in predicates)
+        return lambda metrics: any(predicate(metrics) for predicate in predicates)
+
+    _check_keys(spec, _LEAF_KEYS, where)
+    metric, op, value = spec.get("metric"), spec.get("op"), spec.get("value")
+    if metric not in POLICY_METRICS:
+        raise PolicyError(f"{where}: unknown metric {metric!r}")
+    if op not in _OPERATORS:
+        raise PolicyError(f"{where}: unknown operator {op!r}")
+    if op in ("in", "not_in"):
+        value = frozenset(value or ())
+
+    compare = _OPERATORS[op]
+    return lambda metrics: compare(metrics[metric], value)
+
+
+def _check_template(template: Any, where: str) -> str:
+    if not isinstance(template, str):
+        raise PolicyError(f"{where}: template must be a string")
+    try:
+        template.format(**_SAMPLE_METRICS)
+    except (KeyError, IndexError, ValueError) as e:
+        raise PolicyError(f"{where}: invalid template ({e})")
+    return template
+
+
+def _compile_rule(spec: Dict[str, Any], where: str) -> _Rule:
+    if not isinstance(spec, dict):
+        raise PolicyError(f"{where}: rule must be a mapping")
+    _check_keys(spec, _RULE_KEYS, where)
+    try:
+        recommendation = RecommendationType(spec["recommendation"])
+    except (KeyError, ValueError):
+        raise PolicyError(f"{where}: missing or unknown recommendation")
+
+    confidence = spec.get("confidence")
+    if not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+        raise PolicyError(f"{where}: confidence must be between 0 and 1")
+
+    predicate = _compile_condition(spec["when"], f"{where}.when") if "when" in spec else None
+    return _Rule(predicate, recommendation, float(confidence), _check_template(spec.get("rationale"), f"{where}.rationale"))
+
+
+class CompiledPolicy:
+    """Immutable, ready-to-evaluate form of one policy version"""
+
+    def __init__(self, document: Dict[str, Any], digest: str, source: str):
+        if not isinstance(document, dict) or not document.get("version"):
+            raise PolicyError("Policy must be a mapping with a 'version'")
+
+        self.version = str(document["version"])
+        self.document = document  # source form, e.g. for what-if overrides
+        self.digest = digest
+        self.source = source
+        self.loaded_at = time.time()
+
+        self.signals: Tuple[Tuple[str, Predicate, str], ...] = tuple(
+            (
+                spec.get("id", f"signal_{index}"),
+                _compile_condition(spec.get("when"), f"signals[{index}].when"),
+                _check_template(spec.get("message"), f"signals[{index}].message")
+            )
+            for index, spec in enumerate(document.get("signals") or [])
+        )
+
+        tables = document.get("decisions") or {}
+        valid_types = {request_type.value for request_type in RequestType} | {"default"}
+        unknown = set(tables) - valid_types
+        if unknown:
+            raise PolicyError(f"decisions: unknown request types {sorted(unknown)}")
+
+        self.decisions: Dict[str, Tuple[_Rule, ...]] = {
+            request_type: tuple(_compile_rule(spec, f"decisions.{request_type}[{i}]") for i, spec in enumerate(rules))
+            for request_type, rules in tables.items()
+        }
+        default = self.decisions.get("default")
+        if not default or default[-1].predicate is not None:
+            raise PolicyError("decisions.default must end with a rule without 'when'")
+
+        limit = document.get("recommended_limit") or {}
+        self.limit_multiplier = float(limit.get("multiplier", 1.0))
+        self.no_limit_for = frozenset(limit.get("none_for") or ())
+
+    def evaluate(self, request_type: str, metrics: Dict[str, Any]) -> PolicyDecision:
+        """
+        Run signals and the request type's decision table against `metrics`
+        (adds signal_count and top_signals to the dict)
+        """
+        risk_signals = [message.format_map(metrics) for _, predicate, message in self.signals if predicate(metrics)]
+        metrics["signal_count"] = len(risk_signals)
+        metrics["top_signals"] = ", ".join(risk_signals[:2])
+
+        rule = self._match(self.decisions.get(request_type), metrics) or self._match(self.decisions["default"], metrics)
+        rationale = rule.rationale.format_map(metrics)
+
+        recommended_limit = None
+        if request_type not in self.no_limit_for:
+            recommended_limit = metrics["current_limit"] * self.limit_multiplier
+
+        return PolicyDecision(
+            rule.recommendation, rule.confidence, rationale, risk_signals, recommended_limit, self.version
+        )
+
+    @staticmethod
+    def _match(rules: Optional[Tuple[_Rule, ...]], metrics: Dict[str, Any]) -> Optional[_Rule]:
+        for rule in rules or ():
+            if rule.predicate is None or rule.predicate(metrics):
+                return rule
+        return None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "digest": self.digest,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "signals": [signal_id for signal_id, _, _ in self.signals],
+            "decision_tables": {name: len(rules) for name, rules in self.decisions.items()}
+        }
+
+
+def compile_policy(raw: bytes, source: str) -> CompiledPolicy:
+    """Parse (YAML or JSON by extension) and compile a policy document"""
+    try:
+        if source.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise PolicyError("PyYAML is required for YAML policies")
+            document = yaml.safe_load(raw)
+        else:
+            document = json.loads(raw)
+    except (ValueError, getattr(yaml, "YAMLError", ValueError)) as e:
+        raise PolicyError(f"Cannot parse policy {source}: {e}")
+
+    return CompiledPolicy(document, hashlib.sha256(raw).hexdigest()[:12], source)
+
+
+# --- Hot reload ---
+
+class PolicyEngine:
+    """
+    Holds the current compiled policy and reloads it when the file changes
+    The file is stat()ed at most every POLICY_RELOAD_INTERVAL seconds; a
+    policy that fails to compile is reported and the previous one kept.
+    """
+
+    def __init__(self, path: str, reload_interval: Optional[float] = None):
+        self.path = path
+        self.reload_interval = (
+            reload_interval if reload_interval is not None
+            else float(os.getenv("POLICY_RELOAD_INTERVAL", "5"))
+        )
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._mtime = 0.0
+        self._next_check = 0.0
+        self._policy = self.reload()
+
+    def current(self) -> CompiledPolicy:
+        """Compiled policy, reloaded first if the file changed"""
+        if self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self._check_for_changes()
+        return self._policy
+
+    def evaluate(self, request_type: str, metrics: Dict[str, Any]) -> PolicyDecision:
+        return self.current().evaluate(request_type, metrics)
+
+    def reload(self) -> CompiledPolicy:
+        """Compile the file now; raises PolicyError if it is invalid"""
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "rb") as f:
+                policy = compile_policy(f.read(), self.path)
+
+            self._policy = policy
+            self._mtime = mtime
+            self._next_check = time.monotonic() + self.reload_interval
+            self.last_error = None
+            return policy
+
+    def _check_for_changes(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return  # another thread just checked
+            self._next_check = time.monotonic() + self.reload_interval
+            try:
+                changed = os.stat(self.path).st_mtime != self._mtime
+            except OSError:
+                changed = False
+        if not changed:
+            return
+
+        previous = self._policy.version
+        try:
+            policy = self.reload()
+            print(f"POLICY: reloaded {self.path} (version {previous} -> {policy.version})")
+        except (OSError, PolicyError) as e:
+            self.last_error = str(e)
+            # Do not retry the same broken file on every check
+            with self._lock:
+                try:
+                    self._mtime = os.stat(self.path).st_mtime
+                except OSError:
+                    pass
+            print(f"POLICY RELOAD FAILED, keeping version {previous}: {e}")
+
+
+# Singleton instance
+policy_engine = PolicyEngine(os.getenv("POLICY_PATH", DEFAULT_POLICY_PATH))
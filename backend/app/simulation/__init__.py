@@ -0,0 +1,10 @@
+# CLI module (python -m app.simulation.whatif): load it on first access, so
+# running it does not import it a second time as part of the package
+_EXPORTS = ("apply_overrides", "build_report", "load_file_history", "load_store_history", "run_simulation")
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        from . import whatif
+        return getattr(whatif, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
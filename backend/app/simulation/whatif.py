@@ -0,0 +1,368 @@
+"""
+What-If Policy Simulation
+Replays stored CreditRequest / CustomerSnapshot history against an
+alternative credit policy, in chunks across a process pool, and reports
+which recommendations would flip (by recommendation, segment and risk).
+
+CLI (from backend/):
+    python -m app.simulation.whatif --set signals.high_dso.when.value=45
+    python -m app.simulation.whatif --policy alt_policy.yaml --history history.ndjson
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+if __name__ == "__main__":
+    # Run as a CLI: load backend/.env before the state store below is created
+    load_dotenv()
+
+from ..models.schemas import CreditRequest, CustomerSnapshot
+from ..policy import CompiledPolicy, PolicyError, compile_policy, policy_engine, snapshot_metrics
+
+
+# Cases per task sent to a worker process
+CHUNK_SIZE = int(os.getenv("SIMULATION_CHUNK_SIZE", "2000"))
+
+# Below this many cases the pool start-up costs more than it saves
+MIN_PARALLEL_CASES = 5000
+
+# Flipped request ids listed in the report
+MAX_FLIP_SAMPLES = 50
+
+# (request dict, snapshot dict, prior request count, snapshot source)
+HistoryRow = Tuple[Dict[str, Any], Dict[str, Any], int, str]
+
+# (request_id, request_type, segment, risk_category, exposure, baseline, candidate)
+CaseResult = Tuple[str, str, str, str, float, str, str]
+
+
+# --- Candidate policies ---
+
+def apply_overrides(document: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a policy document with dotted-path overrides applied, e.g.
+    {"signals.high_dso.when.value": 45, "decisions.UNBLOCK.1.confidence": 0.6}
+    List items are addressed by index or by their `id`.
+    """
+    document = copy.deepcopy(document)
+
+    for path, value in overrides.items():
+        parts = path.split(".")
+        node: Any = document
+        for depth, part in enumerate(parts):
+            last = depth == len(parts) - 1
+            if isinstance(node, list):
+                index = _list_index(node, part, path)
+                if last:
+                    node[index] = value
+                else:
+                    node = node[index]
+            elif isinstance(node, dict):
+                # Overrides change existing values only: a mistyped key would be ignored
+                if part not in node:
+                    raise PolicyError(f"Override path not found: {path}")
+                if last:
+                    node[part] = value
+                else:
+                    node = node[part]
+            else:
+                raise PolicyError(f"Override path not found: {path}")
+
+    return document
+
+
+def _list_index(items: List[Any], part: str, path: str) -> int:
+    if part.isdigit() and int(part) < len(items):
+        return int(part)
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and item.get("id") == part:
+            return index
+    raise PolicyError(f"Override path not found: {path}")
+
+
+# --- History ---
+
+def load_store_history(since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[HistoryRow]:
+    """
+    Requests from the shared state store, each paired with the snapshot its
+    workflow analysed (from the checkpoint), else the customer's current one
+    """
+    from ..state import state_store
+
+    requests = []
+    for request_id in state_store.keys("requests"):
+        raw = state_store.get("requests", request_id)
+        if raw is not None:
+            requests.append(json.loads(raw))
+
+    current_snapshots: Dict[str, Optional[Dict[str, Any]]] = {}
+    rows: List[HistoryRow] = []
+
+    for request, prior in _with_prior_counts(requests):
+        if not _in_range(request, since, until):
+            continue
+
+        snapshot, source = None, "checkpoint"
+        checkpoint = state_store.get("checkpoints", request["request_id"])
+        if checkpoint is not None:
+            snapshot = json.loads(checkpoint)["state"].get("customer_snapshot")
+        if snapshot is None:
+            customer_id = request["customer_id"]
+            if customer_id not in current_snapshots:
+                raw = state_store.get("customers", customer_id)
+                current_snapshots[customer_id] = json.loads(raw) if raw is not None else None
+            snapshot, source = current_snapshots[customer_id], "current"
+        if snapshot is None:
+            continue
+
+        rows.append((request, snapshot, prior, source))
+
+    return rows
+
+
+def load_file_history(
+    path: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[HistoryRow]:
+    """NDJSON history export: one {"request": {...}, "snapshot": {...}} per line"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records.append((record["request"], record["snapshot"]))
+
+    snapshots = {request["request_id"]: snapshot for request, snapshot in records}
+    return [
+        (request, snapshots[request["request_id"]], prior, "file")
+        for request, prior in _with_prior_counts([request for request, _ in records])
+        if _in_range(request, since, until)
+    ]
+
+
+def _in_range(request: Dict[str, Any], since: Optional[datetime], until: Optional[datetime]) -> bool:
+    if since is None and until is None:
+        return True
+    created_at = datetime.fromisoformat(request["created_at"])
+    return not ((since and created_at < since) or (until and created_at > until))
+
+
+def _with_prior_counts(requests: List[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Requests in time order, with the number of earlier requests by the same customer"""
+    seen: Dict[str, int] = defaultdict(int)
+    for request in sorted(requests, key=lambda r: r["created_at"]):
+        yield request, seen[request["customer_id"]]
+        seen[request["customer_id"]] += 1
+
+
+# --- Evaluation (runs in worker processes) ---
+
+_worker_policies: Optional[Tuple[CompiledPolicy, CompiledPolicy]] = None
+
+
+def _init_worker(baseline: Dict[str, Any], candidate: Dict[str, Any]):
+    """Compile both policies once per process (closures cannot be pickled)"""
+    global _worker_policies
+    _worker_policies = (
+        CompiledPolicy(baseline, "baseline", "baseline"),
+        CompiledPolicy(candidate, "candidate", "candidate")
+    )
+
+
+def _evaluate_chunk(rows: List[HistoryRow]) -> List[CaseResult]:
+    baseline, candidate = _worker_policies
+    results = []
+
+    for request_data, snapshot_data, prior, _ in rows:
+        request = CreditRequest.model_validate(request_data)
+        snapshot = CustomerSnapshot.model_validate(snapshot_data)
+        metrics = snapshot_metrics(snapshot, prior_requests=prior)
+        request_type = request.request_type.value
+
+        before = baseline.evaluate(request_type, dict(metrics)).recommendation.value
+        after = candidate.evaluate(request_type, metrics).recommendation.value
+
+        results.append((
+            request.request_id, request_type, snapshot.segment, snapshot.risk_category.value,
+            metrics["total_outstanding"], before, after
+        ))
+
+    return results
+
+
+def _chunks(rows: List[HistoryRow], size: int) -> Iterable[List[HistoryRow]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+# --- Reports ---
+
+def _new_group() -> Dict[str, Any]:
+    return {"cases": 0, "flipped": 0, "exposure": 0.0, "flipped_exposure": 0.0, "transitions": defaultdict(int)}
+
+
+def build_report(results: List[CaseResult]) -> Dict[str, Any]:
+    """Diff of baseline vs candidate recommendations, overall and per dimension"""
+    overall = _new_group()
+    by_recommendation: Dict[str, Dict[str, Any]] = defaultdict(_new_group)
+    by_segment: Dict[str, Dict[str, Any]] = defaultdict(_new_group)
+    by_risk: Dict[str, Dict[str, Any]] = defaultdict(_new_group)
+    flips = []
+
+    for request_id, request_type, segment, risk_category, exposure, before, after in results:
+        flipped = before != after
+        for group in (overall, by_recommendation[before], by_segment[segment], by_risk[risk_category]):
+            group["cases"] += 1
+            group["exposure"] += exposure
+            if flipped:
+                group["flipped"] += 1
+                group["flipped_exposure"] += exposure
+                group["transitions"][f"{before} -> {after}"] += 1
+
+        if flipped and len(flips) < MAX_FLIP_SAMPLES:
+            flips.append({
+                "request_id": request_id,
+                "request_type": request_type,
+                "segment": segment,
+                "risk_category": risk_category,
+                "exposure": exposure,
+                "baseline": before,
+                "candidate": after
+            })
+
+    def finish(group: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **group,
+            "flip_rate": round(group["flipped"] / group["cases"], 4) if group["cases"] else 0.0,
+            "exposure": round(group["exposure"], 2),
+            "flipped_exposure": round(group["flipped_exposure"], 2),
+            "transitions": dict(sorted(group["transitions"].items(), key=lambda item: -item[1]))
+        }
+
+    return {
+        "overall": finish(overall),
+        "by_baseline_recommendation": {name: finish(group) for name, group in sorted(by_recommendation.items())},
+        "by_segment": {name: finish(group) for name, group in sorted(by_segment.items())},
+        "by_risk_category": {name: finish(group) for name, group in sorted(by_risk.items())},
+        "sample_flips": flips
+    }
+
+
+# --- Entry point ---
+
+def run_simulation(
+    candidate: Dict[str, Any],
+    rows: List[HistoryRow],
+    baseline: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Replay `rows` under the baseline (default: active) and candidate policy
+    documents. Raises PolicyError if either does not compile.
+    """
+    baseline = baseline or policy_engine.current().document
+    # Fail fast in the caller instead of in every worker
+    baseline_version = CompiledPolicy(baseline, "baseline", "baseline").version
+    candidate_version = CompiledPolicy(candidate, "candidate", "candidate").version
+
+    workers = workers or int(os.getenv("SIMULATION_WORKERS", "0")) or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    if workers == 1 or len(rows) < MIN_PARALLEL_CASES:
+        _init_worker(baseline, candidate)
+        results = _evaluate_chunk(rows)
+        workers = 1
+    else:
+        # spawn: workers must not inherit the API's threads, locks or connections
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(baseline, candidate)
+        ) as pool:
+            results = [case for chunk in pool.map(_evaluate_chunk, _chunks(rows, chunk_size)) for case in chunk]
+
+    elapsed = time.perf_counter() - started
+    sources = defaultdict(int)
+    for row in rows:
+        sources[row[3]] += 1
+
+    return {
+        "baseline_version": baseline_version,
+        "candidate_version": candidate_version,
+        "cases": len(results),
+        "snapshot_sources": dict(sources),
+        "workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "cases_per_s": round(len(results) / elapsed) if elapsed > 0 else None,
+        **build_report(results)
+    }
+
+
+def _parse_override(text: str) -> Tuple[str, Any]:
+    path, _, value = text.partition("=")
+    try:
+        return path, json.loads(value)
+    except ValueError:
+        return path, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay request history against an alternative credit policy")
+    parser.add_argument("--policy", help="Candidate policy file (YAML/JSON); default: the active policy")
+    parser.add_argument("--set", action="append", default=[], metavar="PATH=VALUE",
+                        help="Override a candidate policy value, e.g. signals.high_dso.when.value=45")
+    parser.add_argument("--history", help="NDJSON history export; default: the shared state store")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only requests created at/after this date")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only requests created at/before this date")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.policy:
+        with open(args.policy, "rb") as f:
+            candidate = compile_policy(f.read(), args.policy).document
+    else:
+        candidate = policy_engine.current().document
+    candidate = apply_overrides(candidate, dict(_parse_override(item) for item in args.set))
+
+    if args.history:
+        rows = load_file_history(args.history, args.since, args.until)
+    else:
+        from ..state import MemoryStateStore, state_store
+        if isinstance(state_store, MemoryStateStore):
+            print(
+                "WARNING: STATE_BACKEND is memory: replaying this process's demo data, not the API's history. "
+                "Set STATE_BACKEND in backend/.env or pass --history",
+                file=sys.stderr
+            )
+        rows = load_store_history(args.since, args.until)
+    report = run_simulation(candidate, rows, workers=args.workers)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        overall = report["overall"]
+        print(
+            f"{report['cases']} cases in {report['elapsed_s']}s: {overall['flipped']} flipped "
+            f"(exposure ₹{overall['flipped_exposure']:,.0f}) -> {args.output}"
+        )
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
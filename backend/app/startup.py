@@ -0,0 +1,81 @@
+"""
+Startup Warm-up & Readiness
+The API imports only what it needs to listen; LangChain, LangGraph and the
+workflow agent are loaded by a background warm-up after start-up. /ready
+reports 503 until it finishes, so new pods only take traffic once warm.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# background: warm up after the server starts listening | off: build on first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+
+def _warm_workflow_agent():
+    from .workflow.agent import get_workflow_agent
+    get_workflow_agent()
+
+
+def _warm_policy():
+    from .policy import policy_engine
+    policy_engine.current()
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("workflow_agent", _warm_workflow_agent),
+    ("credit_policy", _warm_policy),
+]
+
+
+class Readiness:
+    """Start-up timings and warm-up state of this process"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._warm = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._warm.is_set()
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = round(seconds, 4)
+
+    def warm_up(self, steps: List[Tuple[str, Callable[[], Any]]] = WARMUP_STEPS):
+        """Run the warm-up steps in order, timing each; ready even if one fails"""
+        started = time.perf_counter()
+        for name, step in steps:
+            step_started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                # The component is retried on first use; do not keep the pod out of rotation
+                self.error = f"{name}: {e}"
+                print(f"WARM-UP: {name} failed: {e}")
+            self.record(f"warmup.{name}", time.perf_counter() - step_started)
+        self.record("warmup", time.perf_counter() - started)
+        self._warm.set()
+        print(f"WARM-UP: done in {self.phases['warmup']:.2f}s")
+
+    def start(self) -> Optional[threading.Thread]:
+        """Begin warm-up per STARTUP_WARMUP (returns the thread, if any)"""
+        if STARTUP_WARMUP == "off":
+            self._warm.set()
+            return None
+        thread = threading.Thread(target=self.warm_up, name="startup-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = dict(self.phases)
+        return {"ready": self.ready, "warmup": STARTUP_WARMUP, "phases_s": phases, "error": self.error}
+
+
+# Singleton instance
+readiness = Readiness()
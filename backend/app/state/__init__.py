@@ -0,0 +1,2 @@
+from .store import StateStore, MemoryStateStore, JSONNamespace, ModelNamespace, create_state_store, state_store
+from .lease import WorkflowLease, run_owner, worker_id
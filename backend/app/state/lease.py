@@ -0,0 +1,77 @@
+"""
+Workflow Leases
+A worker owns a workflow only while it keeps renewing the lease.
+If the worker dies, the lease expires and another worker may take over.
+"""
+import os
+import socket
+import threading
+import uuid
+from typing import Optional
+
+from .store import StateStore
+
+
+_WORKER_ID: Optional[str] = None
+
+
+def worker_id() -> str:
+    """Stable identity of this worker process (host:pid:nonce)"""
+    global _WORKER_ID
+    if _WORKER_ID is None or not _WORKER_ID.startswith(f"{socket.gethostname()}:{os.getpid()}:"):
+        _WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return _WORKER_ID
+
+
+def run_owner() -> str:
+    """Owner token of one lease holder: this worker plus a per-run nonce"""
+    return f"{worker_id()}:{uuid.uuid4().hex[:12]}"
+
+
+class WorkflowLease:
+    """
+    Renewable lease on a named resource, renewed by a background thread
+    Each lease object has its own owner token, so a second run in the same
+    worker cannot take a lease that is already held
+    """
+
+    def __init__(self, store: StateStore, name: str, ttl: Optional[float] = None, owner: Optional[str] = None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl or float(os.getenv("WORKFLOW_LEASE_TTL", "30"))
+        self.owner = owner or run_owner()
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire(self) -> bool:
+        """Try to take the lease and start the renewal heartbeat"""
+        if not self.store.acquire_lease(self.name, self.owner, self.ttl):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+        return True
+
+    def release(self):
+        """Stop renewing and give the lease up"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self.store.release_lease(self.name, self.owner)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            if not self.store.renew_lease(self.name, self.owner, self.ttl):
+                print(f"LEASE LOST: {self.name} (owner {self.owner})")
+                self.lost = True
+                return
+
+    def __enter__(self) -> "WorkflowLease":
+        if not self.acquire():
+            raise RuntimeError(f"Lease {self.name} is held by {self.store.lease_owner(self.name)}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,153 @@
+"""
+Redis State Store
+Networked backend for running the API across several nodes/pods.
+Requires the optional `redis` package (pip install redis).
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .store import StateStore
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+
+# Only the lease holder may extend or drop a lease
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisStateStore(StateStore):
+    """Store backed by Redis hashes (records), lists (events) and expiring keys (leases)"""
+
+    def __init__(self, url: str, prefix: str = "creditflow:"):
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND is redis:// but the 'redis' package is not installed")
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._renew = self.client.register_script(RENEW_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+
+    def _hash(self, namespace: str) -> str:
+        return f"{self.prefix}kv:{namespace}"
+
+    def _list(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}list:{namespace}:{key}"
+
+    def _sorted(self, name: str) -> str:
+        return f"{self.prefix}index:{name}"
+
+    def _lease(self, name: str) -> str:
+        return f"{self.prefix}lease:{name}"
+
+    # --- Key/value records ---
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        return self.client.hget(self._hash(namespace), key)
+
+    def put(self, namespace: str, key: str, value: str):
+        self.client.hset(self._hash(namespace), key, value)
+
+    def put_many(self, namespace: str, items: Dict[str, str]):
+        if items:
+            # A single HSET is atomic
+            self.client.hset(self._hash(namespace), mapping=items)
+
+    def put_if_absent(self, namespace: str, key: str, value: str) -> bool:
+        return bool(self.client.hsetnx(self._hash(namespace), key, value))
+
+    def update(self, namespace: str, key: str, fn: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        name = self._hash(namespace)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    current = pipe.hget(name, key)
+                    new_value = fn(current)
+                    if new_value is None:
+                        pipe.unwatch()
+                        return current
+                    pipe.multi()
+                    pipe.hset(name, key, new_value)
+                    pipe.execute()
+                    return new_value
+                except redis.WatchError:
+                    continue
+
+    def delete(self, namespace: str, key: str):
+        self.client.hdel(self._hash(namespace), key)
+
+    def pop(self, namespace: str, key: str) -> Optional[str]:
+        name = self._hash(namespace)
+        # MULTI/EXEC: no other client runs between the read and the delete
+        with self.client.pipeline() as pipe:
+            value, _ = pipe.hget(name, key).hdel(name, key).execute()
+        return value
+
+    def keys(self, namespace: str) -> List[str]:
+        return sorted(self.client.hkeys(self._hash(namespace)))
+
+    def scan(self, namespace: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        return self.client.hscan_iter(self._hash(namespace), count=batch_size)
+
+    # --- Append-only lists ---
+
+    def append(self, namespace: str, key: str, value: str) -> int:
+        return int(self.client.rpush(self._list(namespace, key), value))
+
+    def read_list(self, namespace: str, key: str, since: int = 0) -> List[str]:
+        return self.client.lrange(self._list(namespace, key), since, -1)
+
+    def list_length(self, namespace: str, key: str) -> int:
+        return int(self.client.llen(self._list(namespace, key)))
+
+    def delete_list(self, namespace: str, key: str):
+        self.client.delete(self._list(namespace, key))
+
+    # --- Sorted indexes (sorted sets) ---
+
+    def index_add(self, name: str, member: str, score: float):
+        self.client.zadd(self._sorted(name), {member: score})
+
+    def index_remove(self, name: str, member: str):
+        self.client.zrem(self._sorted(name), member)
+
+    def index_range(self, name: str, offset: int = 0, limit: int = 100, descending: bool = False) -> List[str]:
+        if limit <= 0:
+            return []
+        fetch = self.client.zrevrange if descending else self.client.zrange
+        return fetch(self._sorted(name), offset, offset + limit - 1)
+
+    def index_size(self, name: str) -> int:
+        return int(self.client.zcard(self._sorted(name)))
+
+    # --- Leases ---
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        key = self._lease(name)
+        if self.client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        # Re-entrant for the current owner
+        return bool(self._renew(keys=[key], args=[owner, int(ttl * 1000)]))
+
+    def renew_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._renew(keys=[self._lease(name)], args=[owner, int(ttl * 1000)]))
+
+    def release_lease(self, name: str, owner: str):
+        self._release(keys=[self._lease(name)], args=[owner])
+
+    def lease_owner(self, name: str) -> Optional[str]:
+        return self.client.get(self._lease(name))
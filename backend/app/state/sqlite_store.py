@@ -0,0 +1,249 @@
+"""
+SQLite State Store
+Shares workflow state between all API worker processes on one node
+(e.g. `uvicorn --workers N`). Uses WAL mode so readers never block writers.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .store import StateStore
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS lists (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key, seq)
+);
+CREATE TABLE IF NOT EXISTS sorted_index (
+    name TEXT NOT NULL,
+    member TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (name, member)
+);
+CREATE INDEX IF NOT EXISTS sorted_index_score ON sorted_index (name, score, member);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteStateStore(StateStore):
+    """Store backed by a single SQLite file (one connection per thread)"""
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Key/value records ---
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, namespace: str, key: str, value: str):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value",
+                (namespace, key, value)
+            )
+
+    def put_many(self, namespace: str, items: Dict[str, str]):
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value",
+                [(namespace, key, value) for key, value in items.items()]
+            )
+
+    def put_if_absent(self, namespace: str, key: str, value: str) -> bool:
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+                (namespace, key, value)
+            )
+            return cursor.rowcount == 1
+
+    def update(self, namespace: str, key: str, fn: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            current = row[0] if row else None
+            new_value = fn(current)
+            if new_value is None:
+                return current
+            conn.execute(
+                "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value",
+                (namespace, key, new_value)
+            )
+            return new_value
+
+    def delete(self, namespace: str, key: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def pop(self, namespace: str, key: str) -> Optional[str]:
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+            return row[0]
+
+    def keys(self, namespace: str) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT key FROM kv WHERE namespace = ? ORDER BY key", (namespace,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def scan(self, namespace: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        # Keyset pagination: no read transaction stays open between pages
+        last_key = ""
+        while True:
+            rows = self._conn().execute(
+                "SELECT key, value FROM kv WHERE namespace = ? AND key > ? ORDER BY key LIMIT ?",
+                (namespace, last_key, batch_size)
+            ).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+
+    # --- Append-only lists ---
+
+    def append(self, namespace: str, key: str, value: str) -> int:
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM lists WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            seq = row[0]
+            conn.execute(
+                "INSERT INTO lists (namespace, key, seq, value) VALUES (?, ?, ?, ?)",
+                (namespace, key, seq, value)
+            )
+            return seq
+
+    def read_list(self, namespace: str, key: str, since: int = 0) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT value FROM lists WHERE namespace = ? AND key = ? AND seq > ? ORDER BY seq",
+            (namespace, key, since)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_length(self, namespace: str, key: str) -> int:
+        row = self._conn().execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM lists WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row[0]
+
+    def delete_list(self, namespace: str, key: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM lists WHERE namespace = ? AND key = ?", (namespace, key))
+
+    # --- Sorted indexes ---
+
+    def index_add(self, name: str, member: str, score: float):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO sorted_index (name, member, score) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, member) DO UPDATE SET score = excluded.score",
+                (name, member, score)
+            )
+
+    def index_remove(self, name: str, member: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM sorted_index WHERE name = ? AND member = ?", (name, member))
+
+    def index_range(self, name: str, offset: int = 0, limit: int = 100, descending: bool = False) -> List[str]:
+        order = "DESC" if descending else "ASC"
+        rows = self._conn().execute(
+            f"SELECT member FROM sorted_index WHERE name = ? ORDER BY score {order}, member {order} LIMIT ? OFFSET ?",
+            (name, limit, offset)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def index_size(self, name: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sorted_index WHERE name = ?", (name,)).fetchone()[0]
+
+    # --- Leases ---
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+                (name, owner, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def renew_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ? AND expires_at > ?",
+                (now + ttl, name, owner, now)
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, name: str, owner: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def lease_owner(self, name: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
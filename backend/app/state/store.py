@@ -0,0 +1,409 @@
+"""
+Shared State Store
+Pluggable persistence for requests, approvals, events and workflow status
+so that every API worker (process or pod) sees the same workflow state
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class StateStore(ABC):
+    """
+    Backend contract for shared workflow state
+    Values are opaque strings (JSON); namespaces group related records
+    """
+
+    # --- Key/value records ---
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """Return the stored value or None"""
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: str):
+        """Insert or overwrite a value"""
+
+    @abstractmethod
+    def put_many(self, namespace: str, items: Dict[str, str]):
+        """Insert or overwrite several values atomically (one transaction)"""
+
+    @abstractmethod
+    def put_if_absent(self, namespace: str, key: str, value: str) -> bool:
+        """Insert only if the key does not exist. Returns True if inserted"""
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        """
+        Atomic read-modify-write
+        fn receives the current value (or None) and returns the new value,
+        or None to leave the record untouched. Returns the resulting value
+        """
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Remove a value (no-op if missing)"""
+
+    @abstractmethod
+    def pop(self, namespace: str, key: str) -> Optional[str]:
+        """
+        Atomically remove a value and return it
+        None if missing: of several concurrent callers, exactly one gets the value
+        """
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        """List all keys in a namespace"""
+
+    @abstractmethod
+    def scan(self, namespace: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate (key, value) pairs, fetched `batch_size` at a time
+        Records written during the scan may or may not be included.
+        """
+
+    # --- Append-only lists (event logs) ---
+
+    @abstractmethod
+    def append(self, namespace: str, key: str, value: str) -> int:
+        """Append to a list. Returns the 1-based sequence number of the item"""
+
+    @abstractmethod
+    def read_list(self, namespace: str, key: str, since: int = 0) -> List[str]:
+        """Return items with sequence number greater than `since`"""
+
+    @abstractmethod
+    def list_length(self, namespace: str, key: str) -> int:
+        """Number of items in a list (= sequence number of the last item)"""
+
+    @abstractmethod
+    def delete_list(self, namespace: str, key: str):
+        """Drop a whole list (no-op if missing); sequence numbers restart at 1"""
+
+    # --- Sorted indexes (member -> score, paged in score order) ---
+
+    @abstractmethod
+    def index_add(self, name: str, member: str, score: float):
+        """Add a member to an index, or move it to a new score"""
+
+    @abstractmethod
+    def index_remove(self, name: str, member: str):
+        """Remove a member (no-op if missing)"""
+
+    @abstractmethod
+    def index_range(self, name: str, offset: int = 0, limit: int = 100, descending: bool = False) -> List[str]:
+        """One page of members ordered by score (ties by member)"""
+
+    @abstractmethod
+    def index_size(self, name: str) -> int:
+        """Number of members in an index"""
+
+    # --- Leases (workflow ownership) ---
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take the lease if free, expired, or already held by owner"""
+
+    @abstractmethod
+    def renew_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Extend a lease held by owner. Returns False if it was lost"""
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str):
+        """Release a lease held by owner"""
+
+    @abstractmethod
+    def lease_owner(self, name: str) -> Optional[str]:
+        """Current live owner of a lease, or None"""
+
+    def namespace(self, name: str) -> "JSONNamespace":
+        """Dict-like view over a namespace of JSON records"""
+        return JSONNamespace(self, name)
+
+
+# Independent locks of the in-memory store: records hash onto a stripe
+LOCK_STRIPES = int(os.getenv("STATE_LOCK_STRIPES", "64"))
+
+
+class MemoryStateStore(StateStore):
+    """
+    In-process store (single worker, demo default)
+    Each (namespace, key) is guarded by one of `stripes` locks, so workflows
+    running on many threads only contend when their records share a stripe.
+    """
+
+    def __init__(self, stripes: int = LOCK_STRIPES):
+        self._stripes = [threading.RLock() for _ in range(max(1, stripes))]
+        self._namespaces_lock = threading.Lock()  # creating a namespace only
+        self._kv: Dict[str, Dict[str, str]] = {}
+        self._lists: Dict[str, Dict[str, List[str]]] = {}
+        self._leases: Dict[str, tuple] = {}
+        # index name -> (member -> score, (score, member) pairs kept sorted)
+        self._indexes: Dict[str, Tuple[Dict[str, float], List[Tuple[float, str]]]] = {}
+
+    def _stripe(self, namespace: str, key: str) -> int:
+        return hash((namespace, key)) % len(self._stripes)
+
+    def _lock(self, namespace: str, key: str) -> threading.RLock:
+        return self._stripes[self._stripe(namespace, key)]
+
+    def _records(self, tables: Dict[str, Dict[str, Any]], namespace: str) -> Dict[str, Any]:
+        records = tables.get(namespace)
+        if records is None:
+            with self._namespaces_lock:
+                records = tables.setdefault(namespace, {})
+        return records
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        # Single dict reads are atomic; writers replace whole values
+        return self._kv.get(namespace, {}).get(key)
+
+    def put(self, namespace: str, key: str, value: str):
+        records = self._records(self._kv, namespace)
+        with self._lock(namespace, key):
+            records[key] = value
+
+    def put_many(self, namespace: str, items: Dict[str, str]):
+        records = self._records(self._kv, namespace)
+        # Every stripe involved, in index order (no deadlock with other batches)
+        locks = [self._stripes[index] for index in sorted({self._stripe(namespace, key) for key in items})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            records.update(items)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def put_if_absent(self, namespace: str, key: str, value: str) -> bool:
+        records = self._records(self._kv, namespace)
+        with self._lock(namespace, key):
+            if key in records:
+                return False
+            records[key] = value
+            return True
+
+    def update(self, namespace: str, key: str, fn: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        records = self._records(self._kv, namespace)
+        with self._lock(namespace, key):
+            new_value = fn(records.get(key))
+            if new_value is None:
+                return records.get(key)
+            records[key] = new_value
+            return new_value
+
+    def delete(self, namespace: str, key: str):
+        with self._lock(namespace, key):
+            self._kv.get(namespace, {}).pop(key, None)
+
+    def pop(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock(namespace, key):
+            return self._kv.get(namespace, {}).pop(key, None)
+
+    def keys(self, namespace: str) -> List[str]:
+        # list() of a dict copies it without releasing the GIL
+        return list(self._kv.get(namespace, {}))
+
+    def scan(self, namespace: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        keys = self.keys(namespace)
+        records = self._kv.get(namespace, {})
+        for start in range(0, len(keys), batch_size):
+            page = [(key, records.get(key)) for key in keys[start:start + batch_size]]
+            yield from ((key, value) for key, value in page if value is not None)
+
+    def append(self, namespace: str, key: str, value: str) -> int:
+        lists = self._records(self._lists, namespace)
+        with self._lock(namespace, key):
+            items = lists.setdefault(key, [])
+            items.append(value)
+            return len(items)
+
+    def read_list(self, namespace: str, key: str, since: int = 0) -> List[str]:
+        with self._lock(namespace, key):
+            return self._lists.get(namespace, {}).get(key, [])[since:]
+
+    def list_length(self, namespace: str, key: str) -> int:
+        return len(self._lists.get(namespace, {}).get(key, ()))
+
+    def delete_list(self, namespace: str, key: str):
+        with self._lock(namespace, key):
+            self._lists.get(namespace, {}).pop(key, None)
+
+    def _index(self, name: str) -> Tuple[Dict[str, float], List[Tuple[float, str]]]:
+        index = self._indexes.get(name)
+        if index is None:
+            with self._namespaces_lock:
+                index = self._indexes.setdefault(name, ({}, []))
+        return index
+
+    def index_add(self, name: str, member: str, score: float):
+        scores, ordered = self._index(name)
+        with self._lock("index", name):
+            if member in scores:
+                ordered.pop(bisect.bisect_left(ordered, (scores[member], member)))
+            scores[member] = score
+            bisect.insort(ordered, (score, member))
+
+    def index_remove(self, name: str, member: str):
+        scores, ordered = self._index(name)
+        with self._lock("index", name):
+            if member in scores:
+                ordered.pop(bisect.bisect_left(ordered, (scores.pop(member), member)))
+
+    def index_range(self, name: str, offset: int = 0, limit: int = 100, descending: bool = False) -> List[str]:
+        _, ordered = self._index(name)
+        with self._lock("index", name):
+            if descending:
+                end = max(0, len(ordered) - offset)
+                page = ordered[max(0, end - limit):end][::-1]
+            else:
+                page = ordered[offset:offset + limit]
+        return [member for _, member in page]
+
+    def index_size(self, name: str) -> int:
+        return len(self._index(name)[0])
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock("lease", name):
+            current = self._leases.get(name)
+            if current and current[0] != owner and current[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl)
+            return True
+
+    def renew_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock("lease", name):
+            current = self._leases.get(name)
+            if not current or current[0] != owner or current[1] <= now:
+                return False
+            self._leases[name] = (owner, now + ttl)
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        with self._lock("lease", name):
+            current = self._leases.get(name)
+            if current and current[0] == owner:
+                del self._leases[name]
+
+    def lease_owner(self, name: str) -> Optional[str]:
+        current = self._leases.get(name)
+        if current and current[1] > time.time():
+            return current[0]
+        return None
+
+
+class JSONNamespace(MutableMapping):
+    """MutableMapping view of a store namespace holding JSON-serializable dicts"""
+
+    def __init__(self, store: StateStore, name: str):
+        self.store = store
+        self.name = name
+
+    def _encode(self, value: Any) -> str:
+        return json.dumps(value, default=str)
+
+    def _decode(self, raw: str) -> Any:
+        return json.loads(raw)
+
+    def __getitem__(self, key: str) -> Any:
+        raw = self.store.get(self.name, key)
+        if raw is None:
+            raise KeyError(key)
+        return self._decode(raw)
+
+    def __setitem__(self, key: str, value: Any):
+        self.store.put(self.name, key, self._encode(value))
+
+    def __delitem__(self, key: str):
+        if self.store.get(self.name, key) is None:
+            raise KeyError(key)
+        self.store.delete(self.name, key)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.store.get(self.name, key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys(self.name))
+
+    def __len__(self) -> int:
+        return len(self.store.keys(self.name))
+
+    def get_raw(self, key: str) -> Optional[str]:
+        """Stored JSON text of a record, without decoding (None if missing)"""
+        return self.store.get(self.name, key)
+
+    def put_many(self, values: Dict[str, Any]):
+        """Insert or overwrite a batch of records in one transaction"""
+        self.store.put_many(self.name, {key: self._encode(value) for key, value in values.items()})
+
+    def put_if_absent(self, key: str, value: Any) -> bool:
+        """Insert only if missing (safe to call from every worker at startup)"""
+        return self.store.put_if_absent(self.name, key, self._encode(value))
+
+    def merge(self, key: str, fields: Dict[str, Any]) -> Any:
+        """Atomically update fields of a dict record (created if missing). Returns the merged record"""
+        def apply(raw: Optional[str]) -> str:
+            current = self._decode(raw) if raw is not None else {}
+            return self._encode({**current, **fields})
+
+        return self._decode(self.store.update(self.name, key, apply))
+
+    def update_item(self, key: str, fn: Callable[[Any], Any]) -> Optional[Any]:
+        """Atomically apply fn to an existing record. Returns the new value or None if missing"""
+        def apply(raw: Optional[str]) -> Optional[str]:
+            if raw is None:
+                return None
+            return self._encode(fn(self._decode(raw)))
+
+        raw = self.store.update(self.name, key, apply)
+        return self._decode(raw) if raw is not None else None
+
+
+class ModelNamespace(JSONNamespace):
+    """Namespace view that stores and returns pydantic models"""
+
+    def __init__(self, store: StateStore, name: str, model: Type[BaseModel]):
+        super().__init__(store, name)
+        self.model = model
+
+    def _encode(self, value: BaseModel) -> str:
+        return value.model_dump_json()
+
+    def _decode(self, raw: str) -> BaseModel:
+        return self.model.model_validate_json(raw)
+
+
+def create_state_store(url: Optional[str] = None) -> StateStore:
+    """
+    Build a store from a backend URL (default: STATE_BACKEND env var)
+    - memory               single-process, in-memory (default)
+    - sqlite:///path.db    shared by all workers on one node
+    - redis://host:6379/0  shared across nodes
+    """
+    url = url or os.getenv("STATE_BACKEND", "memory")
+
+    if url == "memory":
+        return MemoryStateStore()
+
+    if url.startswith("sqlite:///"):
+        from .sqlite_store import SQLiteStateStore
+        return SQLiteStateStore(url[len("sqlite:///"):])
+
+    if url.startswith(("redis://", "rediss://")):
+        from .redis_store import RedisStateStore
+        return RedisStateStore(url)
+
+    raise ValueError(f"Unsupported STATE_BACKEND: {url}")
+
+
+# Singleton instance
+state_store = create_state_store()
@@ -1,2 +1,3 @@
 from .credit_tools import *
 from .sap_adapter import *
+from .snapshot_history import *
@@ -1,31 +1,50 @@
 """
 Credit Workflow Tools - Implements the 7 tool contracts
 """
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Dict, Optional
 from ..models.schemas import (
     CreditRequest, CustomerSnapshot, ApproverDecision,
-    WorkflowEvent, SAPUpdateResponse, NotificationRequest,
-    RequestType, RiskCategory, AgeingBuckets, Requestor
+    WorkflowEvent, SAPUpdateResponse, NotificationRequest, SAPCreditStatus,
+    RequestType, RiskCategory, AgeingBuckets, Requestor, WorkflowStatus
 )
-from .sap_adapter import sap_adapter
+from .sap_adapter import SAPUpdate, sap_adapter, sap_batcher
+from .snapshot_history import snapshot_history
+from ..state import ModelNamespace, state_store
+
+
+# Max number of per-request event arrays kept pre-joined in memory
+EVENTS_JSON_CACHE_SIZE = 1024
 
 
 class CreditWorkflowTools:
     """Implements all 7 tool contracts for the credit workflow"""
 
-    def __init__(self):
-        # Mock data stores (in production, use real database)
-        self.requests_db = {}
-        self.customers_db = {}
-        self.approvals_db = {}
-        self.events_db = {}
+    def __init__(self, store=None):
+        # Shared state (memory by default, SQLite/Redis when scaled out)
+        self.store = store or state_store
+        self.requests_db = ModelNamespace(self.store, "requests", CreditRequest)
+        self.customers_db = ModelNamespace(self.store, "customers", CustomerSnapshot)
+        self.approvals_db = ModelNamespace(self.store, "approvals", ApproverDecision)
+        self.sap_operations_db = ModelNamespace(self.store, "sap_operations", SAPUpdateResponse)
+        # request_id -> (JSON array bytes, etag, event count); reused until a new event arrives
+        self._events_json_cache: "OrderedDict[str, tuple[bytes, str, int]]" = OrderedDict()
+        self._events_json_lock = threading.Lock()
+        # customer_id -> (expires at, snapshot); only used once enable_snapshot_cache() is called
+        self._snapshot_cache: Dict[str, tuple[float, CustomerSnapshot]] = {}
+        self._snapshot_cache_ttl = 0.0
+        self._snapshot_lock = threading.Lock()
         self._init_demo_data()
 
     def _init_demo_data(self):
-        """Initialize demo data"""
+        """Initialize demo data (only where missing, so workers don't overwrite each other)"""
         # Demo customer 1: Good standing
-        self.customers_db["CUST001"] = CustomerSnapshot(
+        self.customers_db.put_if_absent("CUST001", CustomerSnapshot(
             customer_id="CUST001",
             name="Tata Steel Limited",
             segment="Large Enterprise",
@@ -41,10 +60,10 @@ class CreditWorkflowTools:
                 "90_plus": 500000.0
             }),
             risk_category=RiskCategory.B
-        )
+        ))
 
         # Demo customer 2: High risk
-        self.customers_db["CUST002"] = CustomerSnapshot(
+        self.customers_db.put_if_absent("CUST002", CustomerSnapshot(
             customer_id="CUST002",
             name="Reliance Industries Ltd",
             segment="Large Enterprise",
@@ -60,10 +79,10 @@ class CreditWorkflowTools:
                 "90_plus": 0.0
             }),
             risk_category=RiskCategory.A
-        )
+        ))
 
         # Demo customer 3: Moderate risk
-        self.customers_db["CUST003"] = CustomerSnapshot(
+        self.customers_db.put_if_absent("CUST003", CustomerSnapshot(
             customer_id="CUST003",
             name="Mahindra & Mahindra",
             segment="Mid Enterprise",
@@ -79,10 +98,12 @@ class CreditWorkflowTools:
                 "90_plus": 2000000.0
             }),
             risk_category=RiskCategory.C
-        )
+        ))
+
+        self._init_demo_history()
 
         # Demo request 1
-        self.requests_db["REQ001"] = CreditRequest(
+        demo_request = CreditRequest(
             request_id="REQ001",
             customer_id="CUST001",
             request_type=RequestType.UNBLOCK,
@@ -94,38 +115,158 @@ class CreditWorkflowTools:
             ),
             created_at=datetime.now()
         )
+        if self.requests_db.put_if_absent(demo_request.request_id, demo_request):
+            self.store.append("customer_requests", demo_request.customer_id, demo_request.request_id)
+
+    def _init_demo_history(self):
+        """Weekly demo history over 26 weeks, ending at each customer's current snapshot"""
+        # customer_id -> (DSO, utilisation %, ageing scale of the overdue buckets) 26 weeks ago
+        starting_points = {
+            "CUST001": (58.0, 81.0, 1.8),  # paying down: the overdue book shrinks
+            "CUST002": (36.0, 44.0, 1.0),  # steady
+            "CUST003": (47.0, 70.0, 0.6),  # deteriorating
+        }
+        now = time.time()
+        for customer_id, (dso, utilisation, scale) in starting_points.items():
+            if snapshot_history.has_history(customer_id):
+                continue
+            current = self.customers_db[customer_id]
+            points = []
+            for week in range(26, -1, -1):
+                share = week / 26
+                ageing = current.ageing.model_copy(update={
+                    field: value * (1 + (scale - 1) * share)
+                    for field, value in current.ageing.model_dump().items() if field != "bucket_0_30"
+                })
+                points.append((now - week * 7 * 24 * 3600, current.with_changes(
+                    dso=current.dso + (dso - current.dso) * share,
+                    utilisation_pct=current.utilisation_pct + (utilisation - current.utilisation_pct) * share,
+                    ageing=ageing
+                )))
+            snapshot_history.seed(customer_id, points)
 
     def get_credit_request(self, request_id: str) -> CreditRequest:
         """Tool 1: Retrieve credit request details"""
-        if request_id not in self.requests_db:
+        request = self.requests_db.get(request_id)
+        if request is None:
             raise ValueError(f"Request {request_id} not found")
-        return self.requests_db[request_id]
+        return request
 
     def get_customer_snapshot(self, customer_id: str) -> CustomerSnapshot:
         """Tool 2: Get customer financial snapshot from SAP"""
-        if customer_id not in self.customers_db:
+        if self._snapshot_cache_ttl:
+            with self._snapshot_lock:
+                cached = self._snapshot_cache.get(customer_id)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        snapshot = self.customers_db.get(customer_id)
+        if snapshot is None:
             raise ValueError(f"Customer {customer_id} not found")
-        return self.customers_db[customer_id]
+        self._cache_snapshot(snapshot)
+        return snapshot
+
+    def list_customers(
+        self,
+        sort: str = "total_outstanding",
+        descending: bool = True,
+        risk_category: Optional[str] = None,
+        min_overdue_pct: Optional[float] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> tuple[int, list[dict]]:
+        """
+        Helper: Customers filtered / sorted by their stored derived metrics
+        Records are read as JSON (no model validation, nothing recomputed)
+        Returns (matching count, one page of summaries)
+        """
+        rows = []
+        for _, raw in self.store.scan(self.customers_db.name):
+            data = json.loads(raw)
+            derived = data.get("metrics") or CustomerSnapshot.model_validate(data).metrics.model_dump()
+            if risk_category and data["risk_category"] != risk_category:
+                continue
+            if min_overdue_pct is not None and derived["overdue_pct"] < min_overdue_pct:
+                continue
+            rows.append({
+                key: data[key] for key in ("customer_id", "name", "segment", "risk_category", "current_limit", "credit_block")
+            } | derived)
+        rows.sort(key=lambda row: row[sort], reverse=descending)
+        return len(rows), rows[offset:offset + limit]
+
+    def get_customer_trend(self, customer_id: str, window_days: int = 90) -> Optional[dict]:
+        """Helper: Trend features of the customer's snapshot history (None without history)"""
+        return snapshot_history.trend(customer_id, window_days)
+
+    def enable_snapshot_cache(self, ttl: float):
+        """
+        Helper: Keep snapshots warm in this process for `ttl` seconds
+        For sharded job workers, which are the only writers of their customers;
+        bulk imports become visible once the entry expires
+        """
+        self._snapshot_cache_ttl = ttl
+
+    def evict_snapshots(self, keep: Callable[[str], bool]):
+        """Helper: Drop cached snapshots of customers for which keep() is false (moved shard)"""
+        with self._snapshot_lock:
+            for customer_id in [customer_id for customer_id in self._snapshot_cache if not keep(customer_id)]:
+                del self._snapshot_cache[customer_id]
+
+    def _cache_snapshot(self, snapshot: Optional[CustomerSnapshot]):
+        if self._snapshot_cache_ttl and snapshot is not None:
+            with self._snapshot_lock:
+                self._snapshot_cache[snapshot.customer_id] = (time.monotonic() + self._snapshot_cache_ttl, snapshot)
+
+    def get_customer_request_history(self, customer_id: str, exclude_request_id: Optional[str] = None) -> list[CreditRequest]:
+        """Helper: Prior credit requests raised for a customer (oldest first)"""
+        history = []
+        for request_id in self.store.read_list("customer_requests", customer_id):
+            if request_id == exclude_request_id:
+                continue
+            request = self.requests_db.get(request_id)
+            if request is not None:
+                history.append(request)
+        return history
+
+    def get_sap_credit_status(self, customer_id: str) -> Optional[SAPCreditStatus]:
+        """Helper: Current credit limit / block status as held in SAP"""
+        return sap_adapter.get_credit_status(customer_id)
 
     def emit_workflow_event(self, step: str, status: str, payload: dict, actor: str = "AI") -> WorkflowEvent:
-        """Tool 3: Emit workflow event for frontend timeline"""
-        event = WorkflowEvent(
+        """
+        Tool 3: Emit workflow event for frontend timeline
+        Events come from trusted workflow code, so they are built without
+        validation and serialized exactly once, at write time
+        """
+        timestamp = datetime.now()
+        status = WorkflowStatus(status)
+
+        # Store event as its final JSON (append-only, visible to every worker)
+        seq = None
+        request_id = payload.get("request_id")
+        if request_id:
+            raw = json.dumps(
+                {
+                    "step": step,
+                    "status": status.value,
+                    "timestamp": timestamp.isoformat(),
+                    "actor": actor,
+                    "payload": payload
+                },
+                default=str,
+                separators=(",", ":")
+            )
+            seq = self.store.append("events", request_id, raw)
+
+        return WorkflowEvent.model_construct(
+            seq=seq,
             step=step,
             status=status,
-            timestamp=datetime.now(),
+            timestamp=timestamp,
             actor=actor,
             payload=payload
         )
 
-        # Store event
-        request_id = payload.get("request_id")
-        if request_id:
-            if request_id not in self.events_db:
-                self.events_db[request_id] = []
-            self.events_db[request_id].append(event)
-
-        return event
-
     def get_approver_decision(self, request_id: str) -> Optional[ApproverDecision]:
         """Tool 4: Get human approver decision (BLOCKING CALL in real system)"""
         # In real system, this would wait for human input
@@ -136,26 +277,63 @@ class CreditWorkflowTools:
         """Helper: Set approver decision (called by API endpoint)"""
         self.approvals_db[request_id] = decision
 
-    def update_credit_limit_s4(self, customer_id: str, new_limit: float, reason: str) -> SAPUpdateResponse:
+    def set_default_approver_decision(self, request_id: str, decision: ApproverDecision) -> ApproverDecision:
+        """
+        Helper: Store decision unless one was recorded meanwhile
+        Returns the decision in effect, so a human decision that arrives
+        while the workflow is deciding is never overwritten
+        """
+        if self.approvals_db.put_if_absent(request_id, decision):
+            return decision
+        return self.approvals_db[request_id]
+
+    def update_credit_limit_s4(
+        self, customer_id: str, new_limit: float, reason: str, idempotency_key: Optional[str] = None
+    ) -> SAPUpdateResponse:
         """Tool 5: Update credit limit in SAP"""
-        response = sap_adapter.update_credit_limit(customer_id, new_limit, reason)
+        previous = self._get_sap_operation(idempotency_key, "limit")
+        if previous:
+            return previous
+
+        response = sap_batcher.submit(SAPUpdate("limit", customer_id, new_limit, reason))
+        self._record_sap_operation(idempotency_key, "limit", response)
 
-        # Update local cache
-        if customer_id in self.customers_db:
-            self.customers_db[customer_id].current_limit = new_limit
+        # Update shared snapshot (and this worker's cached copy)
+        self._cache_snapshot(self.customers_db.update_item(
+            customer_id, lambda snapshot: snapshot.with_changes(current_limit=new_limit)
+        ))
 
         return response
 
-    def update_credit_block_s4(self, customer_id: str, block_flag: bool, reason: str) -> SAPUpdateResponse:
+    def update_credit_block_s4(
+        self, customer_id: str, block_flag: bool, reason: str, idempotency_key: Optional[str] = None
+    ) -> SAPUpdateResponse:
         """Tool 6: Update credit block status in SAP"""
-        response = sap_adapter.update_credit_block(customer_id, block_flag, reason)
+        previous = self._get_sap_operation(idempotency_key, "block")
+        if previous:
+            return previous
 
-        # Update local cache
-        if customer_id in self.customers_db:
-            self.customers_db[customer_id].credit_block = block_flag
+        response = sap_batcher.submit(SAPUpdate("block", customer_id, block_flag, reason))
+        self._record_sap_operation(idempotency_key, "block", response)
+
+        # Update shared snapshot (and this worker's cached copy)
+        self._cache_snapshot(self.customers_db.update_item(
+            customer_id, lambda snapshot: snapshot.with_changes(credit_block=block_flag)
+        ))
 
         return response
 
+    def _get_sap_operation(self, idempotency_key: Optional[str], action: str) -> Optional[SAPUpdateResponse]:
+        """Helper: SAP response already recorded for this key (replayed on resume)"""
+        if not idempotency_key:
+            return None
+        return self.sap_operations_db.get(f"{idempotency_key}:{action}")
+
+    def _record_sap_operation(self, idempotency_key: Optional[str], action: str, response: SAPUpdateResponse):
+        """Helper: Remember a SAP response so a resumed workflow never re-applies it"""
+        if idempotency_key:
+            self.sap_operations_db[f"{idempotency_key}:{action}"] = response
+
     def send_notification(self, email: str, subject: str, body: str) -> dict:
         """Tool 7: Send email notification"""
         # In production, integrate with email service (SendGrid, SES, etc.)
@@ -176,13 +354,62 @@ class CreditWorkflowTools:
             "timestamp": datetime.now().isoformat()
         }
 
-    def get_workflow_events(self, request_id: str) -> list[WorkflowEvent]:
-        """Get all events for a request"""
-        return self.events_db.get(request_id, [])
+    def get_workflow_events(self, request_id: str, since: int = 0) -> list[WorkflowEvent]:
+        """Get events for a request newer than `since` (trusted construction, no re-validation)"""
+        events = []
+        for seq, raw in enumerate(self.store.read_list("events", request_id, since=since), start=since + 1):
+            data = json.loads(raw)
+            events.append(WorkflowEvent.model_construct(
+                seq=seq,
+                step=data["step"],
+                status=WorkflowStatus(data["status"]),
+                timestamp=datetime.fromisoformat(data["timestamp"]),
+                actor=data["actor"],
+                payload=data["payload"]
+            ))
+        return events
+
+    def get_workflow_events_json(self, request_id: str, since: int = 0) -> Optional[tuple[bytes, str, int]]:
+        """
+        Get events newer than `since` as a ready-to-send JSON array
+        The full array is cached and only rebuilt when new events arrive
+        Returns (body, etag, last_seq), or None if the request has no events
+        """
+        count = self.store.list_length("events", request_id)
+        if count == 0:
+            return None
+
+        if since == 0:
+            with self._events_json_lock:
+                cached = self._events_json_cache.get(request_id)
+                if cached and cached[2] == count:
+                    self._events_json_cache.move_to_end(request_id)
+                    return cached
+
+        raws = self.store.read_list("events", request_id, since=since)
+        last_seq = since + len(raws)
+        # Sequence number = position in the append-only log; spliced in, not re-serialized
+        body = ("[" + ",".join(
+            f'{{"seq":{seq},{raw[1:]}' for seq, raw in enumerate(raws, start=since + 1)
+        ) + "]").encode("utf-8")
+        entry = (body, f'"ev-{last_seq}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"', last_seq)
+
+        if since == 0:
+            with self._events_json_lock:
+                self._events_json_cache[request_id] = entry
+                self._events_json_cache.move_to_end(request_id)
+                while len(self._events_json_cache) > EVENTS_JSON_CACHE_SIZE:
+                    self._events_json_cache.popitem(last=False)
+
+        return entry
 
     def create_credit_request(self, request: CreditRequest) -> CreditRequest:
         """Helper: Create new credit request"""
-        self.requests_db[request.request_id] = request
+        if self.requests_db.put_if_absent(request.request_id, request):
+            # First time we see this request: index it under its customer
+            self.store.append("customer_requests", request.customer_id, request.request_id)
+        else:
+            self.requests_db[request.request_id] = request
         return request
 
 
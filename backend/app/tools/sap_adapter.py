@@ -3,9 +3,22 @@ Mock SAP S/4HANA Adapter
 Simulates SAP API calls for demo purposes
 """
 import os
+import threading
 from datetime import datetime
-from typing import Dict, Any
-from ..models.schemas import SAPUpdateResponse
+from typing import Dict, Any, List, NamedTuple, Optional, Union
+from ..models.schemas import SAPUpdateResponse, SAPCreditStatus
+from ..state import state_store
+
+# Concurrent updates are collected for up to this long and sent as one batch
+SAP_BATCH_WINDOW = float(os.getenv("SAP_BATCH_WINDOW_MS", "25")) / 1000
+SAP_BATCH_SIZE = int(os.getenv("SAP_BATCH_SIZE", "50"))
+
+
+class SAPUpdate(NamedTuple):
+    action: str  # "block" or "limit"
+    customer_id: str
+    value: Union[bool, float]  # block flag or new limit
+    reason: str
 
 
 class SAPAdapter:
@@ -16,8 +29,8 @@ class SAPAdapter:
         self.api_url = os.getenv("SAP_API_URL", "")
         self.api_key = os.getenv("SAP_API_KEY", "")
 
-        # Mock database for demo
-        self.mock_customers = {}
+        # Mock database for demo (shared so every worker sees SAP-side changes)
+        self.mock_customers = state_store.namespace("sap_mock_customers")
 
     def update_credit_limit(self, customer_id: str, new_limit: float, reason: str) -> SAPUpdateResponse:
         """Update credit limit in SAP"""
@@ -33,15 +46,49 @@ class SAPAdapter:
         else:
             return self._real_update_credit_block(customer_id, block_flag, reason)
 
+    def apply_updates(self, updates: List[SAPUpdate]) -> List[Union[SAPUpdateResponse, Exception]]:
+        """Apply a batch of updates in order; one response (or error) per update"""
+        if self.mode != "mock":
+            return self._real_apply_updates(updates)
+
+        results: List[Union[SAPUpdateResponse, Exception]] = []
+        for update in updates:
+            try:
+                if update.action == "block":
+                    results.append(self._mock_update_credit_block(update.customer_id, update.value, update.reason))
+                else:
+                    results.append(self._mock_update_credit_limit(update.customer_id, update.value, update.reason))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def get_credit_status(self, customer_id: str) -> Optional[SAPCreditStatus]:
+        """Read current credit limit / block status from SAP"""
+        if self.mode == "mock":
+            return self._mock_get_credit_status(customer_id)
+        else:
+            return self._real_get_credit_status(customer_id)
+
+    def _mock_get_credit_status(self, customer_id: str) -> Optional[SAPCreditStatus]:
+        """Mock implementation (only customers changed through this adapter are known)"""
+        record = self.mock_customers.get(customer_id)
+        if record is None:
+            return None
+
+        return SAPCreditStatus(
+            customer_id=customer_id,
+            credit_limit=record.get("credit_limit"),
+            credit_block=record.get("credit_block"),
+            as_of=datetime.now()
+        )
+
     def _mock_update_credit_limit(self, customer_id: str, new_limit: float, reason: str) -> SAPUpdateResponse:
         """Mock implementation"""
         sap_ref = f"SAP-LIM-{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
         # Update mock database
-        if customer_id not in self.mock_customers:
-            self.mock_customers[customer_id] = {}
-
-        self.mock_customers[customer_id]["credit_limit"] = new_limit
+        self.mock_customers.put_if_absent(customer_id, {})
+        self.mock_customers.update_item(customer_id, lambda record: {**record, "credit_limit": new_limit})
 
         return SAPUpdateResponse(
             success=True,
@@ -55,10 +102,8 @@ class SAPAdapter:
         sap_ref = f"SAP-BLK-{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
         # Update mock database
-        if customer_id not in self.mock_customers:
-            self.mock_customers[customer_id] = {}
-
-        self.mock_customers[customer_id]["credit_block"] = block_flag
+        self.mock_customers.put_if_absent(customer_id, {})
+        self.mock_customers.update_item(customer_id, lambda record: {**record, "credit_block": block_flag})
 
         action = "activated" if block_flag else "released"
 
@@ -85,6 +130,77 @@ class SAPAdapter:
         # TODO: Implement real SAP OData API calls
         raise NotImplementedError("Real SAP integration not implemented")
 
+    def _real_apply_updates(self, updates: List[SAPUpdate]) -> List[Union[SAPUpdateResponse, Exception]]:
+        """Real SAP API implementation (placeholder)"""
+        # TODO: One OData $batch request with a changeset per update
+        raise NotImplementedError("Real SAP integration not implemented")
+
+    def _real_get_credit_status(self, customer_id: str) -> Optional[SAPCreditStatus]:
+        """Real SAP API implementation (placeholder)"""
+        # TODO: Implement real SAP OData API calls (A_CustomerCreditLimit)
+        raise NotImplementedError("Real SAP integration not implemented")
+
+
+class _Batch:
+    def __init__(self):
+        self.updates: List[SAPUpdate] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: List[Union[SAPUpdateResponse, Exception]] = []
+
+
+class SAPUpdateBatcher:
+    """
+    Groups SAP updates submitted concurrently (e.g. workflows resumed by a
+    bulk approval) into one adapter call. The first update of a batch waits
+    up to `window` seconds for others, or until `size` updates are collected.
+    """
+
+    def __init__(self, adapter: SAPAdapter, window: float = SAP_BATCH_WINDOW, size: int = SAP_BATCH_SIZE):
+        self.adapter = adapter
+        self.window = window
+        self.size = size
+        self._lock = threading.Lock()
+        self._current: Optional[_Batch] = None
+
+    def submit(self, update: SAPUpdate) -> SAPUpdateResponse:
+        """Apply one update as part of a batch; blocks until the batch is applied"""
+        with self._lock:
+            batch, leader = self._current, False
+            if batch is None:
+                batch, leader = _Batch(), True
+                self._current = batch
+            index = len(batch.updates)
+            batch.updates.append(update)
+            if len(batch.updates) >= self.size:
+                self._current = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._current is batch:
+                    self._current = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        result = batch.results[index]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, batch: _Batch):
+        try:
+            batch.results = self.adapter.apply_updates(batch.updates)
+        except Exception as e:
+            batch.results = [e] * len(batch.updates)
+        finally:
+            batch.done.set()
+        if len(batch.updates) > 1:
+            print(f"SAP BATCH: {len(batch.updates)} updates in one call")
+
 
 # Singleton instance
 sap_adapter = SAPAdapter()
+sap_batcher = SAPUpdateBatcher(sap_adapter)
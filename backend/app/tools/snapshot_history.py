@@ -0,0 +1,253 @@
+"""
+Customer Snapshot History
+Utilisation, DSO and ageing of each customer at every snapshot refresh, kept
+in fixed-size array ring buffers: recent points at full resolution, older
+points averaged into one point per HISTORY_DOWNSAMPLE_S. Trend features
+(e.g. DSO slope over 90 days) are cached per history version.
+"""
+import base64
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..models.schemas import CustomerSnapshot
+from ..state import StateStore, state_store
+
+# Recent points kept as recorded; older ones are downsampled
+HISTORY_RAW_POINTS = int(os.getenv("HISTORY_RAW_POINTS", "96"))
+HISTORY_DOWNSAMPLE_S = float(os.getenv("HISTORY_DOWNSAMPLE_S", str(24 * 3600)))
+HISTORY_DOWNSAMPLED_POINTS = int(os.getenv("HISTORY_DOWNSAMPLED_POINTS", "730"))
+
+# Max number of customers whose trend features are kept in memory
+TREND_CACHE_SIZE = 4096
+
+# Columns of a point: epoch seconds, points averaged into it, then the series
+COLUMNS = ("ts", "n", "utilisation_pct", "dso", "0_30", "31_60", "61_90", "90_plus")
+WIDTH = len(COLUMNS)
+TS, N, UTILISATION, DSO, B0_30, B31_60, B61_90, B90_PLUS = range(WIDTH)
+
+_HEADER = struct.Struct("<II")  # capacity, count
+_DAY_S = 24 * 3600
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of WIDTH-double rows in one array (oldest overwritten)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.start = 0
+        self.count = 0
+        self.data = array("d", bytes(8 * WIDTH * capacity))
+
+    def append(self, row: Iterable[float]) -> Optional[List[float]]:
+        """Add a row; returns the evicted oldest row when full"""
+        evicted = None
+        if self.count == self.capacity:
+            evicted = self.row(0)
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+        offset = (self.start + self.count) % self.capacity * WIDTH
+        self.data[offset:offset + WIDTH] = array("d", row)
+        self.count += 1
+        return evicted
+
+    def row(self, index: int) -> List[float]:
+        """index-th oldest row (-1: newest)"""
+        offset = (self.start + index % self.count) % self.capacity * WIDTH
+        return self.data[offset:offset + WIDTH].tolist()
+
+    def set_row(self, index: int, row: Iterable[float]):
+        offset = (self.start + index % self.count) % self.capacity * WIDTH
+        self.data[offset:offset + WIDTH] = array("d", row)
+
+    def rows(self) -> List[List[float]]:
+        return [self.row(index) for index in range(self.count)]
+
+    def to_bytes(self) -> bytes:
+        """Header + used rows, oldest first"""
+        head = self.start * WIDTH
+        tail = min(self.start + self.count, self.capacity) * WIDTH
+        used = self.data[head:tail]
+        used.extend(self.data[:max(0, self.start + self.count - self.capacity) * WIDTH])
+        return _HEADER.pack(self.capacity, self.count) + used.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, offset: int = 0) -> Tuple["RingBuffer", int]:
+        """(buffer, offset after it)"""
+        capacity, count = _HEADER.unpack_from(raw, offset)
+        offset += _HEADER.size
+        buffer = cls(capacity)
+        end = offset + 8 * WIDTH * count
+        buffer.data[:count * WIDTH] = array("d", raw[offset:end])
+        buffer.count = count
+        return buffer, end
+
+
+class CustomerHistory:
+    """A customer's two tiers: recent (as recorded) and downsampled (older)"""
+
+    def __init__(
+        self,
+        recent: Optional[RingBuffer] = None,
+        downsampled: Optional[RingBuffer] = None
+    ):
+        self.recent = recent or RingBuffer(HISTORY_RAW_POINTS)
+        self.downsampled = downsampled or RingBuffer(HISTORY_DOWNSAMPLED_POINTS)
+
+    def add(self, snapshot: CustomerSnapshot, at: float):
+        ageing = snapshot.ageing
+        evicted = self.recent.append((
+            at, 1.0, snapshot.utilisation_pct, snapshot.dso,
+            ageing.bucket_0_30, ageing.bucket_31_60, ageing.bucket_61_90, ageing.bucket_90_plus
+        ))
+        if evicted is not None:
+            self._downsample(evicted)
+
+    def _downsample(self, row: List[float]):
+        """Fold a point leaving the recent tier into its period's average"""
+        if self.downsampled.count:
+            last = self.downsampled.row(-1)
+            if int(last[TS] // HISTORY_DOWNSAMPLE_S) == int(row[TS] // HISTORY_DOWNSAMPLE_S):
+                n = last[N] + row[N]
+                self.downsampled.set_row(-1, [
+                    n if column == N else (last[column] * last[N] + row[column] * row[N]) / n
+                    for column in range(WIDTH)
+                ])
+                return
+        self.downsampled.append(row)
+
+    def points(self) -> List[List[float]]:
+        """All points, oldest first"""
+        return self.downsampled.rows() + self.recent.rows()
+
+    def encode(self) -> str:
+        return base64.b64encode(self.recent.to_bytes() + self.downsampled.to_bytes()).decode("ascii")
+
+    @classmethod
+    def decode(cls, raw: str) -> "CustomerHistory":
+        data = base64.b64decode(raw)
+        recent, offset = RingBuffer.from_bytes(data)
+        downsampled, _ = RingBuffer.from_bytes(data, offset)
+        return cls(recent, downsampled)
+
+
+def _slope(points: List[List[float]], column: int) -> float:
+    """Least-squares slope per 30 days (points weighted by how many they average)"""
+    weight = sum(point[N] for point in points)
+    mean_x = sum(point[TS] * point[N] for point in points) / weight
+    mean_y = sum(point[column] * point[N] for point in points) / weight
+    var = sum(point[N] * (point[TS] - mean_x) ** 2 for point in points)
+    if var == 0:
+        return 0.0
+    cov = sum(point[N] * (point[TS] - mean_x) * (point[column] - mean_y) for point in points)
+    return cov / var * 30 * _DAY_S
+
+
+def _overdue_pct(point: List[float]) -> float:
+    total = point[B0_30] + point[B31_60] + point[B61_90] + point[B90_PLUS]
+    return (total - point[B0_30]) / total * 100 if total > 0 else 0.0
+
+
+def trend_features(points: List[List[float]], window_days: int) -> Optional[Dict[str, float]]:
+    """Trend over the `window_days` before the latest point (None below two points)"""
+    if not points:
+        return None
+    since = points[-1][TS] - window_days * _DAY_S
+    window = [point for point in points if point[TS] >= since]
+    if len(window) < 2:
+        return None
+    first, last = window[0], window[-1]
+    return {
+        "window_days": window_days,
+        "points": len(window),
+        "span_days": round((last[TS] - first[TS]) / _DAY_S, 1),
+        "dso_slope": round(_slope(window, DSO), 2),  # days per 30 days
+        "utilisation_slope": round(_slope(window, UTILISATION), 2),  # pp per 30 days
+        "dso_change": round(last[DSO] - first[DSO], 1),
+        "overdue_pct_change": round(_overdue_pct(last) - _overdue_pct(first), 1),
+        "ageing_90_plus_change": round(last[B90_PLUS] - first[B90_PLUS], 2)
+    }
+
+
+class SnapshotHistory:
+    """Per-customer histories in the shared store, with trend features cached per version"""
+
+    def __init__(self, store: Optional[StateStore] = None):
+        self.store = store or state_store
+        self.name = "snapshot_history"
+        # customer_id -> (stored history it was computed from, window_days -> features)
+        self._trends: "OrderedDict[str, Tuple[str, Dict[int, Optional[Dict[str, float]]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, snapshot: CustomerSnapshot, at: Optional[float] = None):
+        """Add the snapshot's values as a point (atomic per customer)"""
+        at = time.time() if at is None else at
+
+        def apply(raw: Optional[str]) -> str:
+            history = CustomerHistory.decode(raw) if raw else CustomerHistory()
+            history.add(snapshot, at)
+            return history.encode()
+
+        self.store.update(self.name, snapshot.customer_id, apply)
+
+    def record_many(self, snapshots: Iterable[CustomerSnapshot], at: Optional[float] = None):
+        """One point per snapshot, written in one transaction (bulk imports)"""
+        at = time.time() if at is None else at
+        updated = {}
+        for snapshot in snapshots:
+            raw = updated.get(snapshot.customer_id) or self.store.get(self.name, snapshot.customer_id)
+            history = CustomerHistory.decode(raw) if raw else CustomerHistory()
+            history.add(snapshot, at)
+            updated[snapshot.customer_id] = history.encode()
+        if updated:
+            self.store.put_many(self.name, updated)
+
+    def seed(self, customer_id: str, points: Iterable[Tuple[float, CustomerSnapshot]]) -> bool:
+        """Store a whole history unless the customer already has one (demo data)"""
+        history = CustomerHistory()
+        for at, snapshot in points:
+            history.add(snapshot, at)
+        return self.store.put_if_absent(self.name, customer_id, history.encode())
+
+    def has_history(self, customer_id: str) -> bool:
+        return self.store.get(self.name, customer_id) is not None
+
+    def points(self, customer_id: str) -> List[Dict[str, float]]:
+        """All points of a customer, oldest first"""
+        raw = self.store.get(self.name, customer_id)
+        if not raw:
+            return []
+        return [
+            {"timestamp": point[TS], "n": int(point[N]), **dict(zip(COLUMNS[2:], point[2:]))}
+            for point in CustomerHistory.decode(raw).points()
+        ]
+
+    def trend(self, customer_id: str, window_days: int = 90) -> Optional[Dict[str, float]]:
+        """Trend features; recomputed only when the customer's history changed"""
+        raw = self.store.get(self.name, customer_id)
+        if not raw:
+            return None
+        with self._lock:
+            cached = self._trends.get(customer_id)
+            if cached and (cached[0] is raw or cached[0] == raw) and window_days in cached[1]:
+                self._trends.move_to_end(customer_id)
+                return cached[1][window_days]
+
+        features = trend_features(CustomerHistory.decode(raw).points(), window_days)
+        with self._lock:
+            cached = self._trends.get(customer_id)
+            windows = cached[1] if cached and cached[0] == raw else {}
+            windows[window_days] = features
+            self._trends[customer_id] = (raw, windows)
+            self._trends.move_to_end(customer_id)
+            while len(self._trends) > TREND_CACHE_SIZE:
+                self._trends.popitem(last=False)
+        return features
+
+
+# Singleton instance
+snapshot_history = SnapshotHistory()
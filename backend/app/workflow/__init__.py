@@ -1,2 +1,9 @@
-from .agent import CreditWorkflowAgent
-from .graph import create_workflow_graph
+# The agent and graph modules import LangChain/LangGraph; load them on first access
+def __getattr__(name: str):
+    if name == "CreditWorkflowAgent":
+        from .agent import CreditWorkflowAgent
+        return CreditWorkflowAgent
+    if name == "create_workflow_graph":
+        from .graph import create_workflow_graph
+        return create_workflow_graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,16 +2,61 @@
 CreditWorkflowAgent - Core AI Agent for Credit Decision Workflow
 Implements the 5-step process with explainability
 """
+import asyncio
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
 from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
 from ..models.schemas import (
     CreditRequest, CustomerSnapshot, AIRecommendation, ApproverDecision,
-    RecommendationType, WorkflowStatus, DecisionType, WorkflowSummary
+    WorkflowStatus, DecisionType, WorkflowSummary,
+    AnalysisContext, LLMAnalysis
 )
+from ..llm import (
+    AttemptCancelled, LLMUnavailableError, PromptBudgetError, StructuredResult,
+    compile_prompt, count_tokens, llm_guard, llm_usage, stream_structured
+)
+from ..policy import policy_engine, snapshot_metrics
 from ..tools.credit_tools import credit_tools
+from .analysis_stream import AnalysisStreamWriter
+from .approvals import APPROVAL_MODE, AwaitingApproval, approval_inbox
+from .graph import STATE_KEYS, create_checkpointer, create_workflow_graph
+
+
+# Per-source timeouts (seconds) for the data-gathering fan-out before analysis
+SOURCE_TIMEOUTS = {
+    "customer_snapshot": float(os.getenv("SOURCE_TIMEOUT_SNAPSHOT", "10")),
+    "request_history": float(os.getenv("SOURCE_TIMEOUT_HISTORY", "5")),
+    "sap_status": float(os.getenv("SOURCE_TIMEOUT_SAP", "5")),
+    "snapshot_trend": float(os.getenv("SOURCE_TIMEOUT_TREND", "2")),
+}
+
+# Compiled once; the history and free-text reason are shortened first when over budget
+CREDIT_ANALYSIS_PROMPT = compile_prompt(
+    "credit_analysis",
+    system="""
+        Expert credit controller, Indian manufacturer. Judge on DSO, ageing, utilisation, risk category.
+        Recommend one of: RELEASE_BLOCK, MAINTAIN_BLOCK, PARTIAL_LIMIT_INCREASE, FULL_LIMIT_INCREASE, REJECT_REQUEST.
+        Be specific and data-driven.
+    """,
+    human="""
+        REQUEST: type {request_type}; requested limit {requested_limit}; reason: {reason}
+        CUSTOMER: {customer_name} ({segment}); limit ₹{current_limit:,.0f}; blocked {credit_block}; utilisation {utilisation_pct:.1f}%; DSO {dso:.0f}d; risk {risk_category}
+        AGEING ₹: 0-30 {ageing_0_30:,.0f}; 31-60 {ageing_31_60:,.0f}; 61-90 {ageing_61_90:,.0f}; 90+ {ageing_90_plus:,.0f}; overdue {overdue_pct:.1f}%
+        TREND: {trend}
+        HISTORY: prior requests: {prior_requests}; SAP: {sap_status}
+        Answer with the LLMAnalysis function.
+    """,
+    budget=int(os.getenv("ANALYSIS_PROMPT_TOKEN_BUDGET", "600")),
+    trimmable=("prior_requests", "reason")
+)
+
+# Dedicated pool so a timed-out source never blocks event loop shutdown
+_source_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="source")
 
 
 class CreditWorkflowAgent:
@@ -21,62 +66,63 @@ class CreditWorkflowAgent:
     """
 
     def __init__(self):
+        # Retries and timeouts are owned by llm_guard (hedging + deadline)
         self.llm = ChatOpenAI(
             model="gpt-4",
             temperature=0.3,
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            request_timeout=llm_guard.deadline_s,
+            max_retries=0
         )
         self.tools = credit_tools
+        self.checkpointer = create_checkpointer(self.tools.store)
+        self.graph = create_workflow_graph(self, self.checkpointer)
 
-    def execute_workflow(self, request_id: str) -> WorkflowSummary:
+    def execute_workflow(self, request_id: str, resume: bool = False) -> WorkflowSummary:
         """
-        Execute the complete 5-step workflow
+        Execute the complete 5-step workflow on the compiled graph
+        resume=True continues from the last checkpoint: steps whose output
+        is already checkpointed are skipped instead of re-run
         Returns: WorkflowSummary with all events and final decision
+        Raises AwaitingApproval when the run stopped for a decision (inbox mode)
         """
-        print(f"\n{'='*60}")
-        print(f"STARTING CREDIT WORKFLOW FOR REQUEST: {request_id}")
-        print(f"{'='*60}\n")
-
-        # STEP 1: Credit Block Trigger
-        credit_request = self._step1_credit_block_trigger(request_id)
-
-        # STEP 2: AI Analysis & Recommendation
-        customer_snapshot = self.tools.get_customer_snapshot(credit_request.customer_id)
-        ai_recommendation = self._step2_analysis_and_recommendation(credit_request, customer_snapshot)
+        # Fresh runs clear outputs left in the checkpoint by earlier runs
+        initial_state = {key: None for key in STATE_KEYS}
+        initial_state.update(
+            request_id=request_id,
+            run_id=uuid.uuid4().hex,
+            status=WorkflowStatus.PENDING.value
+        )
 
-        # STEP 3: Human Approval (BLOCKING - must wait for human decision)
-        # In async system, workflow pauses here until approval received
-        print("\nWORKFLOW PAUSED - Waiting for human approval...")
-        print("In production, this would wait for real human input via API\n")
+        checkpointed = self.checkpointer.get_state(request_id) if resume else None
+        if checkpointed:
+            initial_state.update(checkpointed)
 
-        # For demo, simulate waiting or use pre-set decision
-        approver_decision = self._step3_wait_for_approval(request_id, ai_recommendation)
+        print(f"\n{'='*60}")
+        if checkpointed:
+            print(f"RESUMING CREDIT WORKFLOW FOR REQUEST: {request_id} (after {checkpointed.get('current_step')})")
+        else:
+            print(f"STARTING CREDIT WORKFLOW FOR REQUEST: {request_id}")
+        print(f"{'='*60}\n")
 
-        # STEP 4: SAP Update
-        sap_result = self._step4_sap_update(
-            credit_request,
-            customer_snapshot,
-            approver_decision
+        # Thread ID = request ID, so the checkpoint of a run is addressable by request
+        final_state = self.graph.invoke(
+            initial_state,
+            config={"configurable": {"thread_id": request_id}}
         )
 
-        # STEP 5: Notification
-        self._step5_notification(credit_request, approver_decision, sap_result)
-
-        # Generate final summary
-        summary = self._generate_workflow_summary(
-            request_id,
-            credit_request,
-            customer_snapshot,
-            ai_recommendation,
-            approver_decision,
-            sap_result
-        )
+        if final_state.get("current_step") == "awaiting_approval":
+            raise AwaitingApproval(request_id)
 
         print(f"\n{'='*60}")
         print(f"WORKFLOW COMPLETED FOR REQUEST: {request_id}")
         print(f"{'='*60}\n")
 
-        return summary
+        return WorkflowSummary.model_validate(final_state["summary"])
+
+    def get_workflow_state(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Last checkpointed graph state for a request (None if never run)"""
+        return self.checkpointer.get_state(request_id)
 
     def _step1_credit_block_trigger(self, request_id: str) -> CreditRequest:
         """STEP 1: Retrieve and validate credit request"""
@@ -106,31 +152,117 @@ class CreditWorkflowAgent:
 
         return credit_request
 
+    def _gather_analysis_context(self, credit_request: CreditRequest) -> AnalysisContext:
+        """
+        Data-gathering stage before analysis
+        Fetches snapshot, request history and SAP status concurrently, so
+        the stage takes as long as the slowest source, not the sum of all.
+        """
+        return asyncio.run(self._gather_sources(credit_request))
+
+    async def _gather_sources(self, credit_request: CreditRequest) -> AnalysisContext:
+        customer_id = credit_request.customer_id
+        sources: Dict[str, Callable[[], Any]] = {
+            "customer_snapshot": lambda: self.tools.get_customer_snapshot(customer_id),
+            "request_history": lambda: self.tools.get_customer_request_history(
+                customer_id, exclude_request_id=credit_request.request_id
+            ),
+            "sap_status": lambda: self.tools.get_sap_credit_status(customer_id),
+            "snapshot_trend": lambda: self.tools.get_customer_trend(customer_id),
+        }
+
+        results = await asyncio.gather(
+            *(self._fetch_source(name, fetch) for name, fetch in sources.items())
+        )
+        fetched = dict(zip(sources, results))
+
+        # Snapshot is mandatory; history and SAP status only enrich the analysis
+        snapshot, snapshot_error, _ = fetched["customer_snapshot"]
+        if snapshot_error is not None:
+            raise snapshot_error
+
+        history, _, _ = fetched["request_history"]
+        sap_status, _, _ = fetched["sap_status"]
+        trend, _, _ = fetched["snapshot_trend"]
+
+        # SAP is the system of record for limit and block flag
+        if sap_status is not None:
+            overrides = {}
+            if sap_status.credit_limit is not None:
+                overrides["current_limit"] = sap_status.credit_limit
+            if sap_status.credit_block is not None:
+                overrides["credit_block"] = sap_status.credit_block
+            snapshot = snapshot.with_changes(**overrides)
+
+        return AnalysisContext(
+            request=credit_request,
+            snapshot=snapshot,
+            prior_requests=history or [],
+            sap_status=sap_status,
+            trend=trend,
+            source_latency_ms={name: latency for name, (_, _, latency) in fetched.items()},
+            source_errors={
+                name: str(error) or type(error).__name__
+                for name, (_, error, _) in fetched.items() if error is not None
+            }
+        )
+
+    async def _fetch_source(self, name: str, fetch: Callable[[], Any]):
+        """Run one blocking source with its timeout. Returns (value, error, latency_ms)"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(
+                loop.run_in_executor(_source_executor, fetch),
+                timeout=SOURCE_TIMEOUTS[name]
+            )
+            error = None
+        except asyncio.TimeoutError:
+            value, error = None, TimeoutError(f"{name} timed out after {SOURCE_TIMEOUTS[name]:.1f}s")
+        except Exception as e:
+            value, error = None, e
+
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        return value, error, latency_ms
+
     def _step2_analysis_and_recommendation(
         self,
         credit_request: CreditRequest,
-        customer_snapshot: CustomerSnapshot
+        customer_snapshot: CustomerSnapshot,
+        context: Optional[AnalysisContext] = None
     ) -> AIRecommendation:
         """STEP 2: AI Analysis & Recommendation"""
         print("STEP 2: AI Analysis & Recommendation")
         print("-" * 40)
 
         # Perform credit analysis
-        analysis = self._perform_credit_analysis(credit_request, customer_snapshot)
+        analysis = self._perform_credit_analysis(credit_request, customer_snapshot, context)
+
+        payload = {
+            "request_id": credit_request.request_id,
+            "recommendation": analysis.recommendation.value,
+            "confidence": analysis.confidence,
+            "rationale": analysis.rationale,
+            "key_metrics": analysis.key_metrics,
+            "risk_signals": analysis.risk_signals,
+            "policy_version": analysis.policy_version,
+            "policy_check": analysis.policy_check,
+            "llm_usage": analysis.llm_usage,
+            "source": analysis.source,
+            "fallback_reason": analysis.fallback_reason
+        }
+        if context:
+            payload["data_sources"] = {
+                "latency_ms": context.source_latency_ms,
+                "errors": context.source_errors
+            }
 
         # Emit event
         self.tools.emit_workflow_event(
             step="AI Analysis & Recommendation",
             status=WorkflowStatus.COMPLETED,
             actor="AI",
-            payload={
-                "request_id": credit_request.request_id,
-                "recommendation": analysis.recommendation.value,
-                "confidence": analysis.confidence,
-                "rationale": analysis.rationale,
-                "key_metrics": analysis.key_metrics,
-                "risk_signals": analysis.risk_signals
-            }
+            payload=payload
         )
 
         print(f"Recommendation: {analysis.recommendation.value}")
@@ -143,72 +275,26 @@ class CreditWorkflowAgent:
     def _perform_credit_analysis(
         self,
         request: CreditRequest,
-        snapshot: CustomerSnapshot
+        snapshot: CustomerSnapshot,
+        context: Optional[AnalysisContext] = None
     ) -> AIRecommendation:
         """Core credit analysis logic using LLM"""
 
-        # Calculate key metrics
-        total_outstanding = sum([
-            snapshot.ageing.bucket_0_30,
-            snapshot.ageing.bucket_31_60,
-            snapshot.ageing.bucket_61_90,
-            snapshot.ageing.bucket_90_plus
-        ])
-
-        overdue_pct = (
-            (snapshot.ageing.bucket_31_60 + snapshot.ageing.bucket_61_90 + snapshot.ageing.bucket_90_plus)
-            / total_outstanding * 100
-        ) if total_outstanding > 0 else 0
-
-        # Build prompt for LLM
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert credit controller for an Indian manufacturing company.
-            You analyze credit requests with discipline, focusing on DSO, ageing, utilisation, and risk category.
-
-            Provide your recommendation as one of:
-            - RELEASE_BLOCK: Remove credit block
-            - MAINTAIN_BLOCK: Keep credit block in place
-            - PARTIAL_LIMIT_INCREASE: Approve partial increase
-            - FULL_LIMIT_INCREASE: Approve full requested increase
-            - REJECT_REQUEST: Deny the request
-
-            Be specific, data-driven, and focused on trade credit discipline."""),
-            ("human", """Analyze this credit request:
-
-            REQUEST:
-            - Type: {request_type}
-            - Requested Limit: {requested_limit}
-            - Reason: {reason}
-
-            CUSTOMER SNAPSHOT:
-            - Name: {customer_name}
-            - Segment: {segment}
-            - Current Limit: ₹{current_limit:,.2f}
-            - Credit Block: {credit_block}
-            - Utilisation: {utilisation_pct:.1f}%
-            - DSO: {dso:.0f} days
-            - Risk Category: {risk_category}
-
-            AGEING ANALYSIS:
-            - 0-30 days: ₹{ageing_0_30:,.2f}
-            - 31-60 days: ₹{ageing_31_60:,.2f}
-            - 61-90 days: ₹{ageing_61_90:,.2f}
-            - 90+ days: ₹{ageing_90_plus:,.2f}
-            - Overdue %: {overdue_pct:.1f}%
-
-            Provide:
-            1. Your recommendation (one of the 5 options above)
-            2. Recommended limit (if applicable)
-            3. Confidence (0-1)
-            4. Clear rationale (2-3 sentences max)
-            5. Key risk signals identified
-
-            Format as JSON.""")
-        ])
-
-        # Invoke LLM
-        response = self.llm.invoke(
-            prompt.format_messages(
+        # Enrichment from the data-gathering stage
+        prior_requests = context.prior_requests if context else []
+        sap_status = context.sap_status if context else None
+        trend = context.trend if context else None
+
+        # Calculate key metrics (the inputs of the credit policy)
+        metrics = snapshot_metrics(snapshot, prior_requests=len(prior_requests))
+        total_outstanding = metrics["total_outstanding"]
+        overdue_pct = metrics["overdue_pct"]
+
+        # Render the compiled prompt within its token budget; if it cannot fit,
+        # it is not sent and the credit policy decides
+        over_budget: Optional[PromptBudgetError] = None
+        try:
+            prompt = CREDIT_ANALYSIS_PROMPT.render(
                 request_type=request.request_type.value,
                 requested_limit=request.requested_limit or "N/A",
                 reason=request.reason,
@@ -223,83 +309,161 @@ class CreditWorkflowAgent:
                 ageing_31_60=snapshot.ageing.bucket_31_60,
                 ageing_61_90=snapshot.ageing.bucket_61_90,
                 ageing_90_plus=snapshot.ageing.bucket_90_plus,
-                overdue_pct=overdue_pct
+                overdue_pct=overdue_pct,
+                # Most recent first, so trimming drops the oldest
+                prior_requests="; ".join(
+                    f"{r.request_type.value} {r.created_at:%Y-%m-%d}"
+                    for r in sorted(prior_requests, key=lambda r: r.created_at, reverse=True)
+                ) or "None",
+                sap_status=(
+                    f"limit {sap_status.credit_limit}, block {sap_status.credit_block}"
+                    if sap_status else "Unavailable"
+                ),
+                trend=(
+                    f"{trend['span_days']:.0f}d: DSO {trend['dso_slope']:+.1f}d/month, "
+                    f"utilisation {trend['utilisation_slope']:+.1f}pp/month, overdue {trend['overdue_pct_change']:+.1f}pp"
+                    if trend else "No history"
+                )
+            )
+        except PromptBudgetError as e:
+            prompt, over_budget = e.prompt, e
+            llm_usage.record_over_budget(CREDIT_ANALYSIS_PROMPT.name, request.request_type.value)
+
+        # Structured output; recommendation and rationale stream to the UI as generated.
+        # The guard may hedge with a second request: only the first to produce
+        # tokens streams, the first to finish wins, and the rest are cancelled
+        stream = AnalysisStreamWriter(request.request_id, self.tools.store)
+        leader: List[int] = []
+        leader_lock = threading.Lock()
+        # Text streamed by each attempt that was sent: cancelled ones are billed too
+        generated: Dict[int, List[str]] = {}
+
+        def attempt(cancelled: threading.Event, index: int) -> StructuredResult:
+            generated[index] = []
+
+            def on_field(name: str, delta: str, complete: bool):
+                if cancelled.is_set():
+                    raise AttemptCancelled()
+                generated[index].append(delta)
+                with leader_lock:
+                    if not leader:
+                        leader.append(index)
+                if leader[0] == index:
+                    stream.field(name, delta, complete)
+
+            return stream_structured(
+                self.llm, prompt.messages, LLMAnalysis,
+                stream_fields=("recommendation", "rationale"), on_field=on_field
             )
-        )
-
-        # Parse LLM response (simplified for demo)
-        # In production, use function calling or structured output
-        recommendation_text = response.content
-
-        # For demo, apply rule-based logic with LLM context
-        risk_signals = []
-
-        if snapshot.dso > 60:
-            risk_signals.append(f"High DSO: {snapshot.dso:.0f} days")
-
-        if overdue_pct > 30:
-            risk_signals.append(f"High overdue: {overdue_pct:.1f}%")
-
-        if snapshot.utilisation_pct > 85:
-            risk_signals.append(f"High utilisation: {snapshot.utilisation_pct:.1f}%")
-
-        if snapshot.ageing.bucket_90_plus > 1000000:
-            risk_signals.append(f"Significant 90+ ageing: ₹{snapshot.ageing.bucket_90_plus:,.0f}")
 
-        # Determine recommendation
-        if request.request_type == "UNBLOCK":
-            if len(risk_signals) == 0 or (snapshot.risk_category == "A" and overdue_pct < 20):
-                recommendation = RecommendationType.RELEASE_BLOCK
-                confidence = 0.85
-                rationale = f"Customer shows strong payment discipline with DSO of {snapshot.dso:.0f} days and {overdue_pct:.1f}% overdue. Risk category {snapshot.risk_category.value} supports unblocking."
-            elif len(risk_signals) <= 2 and overdue_pct < 40:
-                recommendation = RecommendationType.RELEASE_BLOCK
-                confidence = 0.70
-                rationale = f"Moderate risk signals present but manageable. Customer has demonstrated recent payment improvement. Recommend unblocking with close monitoring."
-            else:
-                recommendation = RecommendationType.MAINTAIN_BLOCK
-                confidence = 0.80
-                rationale = f"Multiple risk signals identified: {', '.join(risk_signals[:2])}. Maintain block until payment discipline improves."
-
-        elif request.request_type == "LIMIT_INCREASE":
-            if len(risk_signals) == 0 and snapshot.utilisation_pct < 70:
-                recommendation = RecommendationType.FULL_LIMIT_INCREASE
-                confidence = 0.90
-                rationale = f"Excellent payment track record and healthy utilisation at {snapshot.utilisation_pct:.1f}%. Full increase approved."
-            elif len(risk_signals) <= 1:
-                recommendation = RecommendationType.PARTIAL_LIMIT_INCREASE
-                confidence = 0.75
-                rationale = f"Good payment history with minor concerns. Recommend partial increase of 30-50% with review in 90 days."
-            else:
-                recommendation = RecommendationType.REJECT_REQUEST
-                confidence = 0.85
-                rationale = f"Multiple credit concerns prevent limit increase: {', '.join(risk_signals[:2])}. Focus on clearing overdue first."
+        started = time.perf_counter()
+        if over_budget is not None:
+            result, winner, fallback_reason = None, None, str(over_budget)
         else:
-            recommendation = RecommendationType.MAINTAIN_BLOCK
-            confidence = 0.70
-            rationale = "Request requires further review by credit committee."
-
-        return AIRecommendation(
-            recommendation=recommendation,
-            recommended_limit=None if request.request_type == "UNBLOCK" else snapshot.current_limit * 1.3,
-            confidence=confidence,
-            rationale=rationale,
-            key_metrics={
-                "dso": snapshot.dso,
-                "utilisation_pct": snapshot.utilisation_pct,
-                "overdue_pct": round(overdue_pct, 1),
-                "risk_category": snapshot.risk_category.value,
-                "total_outstanding": total_outstanding
-            },
-            risk_signals=risk_signals
+            try:
+                guarded = llm_guard.call(attempt)
+                result, winner, fallback_reason = guarded.value, guarded.winner, guarded.value.error
+            except LLMUnavailableError as e:
+                result, winner, fallback_reason = None, None, e.reason
+            except Exception as e:
+                stream.fail(str(e))
+                raise
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        # Streamed responses carry no provider token counts. Every attempt sent
+        # (hedges, failed or timed-out ones) is counted; for those without a
+        # full answer, the streamed fields are a lower bound of their output
+        attempts = len(generated)
+        completion_tokens = sum(
+            count_tokens(result.raw if index == winner else "".join(deltas), CREDIT_ANALYSIS_PROMPT.model)
+            for index, deltas in list(generated.items())
         )
+        usage = {
+            "prompt": CREDIT_ANALYSIS_PROMPT.name,
+            "prompt_tokens": prompt.input_tokens * attempts,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(latency_ms, 1),
+            "attempts": attempts,
+            "trimmed": prompt.trimmed,
+            "over_budget": over_budget is not None
+        }
+        if attempts:
+            llm_usage.record(
+                CREDIT_ANALYSIS_PROMPT.name, request.request_type.value,
+                usage["prompt_tokens"], usage["completion_tokens"], latency_ms, bool(prompt.trimmed), attempts
+            )
+
+        key_metrics = {
+            "dso": snapshot.dso,
+            "utilisation_pct": snapshot.utilisation_pct,
+            "overdue_pct": round(overdue_pct, 1),
+            "risk_category": snapshot.risk_category.value,
+            "total_outstanding": total_outstanding,
+            "headroom": metrics["headroom"],
+            "ratio_90_plus_to_limit": round(metrics["ratio_90_plus_to_limit"], 4),
+            "prior_requests": len(prior_requests)
+        }
+        if trend:
+            key_metrics["dso_slope_90d"] = trend["dso_slope"]
+            key_metrics["overdue_pct_change_90d"] = trend["overdue_pct_change"]
+
+        # Always evaluated: decides on fallback, cross-checks an LLM answer otherwise
+        decision = policy_engine.evaluate(request.request_type.value, metrics)
+
+        if result is not None and result.value is not None:
+            analysis = result.value
+            recommendation = AIRecommendation(
+                recommendation=analysis.recommendation,
+                recommended_limit=analysis.recommended_limit,
+                confidence=analysis.confidence,
+                rationale=analysis.rationale,
+                key_metrics=key_metrics,
+                risk_signals=analysis.risk_signals,
+                policy_version=decision.policy_version,
+                policy_check={
+                    "recommendation": decision.recommendation.value,
+                    "recommended_limit": decision.recommended_limit,
+                    "confidence": decision.confidence,
+                    "agrees": decision.recommendation == analysis.recommendation
+                },
+                llm_usage=usage,
+                source="llm"
+            )
+            if not recommendation.policy_check["agrees"]:
+                print(f"LLM ANALYSIS: differs from credit policy ({decision.recommendation.value})")
+        else:
+            # No usable LLM answer in time: the deterministic credit policy decides
+            print(f"LLM ANALYSIS: {fallback_reason}, using credit policy")
+            recommendation = AIRecommendation(
+                recommendation=decision.recommendation,
+                recommended_limit=decision.recommended_limit,
+                confidence=decision.confidence,
+                rationale=decision.rationale,
+                key_metrics=key_metrics,
+                risk_signals=decision.risk_signals,
+                policy_version=decision.policy_version,
+                llm_usage=usage,
+                source="rules",
+                fallback_reason=fallback_reason
+            )
+
+        stream.done(recommendation.model_dump(mode="json"))
+        return recommendation
 
     def _step3_wait_for_approval(
         self,
         request_id: str,
         ai_recommendation: AIRecommendation
-    ) -> ApproverDecision:
-        """STEP 3: Wait for human approval (BLOCKING)"""
+    ) -> Optional[ApproverDecision]:
+        """
+        STEP 3: Wait for human approval
+        With APPROVAL_MODE=inbox and no decision yet, the request is put in the
+        approval inbox and None is returned: the run stops until a decision arrives
+        """
+        # Workflow pauses here until approval received
+        print("\nWORKFLOW PAUSED - Waiting for human approval...")
+        print("In production, this would wait for real human input via API\n")
+
         print("STEP 3: Human Approval")
         print("-" * 40)
 
@@ -308,15 +472,38 @@ class CreditWorkflowAgent:
 
         decision = self.tools.get_approver_decision(request_id)
 
+        if not decision and APPROVAL_MODE == "inbox":
+            request = self.tools.get_credit_request(request_id)
+            try:
+                snapshot = self.tools.get_customer_snapshot(request.customer_id)
+            except ValueError:
+                snapshot = None
+            approval_inbox.add(request, snapshot, ai_recommendation)
+            # POST /approve may have stored a decision between the read above and add()
+            decision = self.tools.get_approver_decision(request_id)
+
+        if not decision and APPROVAL_MODE == "inbox":
+            self.tools.emit_workflow_event(
+                step="Human Approval",
+                status=WorkflowStatus.PENDING,
+                actor="Human",
+                payload={"request_id": request_id, "awaiting_approval": True}
+            )
+            print("Waiting in the approval inbox\n")
+            return None
+
+        if decision and APPROVAL_MODE == "inbox":
+            # Decided: no entry may be left for a second decision to resume
+            approval_inbox.discard(request_id)
+
         if not decision:
             # Demo fallback: Auto-approve AI recommendation
             print("No human decision received - using demo auto-approval")
-            decision = ApproverDecision(
+            decision = self.tools.set_default_approver_decision(request_id, ApproverDecision(
                 decision=DecisionType.APPROVE,
                 approved_limit=ai_recommendation.recommended_limit,
                 comments=f"Auto-approved based on AI recommendation: {ai_recommendation.recommendation.value}"
-            )
-            self.tools.set_approver_decision(request_id, decision)
+            ))
 
         self.tools.emit_workflow_event(
             step="Human Approval",
@@ -340,24 +527,19 @@ class CreditWorkflowAgent:
         self,
         request: CreditRequest,
         snapshot: CustomerSnapshot,
-        decision: ApproverDecision
+        decision: ApproverDecision,
+        idempotency_key: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
-        """STEP 4: Update SAP S/4HANA"""
+        """
+        STEP 4: Update SAP S/4HANA
+        With an idempotency_key, a repeated call returns the recorded SAP
+        response instead of applying the change twice
+        """
         print("STEP 4: SAP Update")
         print("-" * 40)
 
         if decision.decision == DecisionType.REJECT:
-            print("Skipped - Request rejected")
-            self.tools.emit_workflow_event(
-                step="SAP Update",
-                status=WorkflowStatus.COMPLETED,
-                actor="SAP",
-                payload={
-                    "request_id": request.request_id,
-                    "action_taken": "No action - request rejected",
-                    "sap_reference_id": None
-                }
-            )
+            self._step4_skip_sap_update(request)
             return None
 
         sap_response = None
@@ -367,14 +549,16 @@ class CreditWorkflowAgent:
             sap_response = self.tools.update_credit_block_s4(
                 customer_id=request.customer_id,
                 block_flag=False,
-                reason=f"Approved by credit controller. {decision.comments}"
+                reason=f"Approved by credit controller. {decision.comments}",
+                idempotency_key=idempotency_key
             )
 
         elif request.request_type == "LIMIT_INCREASE" and decision.approved_limit:
             sap_response = self.tools.update_credit_limit_s4(
                 customer_id=request.customer_id,
                 new_limit=decision.approved_limit,
-                reason=f"Credit limit increase approved. {decision.comments}"
+                reason=f"Credit limit increase approved. {decision.comments}",
+                idempotency_key=idempotency_key
             )
 
         if sap_response:
@@ -394,7 +578,21 @@ class CreditWorkflowAgent:
             print(f"SAP Ref: {sap_response.sap_reference_id}")
             print()
 
-        return sap_response.model_dump() if sap_response else None
+        return sap_response.model_dump(mode="json") if sap_response else None
+
+    def _step4_skip_sap_update(self, request: CreditRequest):
+        """STEP 4 (rejected branch): record that SAP was left untouched"""
+        print("Skipped - Request rejected")
+        self.tools.emit_workflow_event(
+            step="SAP Update",
+            status=WorkflowStatus.COMPLETED,
+            actor="SAP",
+            payload={
+                "request_id": request.request_id,
+                "action_taken": "No action - request rejected",
+                "sap_reference_id": None
+            }
+        )
 
     def _step5_notification(
         self,
@@ -518,5 +716,22 @@ Human approver {'approved' if decision.decision != DecisionType.REJECT else 'rej
         )
 
 
-# Singleton instance
-workflow_agent = CreditWorkflowAgent()
+# Singleton instance, built on first use (LLM client + compiled graph)
+_workflow_agent: Optional[CreditWorkflowAgent] = None
+_workflow_agent_lock = threading.Lock()
+
+
+def get_workflow_agent() -> CreditWorkflowAgent:
+    global _workflow_agent
+    if _workflow_agent is None:
+        with _workflow_agent_lock:
+            if _workflow_agent is None:
+                _workflow_agent = CreditWorkflowAgent()
+    return _workflow_agent
+
+
+def __getattr__(name: str):
+    # Keeps `from .agent import workflow_agent` working
+    if name == "workflow_agent":
+        return get_workflow_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
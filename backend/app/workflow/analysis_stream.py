@@ -0,0 +1,79 @@
+"""
+Analysis Stream
+Rationale tokens of the running LLM analysis, appended to a per-request
+list in the shared store (so the SSE endpoint can tail it from any worker).
+Each analysis replaces the previous one's list under a new generation id, so
+readers (SSE ids are "<generation>:<seq>") can tell a re-run from a resume.
+"""
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..state import StateStore, state_store
+
+NAMESPACE = "analysis_stream"
+
+# Deltas are coalesced into one store append per interval
+FLUSH_INTERVAL = float(os.getenv("ANALYSIS_STREAM_FLUSH_MS", "50")) / 1000
+
+
+class AnalysisStreamWriter:
+    """Publishes one analysis: start, field deltas (coalesced), then done or error"""
+
+    def __init__(self, request_id: str, store: Optional[StateStore] = None):
+        self.request_id = request_id
+        self.store = store or state_store
+        self._pending: Dict[str, str] = {}
+        self._last_flush = 0.0
+        self.generation = uuid.uuid4().hex[:8]
+        # Only the latest analysis is ever read: drop the earlier attempts
+        self.store.delete_list(NAMESPACE, request_id)
+        self.store.put(NAMESPACE, request_id, self.generation)
+        self._append({"type": "start", "generation": self.generation})
+
+    def _append(self, item: Dict[str, Any]):
+        self.store.append(NAMESPACE, self.request_id, json.dumps(item, default=str, separators=(",", ":")))
+
+    def field(self, name: str, delta: str, complete: bool):
+        """Callback for stream_structured: buffer the delta, flush every FLUSH_INTERVAL"""
+        if delta:
+            self._pending[name] = self._pending.get(name, "") + delta
+        if complete or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        for name, text in self._pending.items():
+            self._append({"type": name, "delta": text})
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def done(self, recommendation: Dict[str, Any]):
+        self.flush()
+        self._append({"type": "done", "recommendation": recommendation})
+
+    def fail(self, error: str):
+        self.flush()
+        self._append({"type": "error", "error": error})
+
+
+def read_stream(request_id: str, cursor: str = "", store: Optional[StateStore] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (event id, item) pairs after `cursor` ("<generation>:<seq>", e.g. the
+    Last-Event-ID). A cursor of another generation, i.e. from an analysis
+    since replaced by a re-run, restarts at the new analysis' "start"
+    """
+    store = store or state_store
+    generation = store.get(NAMESPACE, request_id) or ""
+    cursor_generation, _, seq = cursor.partition(":")
+    since = int(seq) if cursor_generation == generation and seq.isdigit() else 0
+
+    items = list(enumerate(
+        (json.loads(raw) for raw in store.read_list(NAMESPACE, request_id, since)), start=since + 1
+    ))
+    if since == 0:
+        starts = [index for index, (_, item) in enumerate(items) if item["type"] == "start"]
+        if starts:
+            items = items[starts[-1]:]
+    return [(f"{generation}:{seq}", item) for seq, item in items]
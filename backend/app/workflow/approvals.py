@@ -0,0 +1,135 @@
+"""
+Approval Inbox
+With APPROVAL_MODE=inbox, workflows park at step 3 until a controller decides.
+Parked requests are kept in the shared store with one sort index per inbox
+order, so a page reads only its own entries; a decision first claims
+(removes) the entries, so each parked run resumes once.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.schemas import AIRecommendation, ApproverDecision, CreditRequest, CustomerSnapshot
+from ..state import StateStore, state_store
+from ..tools.credit_tools import credit_tools
+
+# auto: no decision yet -> approve the AI recommendation (demo) | inbox: wait for a controller
+APPROVAL_MODE = os.getenv("APPROVAL_MODE", "auto")
+
+# Sort keys of the inbox endpoint -> score of an entry in that sort's index
+INBOX_SORTS = {
+    "confidence": lambda entry: entry["confidence"],
+    "exposure": lambda entry: entry["exposure"],
+    # Older first when descending: the score is minus the queue time
+    "age": lambda entry: -datetime.fromisoformat(entry["queued_at"]).timestamp()
+}
+
+
+class AwaitingApproval(Exception):
+    """Raised by a workflow run that stopped at step 3 to wait for a decision"""
+
+    def __init__(self, request_id: str):
+        super().__init__(f"Workflow {request_id} is awaiting approval")
+        self.request_id = request_id
+
+
+class NotAwaitingApproval(ValueError):
+    """Some requests of a bulk decision are not in the inbox (nothing was recorded)"""
+
+    def __init__(self, request_ids: List[str]):
+        super().__init__(f"Not awaiting approval: {', '.join(request_ids)}")
+        self.request_ids = request_ids
+
+
+class ApprovalInbox:
+    """Requests waiting for a human decision, one record per request"""
+
+    def __init__(self, store: Optional[StateStore] = None):
+        self.store = store or state_store
+        self.entries = self.store.namespace("approval_inbox")
+
+    def _index(self, sort: str) -> str:
+        return f"{self.entries.name}:{sort}"
+
+    def _put(self, entries: Dict[str, Dict[str, Any]]):
+        """Store entries, then index them (a listed id always has its entry, or is skipped)"""
+        self.entries.put_many(entries)
+        for request_id, entry in entries.items():
+            for sort, score in INBOX_SORTS.items():
+                self.store.index_add(self._index(sort), request_id, score(entry))
+
+    def _unindex(self, request_id: str):
+        for sort in INBOX_SORTS:
+            self.store.index_remove(self._index(sort), request_id)
+
+    def add(self, request: CreditRequest, snapshot: Optional[CustomerSnapshot], recommendation: AIRecommendation):
+        self._put({request.request_id: {
+            "request_id": request.request_id,
+            "customer_id": request.customer_id,
+            "customer_name": snapshot.name if snapshot else None,
+            "request_type": request.request_type.value,
+            "requested_limit": request.requested_limit,
+            "recommendation": recommendation.recommendation.value,
+            "recommended_limit": recommendation.recommended_limit,
+            "confidence": recommendation.confidence,
+            # Receivables at risk if the block is released / the limit raised
+            "exposure": recommendation.key_metrics.get("total_outstanding") or 0.0,
+            "risk_signals": recommendation.risk_signals,
+            "queued_at": datetime.now().isoformat()
+        }})
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self.entries
+
+    def discard(self, request_id: str) -> bool:
+        """Remove a request from the inbox; True only for the one caller that removed it"""
+        removed = self.store.pop(self.entries.name, request_id) is not None
+        if removed:
+            self._unindex(request_id)
+        return removed
+
+    def list(
+        self, sort: str = "age", descending: bool = True, limit: int = 100, offset: int = 0
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """(total pending, one page of entries) ordered by confidence, exposure or age"""
+        index = self._index(sort)
+        now = datetime.now()
+        entries = []
+        for request_id in self.store.index_range(index, offset, limit, descending):
+            raw = self.store.get(self.entries.name, request_id)
+            if raw is None:
+                continue  # decided while the page was read
+            entry = json.loads(raw)
+            entry["age_s"] = round((now - datetime.fromisoformat(entry["queued_at"])).total_seconds())
+            entries.append(entry)
+        return self.store.index_size(index), entries
+
+    def decide(self, decisions: Dict[str, ApproverDecision]) -> List[str]:
+        """
+        Record decisions for requests in the inbox, all or none
+        Raises NotAwaitingApproval listing the requests that are not pending.
+        Returns the decided request ids (to be resumed)
+        """
+        # Claim the entries first: of concurrent decisions, only one removes each
+        claimed = {}
+        for request_id in decisions:
+            raw = self.store.pop(self.entries.name, request_id)
+            if raw is not None:
+                claimed[request_id] = raw
+        missing = [request_id for request_id in decisions if request_id not in claimed]
+        if missing:
+            # All or none: hand back the entries this call took
+            if claimed:
+                self.store.put_many(self.entries.name, claimed)
+            raise NotAwaitingApproval(missing)
+        for request_id in claimed:
+            self._unindex(request_id)
+
+        # One transaction for every decision
+        credit_tools.approvals_db.put_many(decisions)
+        return list(decisions)
+
+
+# Singleton instance
+approval_inbox = ApprovalInbox()
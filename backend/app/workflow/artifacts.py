@@ -0,0 +1,118 @@
+"""
+Workflow Summary Artifacts
+A completed workflow's summary is rendered once into immutable,
+content-addressed bytes (JSON plus gzip/brotli variants), so serving it
+is a memory read instead of a rebuild + serialization on every hit.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+from ..models.schemas import WorkflowSummary
+from ..state import StateStore, state_store
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# Rendered artifacts kept in memory per worker
+ARTIFACT_CACHE_SIZE = 256
+
+
+class SummaryArtifact:
+    """Immutable pre-rendered summary (identity, gzip and optional brotli encodings)"""
+
+    __slots__ = ("request_id", "digest", "body", "gzip", "br")
+
+    def __init__(self, request_id: str, body: bytes):
+        self.request_id = request_id
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(body, quality=11) if brotli else None
+
+    def variant(self, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+        """Best encoding for the client: (bytes, Content-Encoding or None)"""
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.body, None
+
+    def etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag; each encoding is a different representation"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def _key(request_id: str, digest: str) -> str:
+    return f"{request_id}:{digest}"
+
+
+class SummaryArtifactStore:
+    """Publishes artifacts to the shared store and caches rendered bytes per worker"""
+
+    def __init__(self, store: StateStore):
+        self.store = store
+        self._cache: "OrderedDict[str, SummaryArtifact]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, request_id: str, summary: WorkflowSummary) -> SummaryArtifact:
+        """Render a completed workflow's summary and make it the current artifact"""
+        artifact = SummaryArtifact(request_id, orjson.dumps(summary.model_dump(mode="json")))
+
+        # Content first, then the pointer, so readers never see a dangling digest
+        self.store.put_if_absent("summary_artifacts", _key(request_id, artifact.digest), artifact.body.decode("utf-8"))
+        self.store.put("summary_index", request_id, artifact.digest)
+        self._remember(artifact)
+        return artifact
+
+    def withdraw(self, request_id: str):
+        """Forget the current artifact of a request that is being re-run"""
+        self.store.delete("summary_index", request_id)
+
+    def current_digest(self, request_id: str) -> Optional[str]:
+        return self.store.get("summary_index", request_id)
+
+    def get(self, request_id: str, digest: str) -> Optional[SummaryArtifact]:
+        """
+        Artifact by content digest (rendered from the store on first access)
+        Only found under the request that published it
+        """
+        key = _key(request_id, digest)
+        with self._lock:
+            artifact = self._cache.get(key)
+            if artifact is not None:
+                self._cache.move_to_end(key)
+                return artifact
+
+        body = self.store.get("summary_artifacts", key)
+        if body is None:
+            return None
+
+        artifact = SummaryArtifact(request_id, body.encode("utf-8"))
+        self._remember(artifact)
+        return artifact
+
+    def get_for_request(self, request_id: str) -> Optional[SummaryArtifact]:
+        """Current artifact of a request, or None if it has not completed"""
+        digest = self.current_digest(request_id)
+        return self.get(request_id, digest) if digest else None
+
+    def _remember(self, artifact: SummaryArtifact):
+        key = _key(artifact.request_id, artifact.digest)
+        with self._lock:
+            self._cache[key] = artifact
+            self._cache.move_to_end(key)
+            while len(self._cache) > ARTIFACT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+
+# Singleton instance
+summary_artifacts = SummaryArtifactStore(state_store)
@@ -1,46 +1,246 @@
 """
-LangGraph Workflow Graph (Optional Enhancement)
-For future: Visual workflow representation and state management
+LangGraph Workflow Graph
+Execution engine for the 5-step credit workflow. Each node is bound to one
+`_stepN_*` method of CreditWorkflowAgent and the workflow state is
+checkpointed into the shared state store after every node.
 """
-from typing import TypedDict, Annotated
+import json
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Optional, TypedDict
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.utils import ConfigurableFieldSpec
+from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointAt
 from langgraph.graph import StateGraph, END
-from ..models.schemas import WorkflowStatus
 
+from ..models.schemas import (
+    CreditRequest, CustomerSnapshot, AIRecommendation, ApproverDecision,
+    DecisionType, WorkflowStatus
+)
+from ..state import StateStore, state_store
+
+if TYPE_CHECKING:
+    from .agent import CreditWorkflowAgent
 
-class WorkflowState(TypedDict):
-    """State schema for workflow graph"""
+
+class WorkflowState(TypedDict, total=False):
+    """State schema for workflow graph (JSON-serializable step outputs)"""
     request_id: str
+    run_id: str
     current_step: str
-    status: WorkflowStatus
-    data: dict
+    status: str
+    credit_request: Optional[dict]
+    customer_snapshot: Optional[dict]
+    ai_recommendation: Optional[dict]
+    approver_decision: Optional[dict]
+    sap_result: Optional[dict]
+    summary: Optional[dict]
+
+
+STATE_KEYS = tuple(WorkflowState.__annotations__)
+
+
+class StateStoreCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer that persists graph checkpoints in the shared state store
+    Keyed by thread_id (= request_id). Stores a readable copy of the
+    WorkflowState next to the runtime checkpoint, both as plain JSON (never
+    pickle: the store may be shared, and loading must not execute code).
+    """
+
+    store: Any
+    namespace: str = "checkpoints"
+    at: CheckpointAt = CheckpointAt.END_OF_STEP
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def config_specs(self) -> list[ConfigurableFieldSpec]:
+        return [
+            ConfigurableFieldSpec(
+                id="thread_id",
+                annotation=str,
+                name="Thread ID",
+                description=None,
+                default="",
+                is_shared=True,
+            ),
+        ]
+
+    def get(self, config: RunnableConfig) -> Optional[Checkpoint]:
+        record = self.get_record(config["configurable"]["thread_id"])
+        if record is None or not isinstance(record.get("checkpoint"), dict):
+            return None
+        saved = record["checkpoint"]
+        # Version counters are defaultdicts in LangGraph; JSON gives plain dicts
+        return Checkpoint(
+            v=saved["v"],
+            ts=saved["ts"],
+            channel_values=saved["channel_values"],
+            channel_versions=defaultdict(int, saved["channel_versions"]),
+            versions_seen=defaultdict(
+                lambda: defaultdict(int),
+                {node: defaultdict(int, seen) for node, seen in saved["versions_seen"].items()}
+            )
+        )
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint) -> None:
+        values = checkpoint["channel_values"]
+        record = {
+            "ts": checkpoint["ts"],
+            "state": {key: values[key] for key in STATE_KEYS if key in values},
+            # Channel values are the JSON step outputs; anything else fails loudly here
+            "checkpoint": {
+                "v": checkpoint["v"],
+                "ts": checkpoint["ts"],
+                "channel_values": values,
+                "channel_versions": checkpoint["channel_versions"],
+                "versions_seen": checkpoint["versions_seen"]
+            }
+        }
+        self.store.put(self.namespace, config["configurable"]["thread_id"], json.dumps(record))
+
+    def get_record(self, thread_id: str) -> Optional[dict]:
+        raw = self.store.get(self.namespace, thread_id)
+        return json.loads(raw) if raw is not None else None
 
+    def get_state(self, thread_id: str) -> Optional[WorkflowState]:
+        """Last persisted WorkflowState for a run (None if never checkpointed)"""
+        record = self.get_record(thread_id)
+        return record["state"] if record else None
 
-def create_workflow_graph():
+
+def create_checkpointer(store: Optional[StateStore] = None) -> StateStoreCheckpointSaver:
+    """Default checkpointer: the shared state store used by the API"""
+    return StateStoreCheckpointSaver(store=store or state_store)
+
+
+def create_workflow_graph(agent: "CreditWorkflowAgent", checkpointer: Optional[BaseCheckpointSaver] = None):
     """
-    Create LangGraph state machine for credit workflow
-    Future enhancement for visual workflow management
+    Create the compiled LangGraph state machine for the credit workflow
+
+    trigger -> analysis -> approval -+-> sap_update --+-> notification -> finalize
+                                     +-> sap_skipped -+
+    (sap_skipped is taken when the approver rejects the request; with no
+    decision yet in inbox mode, the run ends after approval until resumed)
+
+    Nodes whose output is already present in the state return no update,
+    so a run resumed from a checkpoint skips the steps it completed.
     """
 
+    def trigger(state: WorkflowState) -> dict:
+        if state.get("credit_request"):
+            return {}
+        credit_request = agent._step1_credit_block_trigger(state["request_id"])
+        return {
+            "current_step": "trigger",
+            "status": WorkflowStatus.IN_PROGRESS.value,
+            "credit_request": credit_request.model_dump(mode="json")
+        }
+
+    def analysis(state: WorkflowState) -> dict:
+        if state.get("ai_recommendation"):
+            return {}
+        credit_request = CreditRequest.model_validate(state["credit_request"])
+        context = agent._gather_analysis_context(credit_request)
+        ai_recommendation = agent._step2_analysis_and_recommendation(credit_request, context.snapshot, context)
+        return {
+            "current_step": "analysis",
+            "customer_snapshot": context.snapshot.model_dump(mode="json"),
+            "ai_recommendation": ai_recommendation.model_dump(mode="json")
+        }
+
+    def approval(state: WorkflowState) -> dict:
+        if state.get("approver_decision"):
+            return {}
+        ai_recommendation = AIRecommendation.model_validate(state["ai_recommendation"])
+        approver_decision = agent._step3_wait_for_approval(state["request_id"], ai_recommendation)
+        if approver_decision is None:
+            # Parked in the approval inbox; the run is resumed once decided
+            return {"current_step": "awaiting_approval"}
+        return {
+            "current_step": "approval",
+            "approver_decision": approver_decision.model_dump(mode="json")
+        }
+
+    def sap_update(state: WorkflowState) -> dict:
+        if state.get("current_step") in ("sap_update", "notification"):
+            return {}
+        sap_result = agent._step4_sap_update(
+            CreditRequest.model_validate(state["credit_request"]),
+            CustomerSnapshot.model_validate(state["customer_snapshot"]),
+            ApproverDecision.model_validate(state["approver_decision"]),
+            idempotency_key=f"{state['request_id']}:{state['run_id']}"
+        )
+        return {
+            "current_step": "sap_update",
+            "sap_result": sap_result
+        }
+
+    def sap_skipped(state: WorkflowState) -> dict:
+        if state.get("current_step") in ("sap_update", "notification"):
+            return {}
+        agent._step4_skip_sap_update(CreditRequest.model_validate(state["credit_request"]))
+        return {"current_step": "sap_update", "sap_result": None}
+
+    def notification(state: WorkflowState) -> dict:
+        if state.get("current_step") == "notification":
+            return {}
+        agent._step5_notification(
+            CreditRequest.model_validate(state["credit_request"]),
+            ApproverDecision.model_validate(state["approver_decision"]),
+            state.get("sap_result")
+        )
+        return {"current_step": "notification"}
+
+    def finalize(state: WorkflowState) -> dict:
+        approver_decision = ApproverDecision.model_validate(state["approver_decision"])
+        workflow_summary = agent._generate_workflow_summary(
+            state["request_id"],
+            CreditRequest.model_validate(state["credit_request"]),
+            CustomerSnapshot.model_validate(state["customer_snapshot"]),
+            AIRecommendation.model_validate(state["ai_recommendation"]),
+            approver_decision,
+            state.get("sap_result")
+        )
+        final_status = WorkflowStatus.REJECTED if approver_decision.decision == DecisionType.REJECT else WorkflowStatus.COMPLETED
+        return {
+            "current_step": "finalize",
+            "status": final_status.value,
+            "summary": workflow_summary.model_dump(mode="json")
+        }
+
+    def route_after_approval(state: WorkflowState) -> str:
+        if not state.get("approver_decision"):
+            return "awaiting"
+        decision = ApproverDecision.model_validate(state["approver_decision"])
+        return "rejected" if decision.decision == DecisionType.REJECT else "approved"
+
     # Define workflow graph
     workflow = StateGraph(WorkflowState)
 
     # Add nodes for each step
-    workflow.add_node("trigger", lambda state: {**state, "current_step": "trigger"})
-    workflow.add_node("analysis", lambda state: {**state, "current_step": "analysis"})
-    workflow.add_node("approval", lambda state: {**state, "current_step": "approval"})
-    workflow.add_node("sap_update", lambda state: {**state, "current_step": "sap_update"})
-    workflow.add_node("notification", lambda state: {**state, "current_step": "notification"})
+    workflow.add_node("trigger", trigger)
+    workflow.add_node("analysis", analysis)
+    workflow.add_node("approval", approval)
+    workflow.add_node("sap_update", sap_update)
+    workflow.add_node("sap_skipped", sap_skipped)
+    workflow.add_node("notification", notification)
+    workflow.add_node("finalize", finalize)
 
     # Define edges
     workflow.set_entry_point("trigger")
     workflow.add_edge("trigger", "analysis")
     workflow.add_edge("analysis", "approval")
-    workflow.add_edge("approval", "sap_update")
+    workflow.add_conditional_edges(
+        "approval",
+        route_after_approval,
+        {"approved": "sap_update", "rejected": "sap_skipped", "awaiting": END}
+    )
     workflow.add_edge("sap_update", "notification")
-    workflow.add_edge("notification", END)
-
-    return workflow.compile()
-
+    workflow.add_edge("sap_skipped", "notification")
+    workflow.add_edge("notification", "finalize")
+    workflow.add_edge("finalize", END)
 
-# For future use
-# graph = create_workflow_graph()
+    return workflow.compile(checkpointer=checkpointer or create_checkpointer())
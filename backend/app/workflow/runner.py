@@ -0,0 +1,323 @@
+"""
+Workflow Runner
+Runs workflows under their ownership lease, records status in the shared
+store, and resumes runs whose worker died (crash / rolling deploy).
+WORKFLOW_EXECUTOR=queue hands runs to the durable job queue instead of the
+in-process scheduler; they then execute in the `app.jobs.worker` pool.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..diagnostics import allocation_tracker
+from ..jobs import Job, get_job_queue
+from ..models.schemas import WorkflowSummary
+from ..state import WorkflowLease, state_store
+from ..tools.credit_tools import credit_tools
+from .approvals import AwaitingApproval, approval_inbox
+from .artifacts import summary_artifacts
+from .scheduler import QueueFullError, workflow_scheduler
+
+
+# Workflow status records, shared by all workers
+active_workflows = state_store.namespace("workflows")
+
+# inline: in-process scheduler threads | queue: durable queue + worker pool
+WORKFLOW_EXECUTOR = os.getenv("WORKFLOW_EXECUTOR", "inline")
+
+# Job kind handled by run_workflow_job
+WORKFLOW_JOB = "workflow.run"
+
+# Runs admitted or executing in this process (never touched by the recovery sweep)
+_local_runs = set()
+_local_runs_lock = threading.Lock()
+
+
+def _track_local_run(request_id: str, running: bool):
+    with _local_runs_lock:
+        if running:
+            _local_runs.add(request_id)
+        else:
+            _local_runs.discard(request_id)
+
+
+def is_local_run(request_id: str) -> bool:
+    """Whether this process has the run queued in its scheduler or executing"""
+    with _local_runs_lock:
+        return request_id in _local_runs
+
+
+def workflow_lease(request_id: str) -> WorkflowLease:
+    """Ownership lease for a workflow run (held by exactly one worker)"""
+    return WorkflowLease(state_store, f"workflow:{request_id}")
+
+
+def mark_running(request_id: str, lease: WorkflowLease):
+    """Record that this worker now owns a fresh run"""
+    summary_artifacts.withdraw(request_id)
+    active_workflows[request_id] = {
+        "status": "running",
+        "started_at": datetime.now().isoformat(),
+        "owner": lease.owner
+    }
+
+
+def workflow_priority(request_id: str) -> str:
+    """Scheduler priority class of a request (customer risk looked up when available)"""
+    request = credit_tools.get_credit_request(request_id)
+    try:
+        snapshot = credit_tools.get_customer_snapshot(request.customer_id)
+    except ValueError:
+        snapshot = None
+    return workflow_scheduler.classify(request, snapshot)
+
+
+def submit_workflow(request_id: str, lease: WorkflowLease, resume: bool = False, force: bool = False) -> str:
+    """
+    Admit a run and record it as queued
+    Raises QueueFullError (lease untouched) when the queue is full. With the
+    durable queue the lease is released once enqueued: the worker process
+    that claims the job takes ownership.
+    """
+    priority = workflow_priority(request_id)
+    previous = active_workflows.get(request_id)
+
+    # Record first, so a worker that picks the run up at once sees 'queued'
+    record = (previous or {}) if resume else {}
+    active_workflows[request_id] = {
+        **record,
+        "status": "queued",
+        "priority": priority,
+        "queued_at": datetime.now().isoformat(),
+        "owner": lease.owner
+    }
+
+    try:
+        if WORKFLOW_EXECUTOR == "queue":
+            _enqueue_workflow(request_id, priority, force, resume)
+        else:
+            _track_local_run(request_id, True)
+            workflow_scheduler.submit(request_id, priority, run_workflow, request_id, lease, resume, force=force)
+    except Exception:
+        _track_local_run(request_id, False)
+        if previous is None:
+            del active_workflows[request_id]
+        else:
+            active_workflows[request_id] = previous
+        raise
+
+    if WORKFLOW_EXECUTOR == "queue":
+        lease.release()
+    if not resume:
+        summary_artifacts.withdraw(request_id)
+    return priority
+
+
+def _enqueue_workflow(request_id: str, priority: str, force: bool = False, resume: bool = False):
+    """Durable-queue admission, bounded like the in-process scheduler"""
+    queue = get_job_queue()
+    pending = queue.pending_count()
+    if not force and pending >= workflow_scheduler.queue_size:
+        # Same estimate as the scheduler: backlog x typical run time / workers
+        workers = int(os.getenv("JOB_WORKER_PROCESSES", "2"))
+        raise QueueFullError(priority, max(1, pending * 5 // workers))
+
+    # One customer's workflows run in order on the worker owning its shard
+    customer_id = credit_tools.get_credit_request(request_id).customer_id
+    queue.enqueue(
+        WORKFLOW_JOB, {"request_id": request_id, "resume": resume}, priority=priority,
+        dedupe_key=request_id, shard_key=customer_id
+    )
+
+
+def run_workflow_job(job: Job):
+    """
+    Job handler (worker pool): run a queued workflow under its lease
+    Redelivered and retried jobs resume from the last checkpoint.
+    Raises on failure so the queue can retry or dead-letter the job.
+    """
+    request_id = job.payload["request_id"]
+    lease = workflow_lease(request_id)
+    if not lease.acquire():
+        raise RuntimeError(f"Workflow {request_id} is owned by another worker")
+
+    record = active_workflows.get(request_id) or {}
+    active_workflows.merge(request_id, {
+        "status": "running",
+        "started_at": record.get("started_at") or datetime.now().isoformat(),
+        "owner": lease.owner,
+        "attempt": job.attempt
+    })
+
+    resume = job.payload.get("resume", False) or job.attempt > 1
+    if run_workflow(request_id, lease, resume=resume) is not None:
+        return
+
+    failed = active_workflows.get(request_id) or {}
+    if failed.get("status") == "awaiting_approval":
+        # Done for now: a decision enqueues the resumed run
+        return
+    if job.attempt < job.max_attempts:
+        active_workflows.merge(request_id, {"status": "queued", "attempt": job.attempt})
+    raise RuntimeError(failed.get("error") or "Workflow failed")
+
+
+def run_workflow(request_id: str, lease: WorkflowLease, resume: bool = False) -> Optional[WorkflowSummary]:
+    """
+    Execute (or resume) a workflow while holding its lease
+    Returns the summary, or None if the run failed or is awaiting approval
+    (see status record)
+    """
+    _track_local_run(request_id, True)
+    record = active_workflows.get(request_id) or {}
+    started_at = record.get("started_at") or datetime.now().isoformat()
+    if record.get("status") == "queued":
+        active_workflows.merge(request_id, {"status": "running", "started_at": started_at})
+
+    # Imported on first run: LangChain/LangGraph stay out of API start-up
+    from .agent import get_workflow_agent
+
+    parked = False
+    try:
+        # Allocation counts per run, only while tracemalloc is on (debug endpoints)
+        with allocation_tracker.track_workflow(request_id):
+            result = get_workflow_agent().execute_workflow(request_id, resume=resume)
+
+        # Render the (now immutable) summary once, before announcing completion
+        artifact = summary_artifacts.publish(request_id, result)
+
+        active_workflows[request_id] = {
+            "status": "completed",
+            "priority": record.get("priority"),
+            "started_at": started_at,
+            "completed_at": datetime.now().isoformat(),
+            "result": result.model_dump(mode="json"),
+            "summary_url": f"/api/workflow/summary/{request_id}/{artifact.digest}"
+        }
+        return result
+
+    except AwaitingApproval:
+        active_workflows[request_id] = {
+            "status": "awaiting_approval",
+            "priority": record.get("priority"),
+            "started_at": started_at,
+            "awaiting_since": datetime.now().isoformat()
+        }
+        parked = True
+        return None
+
+    except Exception as e:
+        active_workflows[request_id] = {
+            "status": "failed",
+            "priority": record.get("priority"),
+            "started_at": started_at,
+            "error": str(e)
+        }
+        return None
+
+    finally:
+        lease.release()
+        _track_local_run(request_id, False)
+        # A decision that landed while this run still held the lease had its
+        # resume refused: the entry is already claimed, or the decision stored
+        if parked and (request_id not in approval_inbox or credit_tools.get_approver_decision(request_id)):
+            resume_decided_workflows([request_id])
+
+
+def resume_decided_workflows(request_ids: List[str]) -> Dict[str, str]:
+    """
+    Resume runs parked for approval once their decisions are recorded, all
+    submitted together. Returns request_id -> "queued" or the reason it was not
+    """
+    outcomes = {}
+    for request_id in request_ids:
+        lease = workflow_lease(request_id)
+        if not lease.acquire():
+            outcomes[request_id] = "owned by another worker"
+            continue
+        try:
+            # Already admitted once, so bypass the queue bound
+            submit_workflow(request_id, lease, resume=True, force=True)
+            outcomes[request_id] = "queued"
+        except Exception as e:
+            lease.release()
+            outcomes[request_id] = str(e) or type(e).__name__
+    return outcomes
+
+
+def recover_interrupted_workflows() -> List[str]:
+    """
+    Recovery sweep: resume every 'queued' or 'running' workflow whose lease
+    has expired (its owner died). Runs this process is tracking are skipped.
+    Resumed runs continue from their last checkpoint, so completed steps
+    (LLM analysis, SAP update) are not repeated.
+    """
+    resumed = []
+
+    for request_id in list(active_workflows):
+        record = active_workflows.get(request_id)
+        if not record or record.get("status") not in ("queued", "running"):
+            continue
+        if is_local_run(request_id):
+            continue
+
+        # A live owner token (any run, any worker) keeps the run where it is
+        lease = workflow_lease(request_id)
+        if state_store.lease_owner(lease.name) is not None:
+            continue
+        # Atomic: fails if another worker's sweep took it in the meantime
+        if not lease.acquire():
+            continue
+
+        active_workflows[request_id] = {
+            **record,
+            "owner": lease.owner,
+            "resumed_at": datetime.now().isoformat(),
+            "resume_count": record.get("resume_count", 0) + 1
+        }
+        print(f"RECOVERY: resuming workflow {request_id} (previous owner {record.get('owner')})")
+
+        # Already admitted once, so bypass the queue bound
+        submit_workflow(request_id, lease, resume=True, force=True)
+        resumed.append(request_id)
+
+    return resumed
+
+
+# Set by stop_recovery_sweeper() on shutdown
+_sweeper_stop = threading.Event()
+
+
+def start_recovery_sweeper(interval: Optional[float] = None) -> Optional[threading.Thread]:
+    """
+    Run one sweep now and then every `interval` seconds
+    (RECOVERY_SWEEP_INTERVAL, 0 = startup sweep only)
+    """
+    if WORKFLOW_EXECUTOR == "queue":
+        # Queued jobs of dead workers are redelivered after their visibility timeout
+        return None
+    if interval is None:
+        interval = float(os.getenv("RECOVERY_SWEEP_INTERVAL", "60"))
+
+    recover_interrupted_workflows()
+    if interval <= 0:
+        return None
+
+    _sweeper_stop.clear()
+
+    def sweep_forever():
+        while not _sweeper_stop.wait(interval):
+            try:
+                recover_interrupted_workflows()
+            except Exception as e:
+                print(f"RECOVERY SWEEP FAILED: {e}")
+
+    thread = threading.Thread(target=sweep_forever, name="recovery-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_recovery_sweeper():
+    """Stop the periodic sweep started by start_recovery_sweeper()"""
+    _sweeper_stop.set()
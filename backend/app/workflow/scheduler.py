@@ -0,0 +1,214 @@
+"""
+Workflow Scheduler
+Bounded, priority-aware admission and dispatch of workflow runs.
+High-value requests cannot be starved by a flood of routine unblocks:
+each priority class has its own queue, a concurrency cap and a weight
+for (smooth weighted round-robin) fair scheduling between classes.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from ..models.schemas import CreditRequest, CustomerSnapshot, RequestType, RiskCategory
+
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ("high", "normal", "low")
+
+# Requested limits at or above this are always high priority (₹10 crore)
+HIGH_VALUE_LIMIT = float(os.getenv("SCHEDULER_HIGH_VALUE_LIMIT", "100000000"))
+
+DEFAULT_WEIGHTS = {"high": 6, "normal": 3, "low": 1}
+DEFAULT_CAPS = {
+    "high": int(os.getenv("SCHEDULER_CAP_HIGH", "4")),
+    "normal": int(os.getenv("SCHEDULER_CAP_NORMAL", "3")),
+    "low": int(os.getenv("SCHEDULER_CAP_LOW", "1")),
+}
+
+
+class QueueFullError(Exception):
+    """Raised when admission control rejects new work"""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Workflow queue is full (priority {priority})")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ("job_id", "priority", "fn", "args", "enqueued_at")
+
+    def __init__(self, job_id: str, priority: str, fn: Callable, args: tuple):
+        self.job_id = job_id
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.enqueued_at = time.monotonic()
+
+
+class WorkflowScheduler:
+    """Bounded priority queue served by a fixed pool of worker threads"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        caps: Optional[Dict[str, int]] = None,
+        weights: Optional[Dict[str, int]] = None
+    ):
+        self.workers = workers or int(os.getenv("SCHEDULER_WORKERS", "4"))
+        self.queue_size = queue_size or int(os.getenv("SCHEDULER_QUEUE_SIZE", "100"))
+        self.caps = caps or dict(DEFAULT_CAPS)
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Job]] = {name: deque() for name in PRIORITY_CLASSES}
+        self._running: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self._credit: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        # Metrics
+        self._admitted = {name: 0 for name in PRIORITY_CLASSES}
+        self._rejected = {name: 0 for name in PRIORITY_CLASSES}
+        self._completed = {name: 0 for name in PRIORITY_CLASSES}
+        self._waits: Dict[str, Deque[float]] = {name: deque(maxlen=1000) for name in PRIORITY_CLASSES}
+        self._run_times: Deque[float] = deque(maxlen=200)
+
+    # --- Classification ---
+
+    def classify(self, request: CreditRequest, snapshot: Optional[CustomerSnapshot] = None) -> str:
+        """Priority class from request type, requested limit and customer risk"""
+        if request.requested_limit and request.requested_limit >= HIGH_VALUE_LIMIT:
+            return "high"
+        if snapshot is not None and snapshot.risk_category == RiskCategory.A:
+            return "high"
+        if request.request_type == RequestType.LIMIT_INCREASE:
+            return "normal"
+        return "low"
+
+    # --- Admission ---
+
+    def submit(self, job_id: str, priority: str, fn: Callable, *args: Any, force: bool = False) -> int:
+        """
+        Queue a job. Returns its position within its class
+        Raises QueueFullError when the queue is at capacity (unless force=True,
+        used for work that was already admitted, e.g. recovered runs)
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        with self._cond:
+            if not force and self._depth() >= self.queue_size:
+                self._rejected[priority] += 1
+                raise QueueFullError(priority, self._retry_after())
+
+            self._ensure_started()
+            self._queues[priority].append(_Job(job_id, priority, fn, args))
+            self._admitted[priority] += 1
+            self._cond.notify()
+            return len(self._queues[priority])
+
+    def _depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free (queue depth x mean run time / workers)"""
+        mean_run = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        return max(1, math.ceil(self._depth() * mean_run / self.workers))
+
+    # --- Dispatch ---
+
+    def _next_job(self) -> Optional[_Job]:
+        """Smooth weighted round-robin over classes with work and free capacity"""
+        eligible = [
+            name for name in PRIORITY_CLASSES
+            if self._queues[name] and self._running[name] < self.caps[name]
+        ]
+        if not eligible:
+            return None
+
+        total = sum(self.weights[name] for name in eligible)
+        for name in eligible:
+            self._credit[name] += self.weights[name]
+        chosen = max(eligible, key=lambda name: self._credit[name])
+        self._credit[chosen] -= total
+
+        return self._queues[chosen].popleft()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while job is None:
+                    # Once stopping, leave queued jobs for the recovery sweep
+                    if self._stopping:
+                        return
+                    job = self._next_job()
+                    if job is None:
+                        self._cond.wait()
+
+                self._running[job.priority] += 1
+                self._waits[job.priority].append(time.monotonic() - job.enqueued_at)
+
+            started = time.monotonic()
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                print(f"SCHEDULER: job {job.job_id} failed: {e}")
+            finally:
+                with self._cond:
+                    self._running[job.priority] -= 1
+                    self._completed[job.priority] += 1
+                    self._run_times.append(time.monotonic() - started)
+                    self._cond.notify_all()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"workflow-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 30):
+        """Stop accepting dispatches; running jobs finish, queued jobs stay queued"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    # --- Metrics ---
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, concurrency and wait-time statistics per priority class"""
+        with self._cond:
+            classes = {}
+            for name in PRIORITY_CLASSES:
+                waits = sorted(self._waits[name])
+                classes[name] = {
+                    "queued": len(self._queues[name]),
+                    "running": self._running[name],
+                    "cap": self.caps[name],
+                    "weight": self.weights[name],
+                    "admitted": self._admitted[name],
+                    "rejected": self._rejected[name],
+                    "completed": self._completed[name],
+                    "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0
+                }
+
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._depth(),
+                "classes": classes
+            }
+
+
+# Singleton instance
+workflow_scheduler = WorkflowScheduler()
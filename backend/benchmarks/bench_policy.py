@@ -0,0 +1,39 @@
+"""
+Credit Policy Benchmark
+Time to evaluate the compiled decision-table policy for one request.
+
+Run from backend/:  python -m benchmarks.bench_policy
+"""
+import timeit
+
+from app.policy import policy_engine
+
+
+METRICS = {
+    "dso": 72.0,
+    "overdue_pct": 34.5,
+    "utilisation_pct": 88.0,
+    "ageing_0_30": 12000000.0,
+    "ageing_31_60": 4000000.0,
+    "ageing_61_90": 2500000.0,
+    "ageing_90_plus": 1500000.0,
+    "total_outstanding": 20000000.0,
+    "current_limit": 25000000.0,
+    "risk_category": "C",
+    "prior_requests": 2
+}
+
+
+def main():
+    policy = policy_engine.current()
+    print(f"Policy version {policy.version} ({policy.digest})")
+
+    for request_type in ("UNBLOCK", "LIMIT_INCREASE", "BLOCK"):
+        runs = 100000
+        seconds = timeit.timeit(lambda: policy.evaluate(request_type, dict(METRICS)), number=runs)
+        decision = policy.evaluate(request_type, dict(METRICS))
+        print(f"{request_type:<15} {seconds / runs * 1e6:6.2f} us/eval -> {decision.recommendation.value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Response Serialization Benchmark
+Compares FastAPI's default encoding path (jsonable_encoder + json) with the
+orjson-based FastJSONResponse on event-heavy workflow payloads.
+
+Run from backend/:  python -m benchmarks.bench_serialization
+"""
+import timeit
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse
+from app.models.schemas import (
+    AgeingBuckets, CustomerSnapshot, RiskCategory, WorkflowEvent,
+    WorkflowStatus, WorkflowSummary
+)
+
+
+def build_summary(event_count: int) -> WorkflowSummary:
+    """Realistic summary: one timeline event per step, repeated to event_count"""
+    events = [
+        WorkflowEvent(
+            step="AI Analysis & Recommendation",
+            status=WorkflowStatus.COMPLETED,
+            timestamp=datetime.now(),
+            actor="AI",
+            payload={
+                "request_id": "REQ-BENCH",
+                "recommendation": "RELEASE_BLOCK",
+                "confidence": 0.85,
+                "rationale": "Customer shows strong payment discipline with DSO of 42 days and 31.4% overdue.",
+                "key_metrics": {
+                    "dso": 42.0,
+                    "utilisation_pct": 72.5,
+                    "overdue_pct": 31.4,
+                    "risk_category": "B",
+                    "total_outstanding": 36500000.0
+                },
+                "risk_signals": ["High overdue: 31.4%"],
+                "sequence": i
+            }
+        )
+        for i in range(event_count)
+    ]
+    return WorkflowSummary(
+        request_id="REQ-BENCH",
+        workflow_summary="Credit workflow completed for Tata Steel Limited (Customer ID: CUST001).",
+        final_decision="APPROVED",
+        final_credit_limit=50000000.0,
+        final_block_status=False,
+        demo_talk_track=["AI analyzed customer data"] * 5,
+        events=events
+    )
+
+
+def build_snapshot() -> CustomerSnapshot:
+    return CustomerSnapshot(
+        customer_id="CUST001",
+        name="Tata Steel Limited",
+        segment="Large Enterprise",
+        current_limit=50000000.0,
+        credit_block=True,
+        utilisation_pct=72.5,
+        dso=42.0,
+        ageing=AgeingBuckets(**{"0_30": 25000000.0, "31_60": 8000000.0, "61_90": 3000000.0, "90_plus": 500000.0}),
+        risk_category=RiskCategory.B
+    )
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print(f"{'payload':<34}{'default (us)':>14}{'orjson (us)':>14}{'speedup':>10}")
+    print("-" * 72)
+
+    snapshot = build_snapshot()
+    cases = [("customer snapshot", snapshot, 2000)]
+    for event_count in (5, 100, 1000):
+        summary = build_summary(event_count)
+        cases.append((f"summary model, {event_count} events", summary, max(5, 2000 // event_count)))
+        cases.append((f"status dict, {event_count} events", {"status": "completed", "result": summary.model_dump()}, max(5, 2000 // event_count)))
+
+    for name, payload, number in cases:
+        default = per_call_us(lambda: JSONResponse(jsonable_encoder(payload)).body, number)
+        fast = per_call_us(lambda: FastJSONResponse(payload).body, number)
+        print(f"{name:<34}{default:>14.1f}{fast:>14.1f}{default / fast:>9.1f}x")
+
+    # Same bytes on the wire (aliases such as "0_30" preserved)
+    assert FastJSONResponse(snapshot).body.count(b'"0_30"') == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Start-up Benchmark
+Import-time profile of the API process (python -X importtime), grouped by
+top-level package, plus time until the background warm-up reports ready.
+
+Run from backend/:  python -m benchmarks.bench_startup [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+READY_SCRIPT = """
+import time
+started = time.perf_counter()
+from app.main import app
+from app.startup import readiness
+imported = time.perf_counter() - started
+readiness.warm_up()
+print(f"{imported:.4f} {time.perf_counter() - started:.4f}")
+"""
+
+
+def import_profile(module: str = "app.main") -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every module imported by `module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "STARTUP_WARMUP": "off"}, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile API cold start")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = import_profile()
+    total_us = next(cumulative for name, _, cumulative in rows if name == "app.main")
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import app.main: {total_us / 1000:.0f} ms ({len(rows)} modules)\n")
+    print(f"{'package':<28} {'self ms':>8}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<28} {self_us / 1000:8.1f}")
+
+    heavy = [name for name, _, _ in rows if name.split(".")[0] in ("langchain", "langchain_openai", "langgraph", "openai")]
+    print(f"\nLangChain/LangGraph/OpenAI modules imported at start-up: {len(heavy)}")
+
+    result = subprocess.run(
+        [sys.executable, "-c", READY_SCRIPT], capture_output=True, text=True, check=True,
+        env={**os.environ, "STARTUP_WARMUP": "off"}
+    )
+    imported, ready = (float(value) for value in result.stdout.split()[-2:])
+    print(f"Listening after {imported * 1000:.0f} ms, ready (warm) after {ready * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+State Store Stress Test
+Runs many simulated workflows on many threads against each store and checks
+that no event, counter increment or approval decision is lost; reports
+throughput of the lock-striped memory store against a single global lock.
+
+Run from backend/:  python -m benchmarks.bench_state_store [--threads 32] [--workflows 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from app.models.schemas import ApproverDecision, DecisionType
+from app.state import MemoryStateStore, ModelNamespace, StateStore
+from app.state.sqlite_store import SQLiteStateStore
+
+EVENTS_PER_WORKFLOW = 5
+
+
+def run_workflow(store: StateStore, request_id: str, approvals: ModelNamespace):
+    """One workflow's writes: status merges, events, a shared counter and the approval race"""
+    workflows = store.namespace("workflows")
+    workflows.merge(request_id, {"status": "running"})
+    for step in range(EVENTS_PER_WORKFLOW):
+        store.append("events", request_id, json.dumps({"step": step}))
+        store.append("events", "all", request_id)
+        store.update("counters", "steps", lambda raw: str(int(raw or 0) + 1))
+    workflows.merge(request_id, {"status": "completed", "events": EVENTS_PER_WORKFLOW})
+
+    # Human decision and the workflow's default race; the human one must win
+    human = ApproverDecision(decision=DecisionType.REJECT, comments="human")
+    default = ApproverDecision(decision=DecisionType.APPROVE, comments="default")
+    racers = [
+        threading.Thread(target=approvals.__setitem__, args=(request_id, human)),
+        threading.Thread(target=approvals.put_if_absent, args=(request_id, default))
+    ]
+    for racer in racers:
+        racer.start()
+    for racer in racers:
+        racer.join()
+
+
+def stress(store: StateStore, threads: int, workflows: int) -> Tuple[float, List[str]]:
+    """Run `workflows` workflows on `threads` threads; returns (seconds, errors)"""
+    approvals = ModelNamespace(store, "approvals", ApproverDecision)
+    request_ids = [f"REQ-STRESS-{i:06d}" for i in range(workflows)]
+    failures: List[str] = []
+
+    def worker(offset: int):
+        try:
+            for request_id in request_ids[offset::threads]:
+                run_workflow(store, request_id, approvals)
+        except Exception as e:
+            failures.append(f"{type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    errors = list(failures)
+    total = workflows * EVENTS_PER_WORKFLOW
+    if store.list_length("events", "all") != total:
+        errors.append(f"shared log has {store.list_length('events', 'all')} of {total} events")
+    if int(store.get("counters", "steps") or 0) != total:
+        errors.append(f"counter is {store.get('counters', 'steps')}, expected {total}")
+
+    workflows_ns = store.namespace("workflows")
+    for request_id in request_ids:
+        steps = [json.loads(raw)["step"] for raw in store.read_list("events", request_id)]
+        if steps != list(range(EVENTS_PER_WORKFLOW)):
+            errors.append(f"{request_id}: events {steps}")
+        if workflows_ns.get(request_id) != {"status": "completed", "events": EVENTS_PER_WORKFLOW}:
+            errors.append(f"{request_id}: status {workflows_ns.get(request_id)}")
+        # Whichever lands first, the human decision is the one kept
+        decision = approvals.get(request_id)
+        if decision is None or decision.comments != "human":
+            errors.append(f"{request_id}: human decision lost")
+    return elapsed, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent workflow stress test for the state stores")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--workflows", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores: List[Tuple[str, Callable[[], StateStore]]] = [
+            ("memory, 1 lock", lambda: MemoryStateStore(stripes=1)),
+            ("memory, striped", MemoryStateStore),
+            ("sqlite", lambda: SQLiteStateStore(os.path.join(directory, "stress.db")))
+        ]
+
+        print(f"{args.workflows} workflows x {EVENTS_PER_WORKFLOW} events on {args.threads} threads\n")
+        print(f"{'store':<18}{'seconds':>10}{'ops/s':>12}  result")
+        print("-" * 60)
+        failed = False
+        for name, factory in stores:
+            elapsed, errors = stress(factory(), args.threads, args.workflows)
+            ops = args.workflows * (EVENTS_PER_WORKFLOW * 3 + 4)
+            print(f"{name:<18}{elapsed:>10.2f}{ops / elapsed:>12,.0f}  {'ok' if not errors else f'{len(errors)} errors'}")
+            for error in errors[:5]:
+                print(f"    {error}")
+            failed = failed or bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
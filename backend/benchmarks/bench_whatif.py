@@ -0,0 +1,67 @@
+"""
+What-If Simulation Benchmark
+Replays a synthetic year of credit requests (default 250,000) under a
+candidate policy with a lower DSO threshold, serially and across a
+process pool.
+
+Run from backend/:  python -m benchmarks.bench_whatif [cases]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from app.policy import policy_engine
+from app.simulation import apply_overrides, run_simulation
+
+
+SEGMENTS = ["Steel & Metals", "Oil & Gas", "Automotive", "FMCG", "Infrastructure"]
+
+
+def synthetic_history(cases: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for index in range(cases):
+        limit = rng.uniform(5e6, 5e8)
+        buckets = [rng.uniform(0, limit / 4) for _ in range(4)]
+        request = {
+            "request_id": f"REQ-SIM-{index:06d}",
+            "customer_id": f"CUST{rng.randrange(2000):04d}",
+            "request_type": rng.choice(["UNBLOCK", "UNBLOCK", "LIMIT_INCREASE", "BLOCK"]),
+            "requested_limit": limit * 1.5,
+            "reason": "Synthetic history",
+            "requestor": {"name": "Sim", "email": "sim@example.com"},
+            "created_at": (start + timedelta(seconds=index * 31536000 / cases)).isoformat()
+        }
+        snapshot = {
+            "customer_id": request["customer_id"],
+            "name": "Synthetic Customer",
+            "segment": rng.choice(SEGMENTS),
+            "current_limit": limit,
+            "credit_block": rng.random() < 0.5,
+            "utilisation_pct": rng.uniform(20, 100),
+            "dso": rng.uniform(20, 110),
+            "ageing": {"0_30": buckets[0], "31_60": buckets[1], "61_90": buckets[2], "90_plus": buckets[3]},
+            "risk_category": rng.choice("ABCD")
+        }
+        rows.append((request, snapshot, 0, "synthetic"))
+    return rows
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+    rows = synthetic_history(cases)
+    candidate = apply_overrides(policy_engine.current().document, {"signals.high_dso.when.value": 45})
+
+    for workers in (1, None):
+        report = run_simulation(candidate, rows, workers=workers)
+        overall = report["overall"]
+        print(
+            f"workers={report['workers']:<3} {report['cases']} cases in {report['elapsed_s']:.2f}s "
+            f"({report['cases_per_s']:,}/s), flipped {overall['flipped']} "
+            f"(₹{overall['flipped_exposure'] / 1e7:,.0f} Cr)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, useRouter } from 'next/navigation';
 import axios from 'axios';
 import Timeline from '@/components/Timeline';
@@ -16,9 +16,11 @@ export default function WorkflowPage() {
   const requestId = params.id as string;
 
   const [workflowData, setWorkflowData] = useState<any>(null);
+  const [customer, setCustomer] = useState<any>(null);
   const [events, setEvents] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const lastSeq = useRef(0);
 
   useEffect(() => {
     if (requestId) {
@@ -30,21 +32,22 @@ export default function WorkflowPage() {
 
   const loadWorkflowData = async () => {
     try {
-      // Load workflow status
-      const statusResponse = await axios.get(
-        `${API_BASE}/api/workflow/status/${requestId}`
+      // One request per tick: status (with summary), new events since the
+      // cursor and, on the first load, the request and customer
+      const since = lastSeq.current;
+      const { data: view } = await axios.get(
+        `${API_BASE}/api/workflow/${requestId}/view`,
+        { params: { since } }
       );
-      setWorkflowData(statusResponse.data);
-
-      // Load events
-      try {
-        const eventsResponse = await axios.get(
-          `${API_BASE}/api/workflow/events/${requestId}`
-        );
-        setEvents(eventsResponse.data);
-      } catch (err) {
-        // Events might not exist yet
-        console.log('No events yet');
+      if (view.status) {
+        setWorkflowData(view.status);
+      }
+      if (view.customer) {
+        setCustomer(view.customer);
+      }
+      if (view.events.length > 0 && since === lastSeq.current) {
+        lastSeq.current = view.cursor;
+        setEvents((previous) => [...previous, ...view.events]);
       }
 
       setLoading(false);
@@ -96,7 +99,10 @@ export default function WorkflowPage() {
               <h1 className="text-3xl font-bold text-gray-900 mb-2">
                 Credit Workflow
               </h1>
-              <p className="text-gray-600">Request ID: {requestId}</p>
+              <p className="text-gray-600">
+                Request ID: {requestId}
+                {customer && ` · ${customer.name} (${customer.customer_id})`}
+              </p>
             </div>
             <button
               onClick={() => router.push('/')}
@@ -112,12 +118,16 @@ export default function WorkflowPage() {
               className={`px-4 py-2 rounded-full text-sm font-semibold ${
                 workflowData?.status === 'running'
                   ? 'bg-blue-100 text-blue-800'
+                  : workflowData?.status === 'queued' || workflowData?.status === 'awaiting_approval'
+                  ? 'bg-yellow-100 text-yellow-800'
                   : workflowData?.status === 'completed'
                   ? 'bg-green-100 text-green-800'
                   : 'bg-red-100 text-red-800'
               }`}
             >
+              {workflowData?.status === 'queued' && '🕒 Queued'}
               {workflowData?.status === 'running' && '⏳ Running'}
+              {workflowData?.status === 'awaiting_approval' && '✋ Awaiting approval'}
               {workflowData?.status === 'completed' && '✅ Completed'}
               {workflowData?.status === 'failed' && '❌ Failed'}
             </span>
@@ -129,14 +139,16 @@ export default function WorkflowPage() {
           <Timeline events={events} />
         </div>
 
-        {/* Analysis Panel */}
-        {events.find((e) => e.step === 'AI Analysis & Recommendation') && (
+        {/* Analysis Panel (streams the rationale while the analysis runs) */}
+        {(events.find((e) => e.step === 'AI Analysis & Recommendation') ||
+          workflowData?.status === 'running') && (
           <div className="mb-6">
             <AnalysisPanel
               analysisData={
                 events.find((e) => e.step === 'AI Analysis & Recommendation')
                   ?.payload
               }
+              streamUrl={`${API_BASE}/api/workflow/analysis/${requestId}/stream`}
             />
           </div>
         )}
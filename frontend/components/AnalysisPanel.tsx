@@ -1,11 +1,59 @@
 'use client';
 
+import { useEffect, useState } from 'react';
+
 interface AnalysisPanelProps {
   analysisData: any;
+  streamUrl?: string;
 }
 
-export default function AnalysisPanel({ analysisData }: AnalysisPanelProps) {
-  if (!analysisData) return null;
+export default function AnalysisPanel({ analysisData, streamUrl }: AnalysisPanelProps) {
+  const [streamed, setStreamed] = useState({ recommendation: '', rationale: '' });
+
+  // Until the analysis event arrives, show recommendation and rationale as they are generated
+  useEffect(() => {
+    if (analysisData || !streamUrl) return;
+
+    const source = new EventSource(streamUrl);
+    const append = (field: 'recommendation' | 'rationale') => (event: MessageEvent) => {
+      const { delta } = JSON.parse(event.data);
+      setStreamed((previous) => ({ ...previous, [field]: previous[field] + delta }));
+    };
+    source.addEventListener('start', () => setStreamed({ recommendation: '', rationale: '' }));
+    source.addEventListener('recommendation', append('recommendation'));
+    source.addEventListener('rationale', append('rationale'));
+    source.addEventListener('done', () => source.close());
+    source.addEventListener('error', () => source.close());
+    return () => source.close();
+  }, [analysisData, streamUrl]);
+
+  if (!analysisData) {
+    if (!streamUrl) return null;
+    return (
+      <div className="bg-white rounded-lg shadow-lg p-6">
+        <h2 className="text-2xl font-bold text-gray-900 mb-6">
+          🤖 AI Analysis & Recommendation
+        </h2>
+        <div className="bg-gradient-to-br from-purple-50 to-blue-50 rounded-lg p-6 border-2 border-purple-200">
+          <h3 className="text-lg font-semibold text-gray-700 mb-2">
+            {streamed.recommendation ? 'AI Recommendation' : 'Analysing…'}
+          </h3>
+          {streamed.recommendation && (
+            <p className="text-3xl font-bold text-gray-700 mb-4">
+              {streamed.recommendation.replace(/_/g, ' ')}
+            </p>
+          )}
+          <div className="bg-white rounded-lg p-4">
+            <h4 className="font-semibold text-gray-700 mb-2">Rationale</h4>
+            <p className="text-gray-700">
+              {streamed.rationale}
+              <span className="inline-block w-2 h-4 ml-1 bg-purple-400 animate-pulse align-middle"></span>
+            </p>
+          </div>
+        </div>
+      </div>
+    );
+  }
 
   const {
     recommendation,
@@ -13,6 +61,9 @@ export default function AnalysisPanel({ analysisData }: AnalysisPanelProps) {
     rationale,
     key_metrics,
     risk_signals,
+    policy_version,
+    policy_check,
+    source,
   } = analysisData;
 
   const getRecommendationColor = (rec: string) => {
@@ -37,6 +88,17 @@ export default function AnalysisPanel({ analysisData }: AnalysisPanelProps) {
             <p className={`text-3xl font-bold ${getRecommendationColor(recommendation)}`}>
               {recommendation.replace(/_/g, ' ')}
             </p>
+            {source === 'llm' && (
+              <p className="text-xs text-gray-500 mt-1">LLM analysis</p>
+            )}
+            {policy_version && (
+              <p className="text-xs text-gray-500 mt-1">Credit policy v{policy_version}</p>
+            )}
+            {policy_check && !policy_check.agrees && (
+              <p className="text-xs text-yellow-600 mt-1">
+                Credit policy suggests {policy_check.recommendation.replace(/_/g, ' ')}
+              </p>
+            )}
           </div>
           <div className="text-right">
             <p className="text-sm text-gray-600 mb-1">Confidence</p>
@@ -66,6 +128,16 @@ export default function AnalysisPanel({ analysisData }: AnalysisPanelProps) {
                   {key_metrics.dso?.toFixed(0)}
                 </p>
                 <p className="text-xs text-gray-500">days</p>
+                {key_metrics.dso_slope_90d !== undefined && (
+                  <p
+                    className={`text-xs font-semibold ${
+                      key_metrics.dso_slope_90d > 0 ? 'text-red-600' : 'text-green-600'
+                    }`}
+                  >
+                    {key_metrics.dso_slope_90d > 0 ? '▲' : '▼'}{' '}
+                    {Math.abs(key_metrics.dso_slope_90d).toFixed(1)}d / month (90d)
+                  </p>
+                )}
               </div>
 
               <div className="bg-green-50 rounded-lg p-4 text-center">
@@ -62,6 +62,10 @@ export const api = {
   getCustomer: (customerId: string) =>
     apiClient.get(`/api/customers/${customerId}`),
 
+  // Snapshot history points and trend features (e.g. DSO slope)
+  getCustomerHistory: (customerId: string, windowDays = 90) =>
+    apiClient.get(`/api/customers/${customerId}/history`, { params: { window_days: windowDays } }),
+
   // Workflow
   startWorkflow: (requestId: string) =>
     apiClient.post(`/api/workflow/start/${requestId}`),
@@ -69,8 +73,13 @@ export const api = {
   getWorkflowStatus: (requestId: string) =>
     apiClient.get(`/api/workflow/status/${requestId}`),
 
-  getWorkflowEvents: (requestId: string) =>
-    apiClient.get(`/api/workflow/events/${requestId}`),
+  // Pass the last seen `seq` to fetch only newer events
+  getWorkflowEvents: (requestId: string, since = 0) =>
+    apiClient.get(`/api/workflow/events/${requestId}`, { params: { since } }),
+
+  // Everything the workflow page needs; pass the previous `cursor` for new events only
+  getWorkflowView: (requestId: string, since = 0) =>
+    apiClient.get(`/api/workflow/${requestId}/view`, { params: { since } }),
 
   getWorkflowSummary: (requestId: string) =>
     apiClient.get(`/api/workflow/summary/${requestId}`),